@@ -4,11 +4,18 @@ from logging.handlers import RotatingFileHandler
 
 
 class LoggerConfig:
+    # Một file handler cho mỗi file log, dùng chung giữa các logger
+    _file_handlers = {}
 
     @staticmethod
     def logger_config(
         log_name: str, log_file: str = "main.log", log_level: int = logging.INFO
     ):
+        logger = logging.getLogger(log_name)
+        if logger.handlers:
+            # Logger đã được cấu hình (VD: class khởi tạo lần thứ hai)
+            return logger
+
         root_dir = os.path.dirname(
             os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         )
@@ -22,23 +29,23 @@ class LoggerConfig:
         # RotatingFileHandler: Tự động rotate khi file đạt 50MB
         # Giữ lại 5 file backup (main.log.1, main.log.2, ..., main.log.5)
         # Tổng cộng tối đa 300MB (50MB x 6 files)
-        file_handler = RotatingFileHandler(
-            filename=base_path,
-            maxBytes=10 * 1024 * 1024,  # 50MB
-            backupCount=5,  # Giữ 5 file backup
-            encoding="utf-8",
-        )
-        file_handler.setFormatter(formatter)
+        file_handler = LoggerConfig._file_handlers.get(base_path)
+        if file_handler is None:
+            file_handler = RotatingFileHandler(
+                filename=base_path,
+                maxBytes=10 * 1024 * 1024,  # 50MB
+                backupCount=5,  # Giữ 5 file backup
+                encoding="utf-8",
+            )
+            file_handler.setFormatter(formatter)
+            LoggerConfig._file_handlers[base_path] = file_handler
 
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
 
-        logger = logging.getLogger(log_name)
-
-        if not logger.handlers:
-            list_handler = [file_handler, console_handler]
-            for h in list_handler:
-                logger.addHandler(h)
+        list_handler = [file_handler, console_handler]
+        for h in list_handler:
+            logger.addHandler(h)
 
         logger.propagate = False
         logger.setLevel(log_level)
@@ -1,5 +1,27 @@
+import importlib.util
+import threading
+
 from pymongo import MongoClient
-from config.variable_config import MONGO_CONFIG
+from pymongo.write_concern import WriteConcern
+from config.variable_config import (
+    MONGO_CONFIG,
+    MONGO_WORKLOAD_CONFIG,
+    WRITE_CONCERN_CONFIG,
+)
+
+
+# Thư viện cần cho từng thuật toán nén wire protocol (zlib có sẵn trong Python)
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+def available_compressors(compressors: str) -> str:
+    """Giữ các thuật toán nén đã cài thư viện, theo thứ tự ưu tiên cấu hình"""
+    return ",".join(
+        name.strip()
+        for name in compressors.split(",")
+        if name.strip() in COMPRESSOR_MODULES
+        and importlib.util.find_spec(COMPRESSOR_MODULES[name.strip()]) is not None
+    )
 
 
 class MongoConfig:
@@ -19,13 +41,68 @@ class MongoConfig:
             cls._instance = super(MongoConfig, cls).__new__(cls)
             cls._instance._init_config()
             cls._instance._client = None
+            cls._instance._clients = {}
+            cls._instance._lock = threading.Lock()
         return cls._instance
 
     @property
     def get_config(self):
         return self._config
 
-    def get_client(self):
-        if self._client is None:
-            self._client = MongoClient(**self._config)
-        return self._client
+    def get_options(self, workload=None):
+        """
+        Tham số MongoClient của workload: MONGO_CONFIG ghi đè bởi MONGO_WORKLOAD_CONFIG[workload]
+
+        Args:
+            workload: realtime, bulk, query hoặc None (mặc định)
+        """
+        settings = {**MONGO_CONFIG, **MONGO_WORKLOAD_CONFIG.get(workload, {})}
+        options = {
+            **self._config,
+            "appname": settings["app_name"],
+            "maxPoolSize": settings["max_pool_size"],
+            "minPoolSize": settings["min_pool_size"],
+            "connectTimeoutMS": settings["connect_timeout_ms"],
+            "serverSelectionTimeoutMS": settings["server_selection_timeout_ms"],
+            "retryWrites": settings["retry_writes"],
+            "readPreference": settings["read_preference"],
+        }
+        if settings["socket_timeout_ms"]:
+            options["socketTimeoutMS"] = settings["socket_timeout_ms"]
+        compressors = available_compressors(settings["compressors"])
+        if compressors:
+            options["compressors"] = compressors
+        return options
+
+    def get_client(self, workload=None):
+        """
+        MongoClient dùng chung theo bộ tùy chọn: các workload có cùng cấu hình dùng
+        chung một client (một connection pool)
+        """
+        if workload is None and self._client is not None:
+            return self._client
+        options = self.get_options(workload)
+        key = tuple(sorted((name, str(value)) for name, value in options.items()))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = MongoClient(**options)
+            if workload is None:
+                self._client = client
+        return client
+
+    @staticmethod
+    def write_concern(profile):
+        """
+        WriteConcern của profile trong WRITE_CONCERN_CONFIG (provisional, final),
+        dùng với collection.with_options(write_concern=...)
+        """
+        settings = WRITE_CONCERN_CONFIG[profile]
+        w = settings["w"]
+        w = int(w) if str(w).isdigit() else w
+        options = {"w": w}
+        if w != 0:
+            options["j"] = settings["j"]
+            if settings["wtimeout_ms"]:
+                options["wtimeout"] = settings["wtimeout_ms"]
+        return WriteConcern(**options)
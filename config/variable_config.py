@@ -9,11 +9,48 @@ MONGO_CONFIG = {
     "user": os.getenv("MONGO_USER"),
     "pass": os.getenv("MONGO_PASS"),
     "authSource": os.getenv("MONGO_AUTH", "admin"),
+    "app_name": os.getenv("MONGO_APP_NAME", "gold-data-pipeline"),
+    "max_pool_size": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "min_pool_size": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    # zstd cần package zstandard, snappy cần python-snappy; zlib có sẵn
+    "compressors": os.getenv("MONGO_COMPRESSORS", ""),
+    "connect_timeout_ms": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000")),
+    # 0 = không giới hạn (mặc định của driver)
+    "socket_timeout_ms": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")),
+    "server_selection_timeout_ms": int(
+        os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000")
+    ),
+    "retry_writes": os.getenv("MONGO_RETRY_WRITES", "true").lower() == "true",
+    "read_preference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+}
+
+# Ghi đè MONGO_CONFIG theo workload, mỗi bộ tùy chọn khác nhau có một MongoClient riêng
+MONGO_WORKLOAD_CONFIG = {
+    # Ghi nến mỗi vài giây: pool nhỏ, timeout ngắn để lỗi sớm và chuyển sang spool
+    "realtime": {
+        "max_pool_size": int(os.getenv("MONGO_REALTIME_POOL_SIZE", "10")),
+        "socket_timeout_ms": int(os.getenv("MONGO_REALTIME_SOCKET_TIMEOUT_MS", "10000")),
+        "server_selection_timeout_ms": int(
+            os.getenv("MONGO_REALTIME_SERVER_SELECTION_TIMEOUT_MS", "5000")
+        ),
+    },
+    # Import lịch sử, export, retention: batch lớn, nén wire protocol, pool lớn
+    "bulk": {
+        "max_pool_size": int(os.getenv("MONGO_BULK_POOL_SIZE", "50")),
+        "compressors": os.getenv("MONGO_BULK_COMPRESSORS", "zstd,snappy,zlib"),
+        "socket_timeout_ms": int(os.getenv("MONGO_BULK_SOCKET_TIMEOUT_MS", "300000")),
+    },
+    # Service đọc OHLCV: có thể đọc từ secondary
+    "query": {
+        "max_pool_size": int(os.getenv("MONGO_QUERY_POOL_SIZE", "50")),
+        "read_preference": os.getenv("MONGO_QUERY_READ_PREFERENCE", "primaryPreferred"),
+    },
 }
 
 GOLD_DATA_CONFIG = {
     "database": "gold_db",
-    "collection": "gold_minute_data",
+    "collection": os.getenv("GOLD_COLLECTION", "gold_minute_data"),
+    "symbol": os.getenv("TV_SYMBOL", "XAUUSD"),
     "batch_size_extract": 10000,
     "metatrader_data_gdrive_url": "https://drive.google.com/uc?id=1v7HVgXhUmGEUbmbkPxpZ44RiUJH8V3NK",
     "metatrader_data_local_path": "data/gold_data_metatrader5.csv",
@@ -23,3 +60,183 @@ DISCORD_CONFIG = {
     "webhook_url": os.getenv("DISCORD_WEBHOOK_URL", ""),
     "enabled": os.getenv("DISCORD_ALERT_ENABLED", "false").lower() == "true",
 }
+
+# Replay dữ liệu đã lưu thay cho TradingView (load test)
+REPLAY_CONFIG = {
+    "source_database": os.getenv("REPLAY_SOURCE_DATABASE", "gold_db"),
+    # Nguồn replay chỉ được đọc; mọi lần ghi của lần chạy replay vào target_collection
+    "source_collection": os.getenv("REPLAY_SOURCE_COLLECTION", "gold_minute_data"),
+    "target_collection": os.getenv(
+        "REPLAY_TARGET_COLLECTION", f"{GOLD_DATA_CONFIG['collection']}_replay"
+    ),
+    "speed": float(os.getenv("REPLAY_SPEED", "1")),
+    "latency_seconds": float(os.getenv("REPLAY_LATENCY_SECONDS", "0")),
+    "drop_rate": float(os.getenv("REPLAY_DROP_RATE", "0")),
+    "outage_rate": float(os.getenv("REPLAY_OUTAGE_RATE", "0")),
+    "outage_minutes": int(os.getenv("REPLAY_OUTAGE_MINUTES", "5")),
+}
+
+# Theo dõi độ trễ từ lúc nến đóng cửa tới khi được finalize trong Mongo
+FRESHNESS_CONFIG = {
+    "window_size": int(os.getenv("FRESHNESS_WINDOW_SIZE", "1440")),
+    "report_interval_minutes": int(os.getenv("FRESHNESS_REPORT_MINUTES", "10")),
+    "alert_p90_seconds": float(os.getenv("FRESHNESS_ALERT_P90_SECONDS", "120")),
+}
+
+# Service đọc OHLCV cho downstream (resample trong Mongo, cache, phân trang)
+QUERY_CONFIG = {
+    "host": os.getenv("QUERY_HOST", "127.0.0.1"),
+    "port": int(os.getenv("QUERY_PORT", "8080")),
+    "page_size": int(os.getenv("QUERY_PAGE_SIZE", "1000")),
+    "max_page_size": int(os.getenv("QUERY_MAX_PAGE_SIZE", "10000")),
+    "cache_size": int(os.getenv("QUERY_CACHE_SIZE", "256")),
+    "cache_ttl_seconds": int(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600")),
+    # Đọc khung lớn từ collection rollup (cần build một lần bằng rollup_pipepline.py)
+    "use_rollups": os.getenv("QUERY_USE_ROLLUPS", "false").lower() == "true",
+}
+
+# Collection nến khung lớn (5m, 15m, 1h, 4h, 1d) được cập nhật tăng dần từ nến phút
+ROLLUP_CONFIG = {
+    "enabled": os.getenv("ROLLUP_ENABLED", "true").lower() == "true",
+    # Mỗi khung được tính từ khung liền trước để mỗi bucket chỉ đọc vài document
+    "timeframes": ["5m", "15m", "1h", "4h", "1d"],
+    "build_window_days": int(os.getenv("ROLLUP_BUILD_WINDOW_DAYS", "30")),
+}
+
+# Phát nến mới tới subscriber qua TCP (NDJSON) thay vì để từng consumer poll Mongo
+PUBLISHER_CONFIG = {
+    "enabled": os.getenv("PUBLISHER_ENABLED", "false").lower() == "true",
+    "host": os.getenv("PUBLISHER_HOST", "127.0.0.1"),
+    "port": int(os.getenv("PUBLISHER_PORT", "8765")),
+    "buffer_size": int(os.getenv("PUBLISHER_BUFFER_SIZE", "10000")),
+    "subscriber_queue_size": int(os.getenv("PUBLISHER_QUEUE_SIZE", "10000")),
+    "heartbeat_seconds": 15,
+    "handshake_timeout_seconds": 1,
+}
+
+# Export nến phút đã finalize ra Parquet, phân vùng theo symbol/ngày
+PARQUET_EXPORT_CONFIG = {
+    "enabled": os.getenv("PARQUET_EXPORT_ENABLED", "false").lower() == "true",
+    "root_path": os.getenv("PARQUET_EXPORT_PATH", "data/parquet"),
+    "batch_size": int(os.getenv("PARQUET_EXPORT_BATCH_SIZE", "10000")),
+    # Chỉ export ngày đã qua ít nhất N ngày để gap fill (24h) kịp điền đủ dữ liệu
+    "settle_days": int(os.getenv("PARQUET_EXPORT_SETTLE_DAYS", "1")),
+    "run_at": os.getenv("PARQUET_EXPORT_RUN_AT", "00:10"),
+}
+
+# Kho OHLCV cục bộ dạng memmap (tra cứu "phút đã có chưa" không cần query Mongo)
+ARRAY_STORE_CONFIG = {
+    "enabled": os.getenv("ARRAY_STORE_ENABLED", "false").lower() == "true",
+    "root_path": os.getenv("ARRAY_STORE_PATH", "data/array_store"),
+    "epoch": os.getenv("ARRAY_STORE_EPOCH", "2000-01-01"),
+    "grow_minutes": 30 * 1440,
+}
+
+# Spool ghi trước khi Mongo không sẵn sàng (không mất dữ liệu khi failover)
+SPOOL_CONFIG = {
+    "enabled": os.getenv("SPOOL_ENABLED", "true").lower() == "true",
+    "root_path": os.getenv("SPOOL_PATH", "data/spool"),
+    # fsync mỗi batch (chống mất điện/crash OS, không chỉ crash process): tắt mặc định
+    "fsync": os.getenv("SPOOL_FSYNC", "false").lower() == "true",
+}
+
+# Token bucket + circuit breaker dùng chung cho mọi request TradingView
+TV_GUARD_CONFIG = {
+    "rate_per_minute": float(os.getenv("TV_RATE_PER_MINUTE", "30")),
+    "burst": int(os.getenv("TV_RATE_BURST", "5")),
+    # Số token chỉ dành cho finalize/realtime, gap fill không được dùng
+    "reserved_tokens": int(os.getenv("TV_RESERVED_TOKENS", "2")),
+    "max_wait_seconds": float(os.getenv("TV_MAX_WAIT_SECONDS", "60")),
+    # finalize/realtime/forming chạy trong vòng lặp schedule: chờ ngắn rồi bỏ qua lượt này
+    "realtime_max_wait_seconds": float(os.getenv("TV_REALTIME_MAX_WAIT_SECONDS", "5")),
+    "failure_threshold": int(os.getenv("TV_BREAKER_FAILURES", "5")),
+    "open_seconds": float(os.getenv("TV_BREAKER_OPEN_SECONDS", "30")),
+    "max_open_seconds": float(os.getenv("TV_BREAKER_MAX_OPEN_SECONDS", "600")),
+}
+
+# Index các phút đã ghi trong cửa sổ gần đây, thay cho query $in mỗi phút
+RECENT_KEY_INDEX_CONFIG = {
+    "enabled": os.getenv("RECENT_KEY_INDEX_ENABLED", "true").lower() == "true",
+    "window_minutes": int(os.getenv("RECENT_KEY_INDEX_MINUTES", str(7 * 1440))),
+}
+
+# Import lịch sử chạy nền song song với realtime (src/main.py)
+HISTORICAL_CONFIG = {
+    "background_batch_size": int(os.getenv("HISTORICAL_BACKGROUND_BATCH_SIZE", "2000")),
+    # Nghỉ giữa các batch để import lịch sử không tranh tài nguyên với realtime
+    "background_throttle_seconds": float(
+        os.getenv("HISTORICAL_BACKGROUND_THROTTLE_SECONDS", "0.5")
+    ),
+    # Realtime nhận các phút từ (now - N giờ), trùng với lookback gap check khi khởi động
+    "realtime_lookback_hours": int(os.getenv("REALTIME_LOOKBACK_HOURS", "24")),
+    # Manifest của file lịch sử đã import, dùng để bỏ qua download khi Mongo đã đủ dữ liệu
+    "manifest_path": os.getenv("HISTORICAL_MANIFEST_PATH", "data/historical_manifest.json"),
+    "force_import": os.getenv("HISTORICAL_FORCE_IMPORT", "false").lower() == "true",
+    # Không so được phiên bản file trên Drive (ETag / Last-Modified / size) thì manifest
+    # cũ hơn N giờ bị coi là hết hạn, buộc tải lại để lấy các dòng mới thêm vào file
+    "manifest_max_age_hours": float(os.getenv("HISTORICAL_MANIFEST_MAX_AGE_HOURS", "24")),
+    # Backfill song song: số process (0 = số CPU) và số record mỗi insert_many của worker
+    "backfill_processes": int(os.getenv("HISTORICAL_BACKFILL_PROCESSES", "0")),
+    "backfill_batch_size": int(os.getenv("HISTORICAL_BACKFILL_BATCH_SIZE", "10000")),
+}
+
+# Giữ N ngày gần nhất dạng document phút, các tháng cũ hơn được nén thành archive tháng
+RETENTION_CONFIG = {
+    "enabled": os.getenv("RETENTION_ENABLED", "false").lower() == "true",
+    # Nên lớn hơn ROLLUP_BUILD_WINDOW_DAYS vì rollup được build từ collection phút
+    "hot_days": int(os.getenv("RETENTION_HOT_DAYS", "90")),
+    # Giá/volume được lưu dạng số nguyên x scale (delta giữa các phút), mất độ chính xác thì lưu float
+    "price_scale": int(os.getenv("RETENTION_PRICE_SCALE", "1000")),
+    "volume_scale": int(os.getenv("RETENTION_VOLUME_SCALE", "1")),
+    "compression_level": int(os.getenv("RETENTION_COMPRESSION_LEVEL", "6")),
+    "run_at": os.getenv("RETENTION_RUN_AT", "00:30"),
+}
+
+# Kiểm tra nến trước khi load, nến lỗi được ghi vào <collection>_quarantine
+VALIDATION_CONFIG = {
+    "enabled": os.getenv("VALIDATION_ENABLED", "true").lower() == "true",
+    # Spike: close lệch khỏi median N nến trước quá K lần độ lệch chuẩn của log return
+    "spike_sigma": float(os.getenv("VALIDATION_SPIKE_SIGMA", "10")),
+    "spike_window": int(os.getenv("VALIDATION_SPIKE_WINDOW", "15")),
+    # Độ lệch chuẩn tối thiểu (log return) để thị trường đứng yên không sinh spike giả
+    "min_sigma": float(os.getenv("VALIDATION_MIN_SIGMA", "0.0002")),
+    "context_size": int(os.getenv("VALIDATION_CONTEXT_SIZE", "120")),
+}
+
+# Đối chiếu fingerprint từng ngày trong Mongo với nguồn, chỉ ghi lại các ngày lệch
+RECONCILE_CONFIG = {
+    "enabled": os.getenv("RECONCILE_ENABLED", "false").lower() == "true",
+    # tradingview: các ngày trọn vẹn trong tv_bars nến gần nhất; metatrader: file lịch sử
+    "source": os.getenv("RECONCILE_SOURCE", "tradingview"),
+    "tv_bars": int(os.getenv("RECONCILE_TV_BARS", "5000")),
+    # Giá/volume được đổi sang số nguyên theo scale trước khi tính sha1 của ngày
+    "price_scale": int(os.getenv("RECONCILE_PRICE_SCALE", "1000")),
+    "volume_scale": int(os.getenv("RECONCILE_VOLUME_SCALE", "1")),
+    "run_at": os.getenv("RECONCILE_RUN_AT", "00:45"),
+}
+
+# Write concern theo loại ghi: nến đang hình thành (ghi lại mỗi 5 giây) và nến đã finalize / lịch sử
+WRITE_CONCERN_CONFIG = {
+    "provisional": {
+        # "0" = không chờ xác nhận, "1" = chỉ primary xác nhận
+        "w": os.getenv("PROVISIONAL_WRITE_CONCERN", "1"),
+        "j": os.getenv("PROVISIONAL_JOURNAL", "false").lower() == "true",
+        "wtimeout_ms": int(os.getenv("PROVISIONAL_WTIMEOUT_MS", "0")),
+        # Nến đang hình thành được ghi lại sau vài giây và finalize ở phút kế tiếp,
+        # không cần spool (fsync) trên đường ghi nóng
+        "spool": os.getenv("PROVISIONAL_SPOOL", "false").lower() == "true",
+    },
+    "final": {
+        "w": os.getenv("FINAL_WRITE_CONCERN", "majority"),
+        "j": os.getenv("FINAL_JOURNAL", "true").lower() == "true",
+        "wtimeout_ms": int(os.getenv("FINAL_WTIMEOUT_MS", "10000")),
+        "spool": True,
+    },
+}
+
+# Vòng đời nến phút: forming -> provisional (vừa đóng cửa) -> final
+CANDLE_STATE_CONFIG = {
+    # Nến provisional được chuyển sang final sau khi đóng cửa đủ N giây
+    # (trong khoảng đó gap check / reconcile còn có thể sửa giá trị)
+    "settle_seconds": int(os.getenv("CANDLE_SETTLE_SECONDS", "120")),
+}
@@ -0,0 +1,148 @@
+"""
+Fixture dùng chung cho test: MongoDB giả (mongomock) thay cho client thật,
+spool / array store / manifest ghi vào thư mục tạm của từng test
+"""
+import os
+import sys
+
+import pytest
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, WriteError
+from pymongo.results import BulkWriteResult, InsertManyResult
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from config.mongo_config import MongoConfig
+from config.variable_config import (
+    ARRAY_STORE_CONFIG,
+    HISTORICAL_CONFIG,
+    PUBLISHER_CONFIG,
+    ROLLUP_CONFIG,
+    SPOOL_CONFIG,
+)
+
+
+def _insert_many(self, documents, ordered=True, **kwargs):
+    """insert_many trả lỗi từng document dạng BulkWriteError giống MongoDB"""
+    errors, inserted_ids = [], []
+    for index, document in enumerate(documents):
+        try:
+            inserted_ids.append(self.insert_one(document).inserted_id)
+        except WriteError as e:
+            errors.append({"index": index, "code": e.code, "errmsg": str(e)})
+            if ordered:
+                break
+    if errors:
+        raise BulkWriteError(
+            {"writeErrors": errors, "writeConcernErrors": [], "nInserted": len(inserted_ids)}
+        )
+    return InsertManyResult(inserted_ids, True)
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    """bulk_write của mongomock không chạy được với pymongo 4.x: thực hiện từng lệnh"""
+    errors = []
+    details = {
+        "nInserted": 0,
+        "nUpserted": 0,
+        "nMatched": 0,
+        "nModified": 0,
+        "nRemoved": 0,
+        "upserted": [],
+    }
+    for index, request in enumerate(requests):
+        try:
+            if isinstance(request, InsertOne):
+                self.insert_one(request._doc)
+                details["nInserted"] += 1
+            elif isinstance(request, UpdateOne):
+                result = self.update_one(
+                    request._filter, request._doc, upsert=request._upsert
+                )
+                if result.upserted_id is not None:
+                    details["nUpserted"] += 1
+                    details["upserted"].append({"index": index, "_id": result.upserted_id})
+                else:
+                    details["nMatched"] += result.matched_count
+                    details["nModified"] += result.modified_count
+            elif isinstance(request, DeleteOne):
+                details["nRemoved"] += self.delete_one(request._filter).deleted_count
+            else:
+                raise NotImplementedError(type(request).__name__)
+        except WriteError as e:
+            errors.append({"index": index, "code": e.code, "errmsg": str(e)})
+            if ordered:
+                break
+    if errors:
+        raise BulkWriteError({**details, "writeErrors": errors, "writeConcernErrors": []})
+    return BulkWriteResult(details, True)
+
+
+@pytest.fixture
+def mongo_client(monkeypatch, tmp_path):
+    """MongoClient giả dùng chung cho mọi workload, state ghi ra tmp_path"""
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    collection_cls = mongomock.collection.Collection
+    monkeypatch.setattr(MongoConfig, "get_client", lambda self, workload=None: client)
+    monkeypatch.setattr(collection_cls, "insert_many", _insert_many)
+    monkeypatch.setattr(collection_cls, "bulk_write", _bulk_write)
+
+    monkeypatch.setitem(SPOOL_CONFIG, "root_path", str(tmp_path / "spool"))
+    monkeypatch.setitem(SPOOL_CONFIG, "fsync", False)
+    monkeypatch.setitem(ARRAY_STORE_CONFIG, "root_path", str(tmp_path / "array_store"))
+    monkeypatch.setitem(ARRAY_STORE_CONFIG, "enabled", False)
+    monkeypatch.setitem(ROLLUP_CONFIG, "enabled", False)
+    monkeypatch.setitem(PUBLISHER_CONFIG, "enabled", False)
+    monkeypatch.setitem(
+        HISTORICAL_CONFIG, "manifest_path", str(tmp_path / "historical_manifest.json")
+    )
+
+    # Singleton trong process không được mang state từ test trước
+    from src.utils.ingest_watermark_util import IngestWatermarkUtil
+    from src.utils.ohlcv_array_store import OhlcvArrayStore
+    from src.utils.recent_key_index_util import RecentKeyIndexUtil
+
+    monkeypatch.setattr(IngestWatermarkUtil, "_instance", None)
+    monkeypatch.setattr(OhlcvArrayStore, "_stores", {})
+    monkeypatch.setattr(RecentKeyIndexUtil, "_indexes", {})
+    return client
+
+
+@pytest.fixture
+def reject_writes(monkeypatch, mongo_client):
+    """
+    Giả lập MongoDB từ chối document (VD: code 121 document validation):
+    reject_writes(predicate, code) làm mọi insert / upsert có nến khớp predicate bị lỗi
+    """
+    import mongomock
+
+    collection_cls = mongomock.collection.Collection
+    insert_one = collection_cls.insert_one
+    update_one = collection_cls.update_one
+    rules = []
+
+    def check(document):
+        for predicate, code in rules:
+            if predicate(document):
+                raise WriteError(
+                    "Document failed validation",
+                    code,
+                    {"code": code, "errmsg": "Document failed validation"},
+                )
+
+    def patched_insert_one(self, document, *args, **kwargs):
+        check(document)
+        return insert_one(self, document, *args, **kwargs)
+
+    def patched_update_one(self, filter, update, *args, **kwargs):
+        check({**update.get("$setOnInsert", {}), **update.get("$set", {})})
+        return update_one(self, filter, update, *args, **kwargs)
+
+    monkeypatch.setattr(collection_cls, "insert_one", patched_insert_one)
+    monkeypatch.setattr(collection_cls, "update_one", patched_update_one)
+
+    def add_rule(predicate, code=121):
+        rules.append((predicate, code))
+
+    return add_rule
@@ -0,0 +1,276 @@
+"""
+Backfill nến phút cho một khoảng thời gian
+
+Tiến độ (rows/s, ETA) được in ra stderr, kết quả cuối cùng là một dòng JSON trên
+stdout; exit code 0 khi không có lỗi ghi, 1 khi có lỗi (hoặc TradingView không trả
+về được gì), 2 khi tham số sai. Script không gửi cảnh báo Discord: lỗi được báo
+qua exit code và JSON.
+
+    python scripts/backfill.py --start 2024-01-01 --end 2024-07-01 --parallelism 8
+    python scripts/backfill.py --source tradingview --start 2025-10-01T00:00 --dry-run
+"""
+import sys
+import os
+import argparse
+import json
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.variable_config import GOLD_DATA_CONFIG
+
+
+class ProgressPrinter:
+    """In tiến độ lên stderr: số dòng, rows/s và ETA ước tính từ tốc độ trung bình"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self.inline = self.stream.isatty()
+
+    def __call__(self, status):
+        done, total, elapsed = status["rows_done"], status["rows_total"], status["elapsed"]
+        rate = done / elapsed if elapsed > 0 else 0.0
+        if total and rate > 0:
+            eta = f"{max(total - done, 0) / rate:.0f}s"
+        else:
+            eta = "?"
+        percent = f" ({done / total:.0%})" if total else ""
+        shards = (
+            f", shards {status['shards_done']}/{status['shards']}"
+            if "shards" in status
+            else ""
+        )
+        line = f"{done}/{total} rows{percent}, {rate:,.0f} rows/s, ETA {eta}{shards}"
+        if self.inline:
+            self.stream.write("\r" + line.ljust(80))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+    def finish(self):
+        if self.inline:
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+def backfill_metatrader(args, progress):
+    from src.pipepline.historical_backfill_pipepline import HistoricalBackfillPipepline
+
+    pipepline = HistoricalBackfillPipepline(processes=args.parallelism)
+    return pipepline.run(
+        path=args.file,
+        start=args.start,
+        end=args.end,
+        progress=progress,
+        progress_interval=args.progress_interval,
+        dry_run=args.dry_run,
+    )
+
+
+def backfill_tradingview(args, progress):
+    """
+    TradingView chỉ có một phiên và bị rate limit nên chạy trong một process:
+    lấy các phút còn thiếu theo từng ngày, validate rồi insert. Tiến độ tính theo
+    số phút đã quét trong khoảng. Loader không dùng spool / array store / publisher
+    vì chúng thuộc về main.py có thể đang chạy song song.
+
+    TradingView chỉ trả về TV_MAX_BARS bar gần nhất: ngày kết thúc trước mốc đó
+    bị bỏ qua (đếm vào unreachable_minutes) thay vì gửi request chắc chắn rỗng.
+    """
+    from config.variable_config import ROLLUP_CONFIG
+    from src.etl.extract.realtime_metatrader_extract import (
+        TV_MAX_BARS,
+        RealtimeMetatraderExtract,
+    )
+    from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+    from src.etl.transform.candle_validate import CandleValidateTransform
+
+    started = time.perf_counter()
+    extractor = RealtimeMetatraderExtract()
+    validator = CandleValidateTransform()
+    loader = (
+        None
+        if args.dry_run
+        else RealtimeMetatraderLoad(clock=extractor.current_time, side_effects=False)
+    )
+    end = args.end or extractor.current_time().replace(second=0, microsecond=0)
+    status = {
+        "rows_done": 0,
+        "rows_total": int((end - args.start).total_seconds() // 60),
+        "elapsed": 0.0,
+    }
+    progress(dict(status))
+
+    summary = {"rows": 0, "quarantined": 0, "inserted": 0, "duplicates": 0, "errors": 0}
+    if args.dry_run:
+        summary["missing"] = 0
+    # Mốc cũ nhất chắc chắn còn trong TV_MAX_BARS bar (ngoài giờ không có bar nên
+    # thực tế TradingView còn lùi xa hơn một chút)
+    reachable_from = extractor.current_time().replace(
+        second=0, microsecond=0
+    ) - timedelta(minutes=TV_MAX_BARS)
+    summary["unreachable_minutes"] = 0
+    if args.start < reachable_from:
+        print(
+            f"WARNING: TradingView only serves the latest {TV_MAX_BARS} bars, "
+            f"days ending before {reachable_from} are skipped "
+            f"(use --source metatrader for older data)",
+            file=sys.stderr,
+        )
+    last_report = 0.0
+    window_start = args.start
+    while window_start < end:
+        window_end = min(window_start + timedelta(days=1), end)
+        if window_end <= reachable_from:
+            summary["unreachable_minutes"] += int(
+                (window_end - window_start).total_seconds() // 60
+            )
+            window_start = window_end
+            continue
+        # check_and_fix_gaps lấy cả phút end_date, --end thì không bao gồm
+        df = extractor.check_and_fix_gaps(
+            start_date=window_start,
+            end_date=window_end - timedelta(minutes=1),
+            priority="backfill",
+        )
+        rows = 0 if df is None else len(df)
+        if rows:
+            valid = validator.validate(df, source="backfill")
+            summary["rows"] += rows
+            summary["quarantined"] += rows - len(valid)
+            if args.dry_run:
+                summary["missing"] += len(valid)
+            elif not valid.empty:
+                counts = loader.realtime_load(valid, source="backfill")
+                summary["inserted"] += counts["inserted"]
+                summary["duplicates"] += counts["duplicates"]
+                summary["errors"] += counts["errors"] + counts["queued"]
+            # Nến cuối window trước hóa ra là spike khi có nến kế tiếp
+            late = validator.pop_late_spikes()
+            summary["quarantined"] += len(late)
+            if loader is not None and late:
+                loader.remove_candles(late)
+        window_start = window_end
+
+        status.update(
+            rows_done=int((window_start - args.start).total_seconds() // 60),
+            elapsed=time.perf_counter() - started,
+        )
+        interval_passed = status["elapsed"] - last_report >= args.progress_interval
+        if window_start >= end or interval_passed:
+            progress(dict(status))
+            last_report = status["elapsed"]
+
+    if ROLLUP_CONFIG["enabled"] and summary["inserted"]:
+        from src.etl.load.rollup_load import CandleRollupLoad
+
+        CandleRollupLoad().build_all(start=args.start, end=end)
+
+    summary["empty_fetches"] = extractor.empty_fetches
+    summary["seconds"] = time.perf_counter() - started
+    summary["rows_per_second"] = (
+        summary["rows"] / summary["seconds"] if summary["seconds"] else 0.0
+    )
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Backfill minute candles for a date range and print a JSON summary"
+    )
+    parser.add_argument(
+        "--symbol",
+        default=GOLD_DATA_CONFIG["symbol"],
+        help=f"Symbol to backfill (default: {GOLD_DATA_CONFIG['symbol']})",
+    )
+    parser.add_argument(
+        "--start",
+        type=datetime.fromisoformat,
+        help="First minute, e.g. 2024-01-01 or 2024-01-01T09:30 (metatrader default: start of file)",
+    )
+    parser.add_argument(
+        "--end",
+        type=datetime.fromisoformat,
+        help="Stop before this time (default: end of file / now)",
+    )
+    parser.add_argument(
+        "--source",
+        choices=["metatrader", "tradingview"],
+        default="metatrader",
+        help="metatrader: historical export file; tradingview: fetch missing minutes",
+    )
+    parser.add_argument(
+        "--file", help="Local Metatrader export (default: download from Google Drive)"
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        help="Worker processes for metatrader (default: HISTORICAL_BACKFILL_PROCESSES or CPU count)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Parse and validate only, report how many minutes are missing",
+    )
+    parser.add_argument(
+        "--progress-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between progress lines on stderr",
+    )
+    args = parser.parse_args(argv)
+    if args.symbol.upper() != GOLD_DATA_CONFIG["symbol"].upper():
+        parser.error(
+            f"symbol {args.symbol} is not configured "
+            f"(TV_SYMBOL={GOLD_DATA_CONFIG['symbol']})"
+        )
+    if args.start and args.end and args.start >= args.end:
+        parser.error("--start must be before --end")
+    if args.source == "tradingview" and args.start is None:
+        parser.error("--start is required with --source tradingview")
+    if args.parallelism is not None and args.parallelism < 1:
+        parser.error("--parallelism must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    progress = ProgressPrinter()
+    stdout = sys.stdout
+    # Chạy từ CLI: lỗi báo qua exit code / JSON, không gửi cảnh báo Discord
+    from src.utils.discord_alert_util import DiscordAlertUtil
+
+    DiscordAlertUtil.get_instance().enabled = False
+    # Mọi print của pipeline đi ra stderr, stdout chỉ có JSON kết quả
+    with redirect_stdout(sys.stderr):
+        if not args.dry_run:
+            from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+            SchemaBootstrapUtil.ensure()
+        if args.source == "tradingview":
+            summary = backfill_tradingview(args, progress)
+        else:
+            summary = backfill_metatrader(args, progress)
+        progress.finish()
+
+    summary = {
+        "symbol": args.symbol.upper(),
+        "source": args.source,
+        "requested_start": args.start,
+        "requested_end": args.end,
+        "dry_run": args.dry_run,
+        **summary,
+    }
+    stdout.write(json.dumps(summary, default=str) + "\n")
+    # TradingView không trả về nến nào dù có khoảng cần lấy: coi là thất bại
+    nothing_fetched = not summary.get("rows") and (
+        summary.get("unreachable_minutes") or summary.get("empty_fetches")
+    )
+    failed = summary.get("errors") or summary.get("failed_shards") or nothing_fetched
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
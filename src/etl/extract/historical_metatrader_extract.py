@@ -1,10 +1,14 @@
-import gdown
 import pandas as pd
 from config.logger_config import LoggerConfig
 from config.variable_config import GOLD_DATA_CONFIG
 from src.utils.discord_alert_util import DiscordAlertUtil
 import os
 
+METATRADER_COLUMNS = [
+    c.lower()
+    for c in ["DATE", "TIME", "OPEN", "HIGH", "LOW", "CLOSE", "TICKVOL", "VOL", "SPREAD"]
+]
+
 
 class HistoricalMetatraderExtract:
     def __init__(self) -> None:
@@ -13,42 +17,47 @@ class HistoricalMetatraderExtract:
                 "Extract Historical Metatrader gold data"
             )
             self.gdrive_url = GOLD_DATA_CONFIG["metatrader_data_gdrive_url"]
-            self.discord_alert = DiscordAlertUtil()
+            self.discord_alert = DiscordAlertUtil.get_instance()
             self.logger.info("Successfully to read config")
         except Exception as e:
             self.logger.error(f"Error to read config: {str(e)}")
 
-    def historical_extract(self):
-        try:
-            self.logger.info("Downloading Metatrader data from Google Drive ...")
-            temp_path = "/tmp/metatrader_data.csv"
-            gdown.download(self.gdrive_url, temp_path, quiet=True)
-            df = pd.read_csv(temp_path, sep="\t", engine="python")
-            # Đổi tên cột về dạng thường
-            df.columns = [
-                c.lower()
-                for c in [
-                    "DATE",
-                    "TIME",
-                    "OPEN",
-                    "HIGH",
-                    "LOW",
-                    "CLOSE",
-                    "TICKVOL",
-                    "VOL",
-                    "SPREAD",
-                ]
-            ]
-
-            # Kết hợp date và time thành datetime field duy nhất
-            df["datetime"] = pd.to_datetime(
-                df["date"] + " " + df["time"], format="%Y.%m.%d %H:%M:%S"
-            )
+    def download(self):
+        """Tải file lịch sử từ Google Drive, trả về đường dẫn file tạm"""
+        # Chỉ import gdown khi thực sự cần tải (thường bị bỏ qua nhờ coverage check)
+        import gdown
+
+        self.logger.info("Downloading Metatrader data from Google Drive ...")
+        temp_path = "/tmp/metatrader_data.csv"
+        gdown.download(self.gdrive_url, temp_path, quiet=True)
+        return temp_path
 
-            # Đổi tên tickvol thành volume và xóa các cột không cần thiết
-            df = df.rename(columns={"tickvol": "volume"})
-            df = df.drop(columns=["date", "time", "vol", "spread"])
+    @staticmethod
+    def read_frame(source, header=True):
+        """
+        Đọc file (hoặc một đoạn byte của file) export từ Metatrader thành DataFrame
 
+        Args:
+            source: Đường dẫn hoặc buffer dữ liệu tab-separated
+            header: Dòng đầu là header (False với các shard đọc từ giữa file)
+        """
+        # Đổi tên cột về dạng thường
+        df = pd.read_csv(
+            source, sep="\t", header=0 if header else None, names=METATRADER_COLUMNS
+        )
+
+        # Kết hợp date và time thành datetime field duy nhất
+        df["datetime"] = pd.to_datetime(
+            df["date"] + " " + df["time"], format="%Y.%m.%d %H:%M:%S"
+        )
+
+        # Đổi tên tickvol thành volume và xóa các cột không cần thiết
+        df = df.rename(columns={"tickvol": "volume"})
+        return df.drop(columns=["date", "time", "vol", "spread"])
+
+    def historical_extract(self):
+        try:
+            df = self.read_frame(self.download())
             self.logger.info(f"Extracted data successfully: {len(df)} records")
             return df
         except Exception as e:
@@ -1,15 +1,30 @@
+import numpy as np
 import pandas as pd
 import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 from config.logger_config import LoggerConfig
 from config.mongo_config import MongoConfig
-from config.variable_config import GOLD_DATA_CONFIG
+from config.variable_config import (
+    GOLD_DATA_CONFIG,
+    ARRAY_STORE_CONFIG,
+    RECENT_KEY_INDEX_CONFIG,
+    RETENTION_CONFIG,
+)
+from src.etl.load.retention_load import hot_boundary
 from src.utils.tvdatafeed_adapter import TVDataFeedAdapter
+from src.utils.candle_record import Candle
+from src.utils.tradingview_guard_util import CircuitOpenError
+from src.utils.ohlcv_array_store import OhlcvArrayStore
+from src.utils.recent_key_index_util import RecentKeyIndexUtil
 from src.utils.discord_alert_util import DiscordAlertUtil
-from tvDatafeed import TvDatafeed, Interval
 import os
 
+# Số bar lấy mỗi tick: phút hiện tại, phút trước và một bar dự phòng
+TICK_BARS = 3
+# TradingView chỉ trả về tối đa chừng này bar gần nhất: phút cũ hơn không lấy lại được
+TV_MAX_BARS = 5000
+
 
 class RealtimeMetatraderExtract:
     def __init__(
@@ -18,28 +33,51 @@ class RealtimeMetatraderExtract:
         tv_password: Optional[str] = None,
         symbol: Optional[str] = None,
         exchange: Optional[str] = None,
+        tv_adapter: Optional[TVDataFeedAdapter] = None,
     ):
         self.logger = LoggerConfig.logger_config(
             "Extract Realtime Metatrader gold data"
         )
         self.mongo_config = MongoConfig()
-        self.mongo_client = self.mongo_config.get_client()
+        self.mongo_client = self.mongo_config.get_client("realtime")
         self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
         self.gold_collection = self.gold_db.get_collection(
             GOLD_DATA_CONFIG["collection"]
         )
 
         # Khởi tạo Discord alert utility
-        self.discord_alert = DiscordAlertUtil()
+        self.discord_alert = DiscordAlertUtil.get_instance()
 
         self.symbol = symbol or os.getenv("TV_SYMBOL", "XAUUSD")
         self.exchange = exchange or os.getenv(
             "TV_EXCHANGE", "OANDA"
         )  # OANDA có volume data
-        self.tv_adapter = TVDataFeedAdapter(tv_username, tv_password)
+        # Có thể truyền adapter khác (VD: ReplayDataFeedAdapter) để load test
+        self.tv_adapter = tv_adapter or TVDataFeedAdapter(tv_username, tv_password)
+
+        # Số lần lấy lịch sử TradingView không có dữ liệu (script backfill dùng để báo lỗi)
+        self.empty_fetches = 0
+
+        # Kho memmap dùng chung với loader để tra "phút đã có chưa" không cần query Mongo
+        self.array_store = (
+            OhlcvArrayStore.get_store() if ARRAY_STORE_CONFIG["enabled"] else None
+        )
+        # Index các phút đã ghi gần đây, loader cập nhật sau mỗi lần ghi
+        self.recent_keys = (
+            RecentKeyIndexUtil.get_index()
+            if RECENT_KEY_INDEX_CONFIG["enabled"]
+            else None
+        )
+
+    def current_time(self) -> datetime:
+        """Thời gian hiện tại theo adapter (đồng hồ mô phỏng khi replay)"""
+        return self.tv_adapter.now()
 
     def get_latest_minute(self):
-        latest = self.gold_collection.find_one({}, sort=[("datetime", -1)])
+        # Gọi mỗi tick: chỉ cần datetime, không tải cả document
+        latest = self.gold_collection.find_one(
+            {}, {"_id": 0, "datetime": 1}, sort=[("datetime", -1)]
+        )
         if latest:
             dt = latest["datetime"]
             dt = dt.replace(second=0, microsecond=0)
@@ -47,10 +85,12 @@ class RealtimeMetatraderExtract:
         else:
             return None
 
-    def fetch_realtime_data(self, start_time: datetime | None = None) -> pd.DataFrame:
+    def fetch_realtime_data(
+        self, start_time: datetime | None = None, priority: str = "realtime"
+    ) -> pd.DataFrame:
         if start_time:
             # Lấy từ phút tiếp theo sau start_time, nhưng kiểm tra không lấy từ tương lai
-            now = datetime.now()
+            now = self.current_time()
             fetch_from = start_time + timedelta(minutes=1)
 
             # Nếu fetch_from > hiện tại thì không có data mới
@@ -70,7 +110,7 @@ class RealtimeMetatraderExtract:
             )
 
         df = self.tv_adapter.get_realtime_data(
-            symbol=self.symbol, exchange=self.exchange
+            symbol=self.symbol, exchange=self.exchange, priority=priority
         )
         if df is None or df.empty:
             self.logger.warning("No data returned from TV adapter")
@@ -102,47 +142,62 @@ class RealtimeMetatraderExtract:
         df = df.drop_duplicates(subset=["datetime"]).reset_index(drop=True)
         return df
 
-    def get_current_minute_candle(self):
-        """Lấy nến phút hiện tại để upsert liên tục"""
-        from datetime import datetime, timedelta
+    def fetch_latest_candles(self, priority: str = "realtime") -> List[Candle]:
+        """
+        Vài nến mới nhất dạng Candle cho đường realtime mỗi tick (nến hiện tại và
+        phút trước luôn nằm trong vài bar cuối, không cần tải cả cửa sổ 5000 bar)
+        """
+        candles = self.tv_adapter.get_latest_candles(
+            symbol=self.symbol,
+            exchange=self.exchange,
+            n_bars=TICK_BARS,
+            priority=priority,
+        )
+        if not candles:
+            self.logger.warning("No data returned from TV adapter")
+            return []
+        return candles
 
+    def get_current_candle(self) -> Optional[Candle]:
+        """Lấy nến phút hiện tại (Candle) để upsert liên tục"""
         # Lấy thời gian hiện tại và làm tròn về phút
-        now = datetime.now()
+        now = self.current_time()
         current_minute = now.replace(second=0, microsecond=0)
 
         self.logger.info(f"Fetching current minute candle for {current_minute}")
 
-        # Lấy data từ 2 phút gần nhất để đảm bảo có dữ liệu phút hiện tại
-        fetch_from = current_minute - timedelta(minutes=2)
-        df = self.fetch_realtime_data(fetch_from)
-
-        if df.empty:
-            return pd.DataFrame()
-
-        # Lọc chỉ lấy nến phút hiện tại
-        current_candle = df[df["datetime"] == current_minute]
+        candle = next(
+            (
+                c
+                for c in self.fetch_latest_candles(priority="forming")
+                if c.datetime == current_minute
+            ),
+            None,
+        )
 
-        if not current_candle.empty:
+        if candle is not None:
             self.logger.info(
-                f"Found current minute candle: close={current_candle.iloc[0]['close']}, volume={current_candle.iloc[0]['volume']}"
+                f"Found current minute candle: close={candle.close}, volume={candle.volume}"
             )
             # Cập nhật thời gian có data thành công
             self.discord_alert.check_and_alert_no_new_data(
                 source="TradingView_Realtime", current_data_time=current_minute
             )
-            return current_candle
         else:
             self.logger.warning(f"No candle found for current minute {current_minute}")
             # Kiểm tra và cảnh báo nếu không có data mới
             self.discord_alert.check_and_alert_no_new_data(
                 source="TradingView_Realtime", current_data_time=None
             )
-            return pd.DataFrame()
+        return candle
+
+    def get_current_minute_candle(self):
+        """Nến phút hiện tại dạng DataFrame (rỗng nếu không có)"""
+        candle = self.get_current_candle()
+        return pd.DataFrame([candle.to_doc()]) if candle is not None else pd.DataFrame()
 
     def get_missing_minute_candles(self):
         """Lấy các nến phút còn thiếu từ lịch sử tới hiện tại"""
-        from datetime import datetime, timedelta
-
         self.logger.info("Checking for missing minute candles...")
         latest_minute = self.get_latest_minute()
 
@@ -152,7 +207,7 @@ class RealtimeMetatraderExtract:
             )
             return pd.DataFrame()
 
-        now = datetime.now()
+        now = self.current_time()
         current_minute = now.replace(second=0, microsecond=0)
 
         # Tính số phút thiếu từ latest_minute + 1 phút tới current_minute (không bao gồm current_minute)
@@ -184,25 +239,21 @@ class RealtimeMetatraderExtract:
 
     def is_data_up_to_date(self):
         """Kiểm tra xem data đã cập nhật tới hiện tại chưa"""
-        from datetime import datetime, timedelta
-
         latest_minute = self.get_latest_minute()
         if latest_minute is None:
             return False
 
-        now = datetime.now()
+        now = self.current_time()
         current_minute = now.replace(second=0, microsecond=0)
 
         # Data được coi là up-to-date nếu latest_minute >= current_minute - 1 phút
         # (vì nến hiện tại chưa hoàn thành)
         return latest_minute >= (current_minute - timedelta(minutes=1))
 
-    def get_previous_minute_final_candle(self):
-        """Lấy nến cuối cùng của phút trước đó để cập nhật trạng thái cuối cùng"""
-        from datetime import datetime, timedelta
-
+    def get_previous_final_candle(self) -> Optional[Candle]:
+        """Lấy nến cuối cùng (Candle) của phút trước đó để cập nhật trạng thái cuối cùng"""
         # Lấy thời gian hiện tại và phút trước
-        now = datetime.now()
+        now = self.current_time()
         current_minute = now.replace(second=0, microsecond=0)
         previous_minute = current_minute - timedelta(minutes=1)
 
@@ -210,35 +261,35 @@ class RealtimeMetatraderExtract:
             f"Fetching final state of previous minute candle for {previous_minute}"
         )
 
-        # Lấy data gần nhất để đảm bảo có nến phút trước
-        fetch_from = previous_minute - timedelta(minutes=1)
-        df = self.fetch_realtime_data(fetch_from)
-
-        if df.empty:
+        candles = self.fetch_latest_candles(priority="finalize")
+        if not candles:
             self.logger.warning("No data available for previous minute check")
-            return pd.DataFrame()
-
-        # Lọc lấy nến phút trước
-        previous_candle = df[df["datetime"] == previous_minute]
+            return None
 
-        if not previous_candle.empty:
+        candle = next((c for c in candles if c.datetime == previous_minute), None)
+        if candle is not None:
             self.logger.info(
-                f"Found previous minute final candle: {previous_minute}, close={previous_candle.iloc[0]['close']}, volume={previous_candle.iloc[0]['volume']}"
+                f"Found previous minute final candle: {previous_minute}, close={candle.close}, volume={candle.volume}"
             )
-            return previous_candle
         else:
             self.logger.warning(
                 f"No candle found for previous minute {previous_minute}"
             )
-            return pd.DataFrame()
+        return candle
+
+    def get_previous_minute_final_candle(self):
+        """Nến phút trước dạng DataFrame (rỗng nếu không có)"""
+        candle = self.get_previous_final_candle()
+        return pd.DataFrame([candle.to_doc()]) if candle is not None else pd.DataFrame()
 
-    def fetch_historical_range(self, start_time, end_time):
+    def fetch_historical_range(self, start_time, end_time, priority="backfill"):
         """
         Lấy dữ liệu lịch sử trong khoảng thời gian cụ thể
 
         Args:
             start_time (datetime): Thời điểm bắt đầu
             end_time (datetime): Thời điểm kết thúc
+            priority (str): Mức ưu tiên với rate limiter TradingView
 
         Returns:
             DataFrame: DataFrame chứa dữ liệu trong khoảng thời gian
@@ -248,17 +299,19 @@ class RealtimeMetatraderExtract:
         # Tính số phút trong khoảng
         time_range_minutes = int((end_time - start_time).total_seconds() // 60) + 1
 
-        if time_range_minutes > 5000:
+        if time_range_minutes > TV_MAX_BARS:
             self.logger.warning(
-                f"Khoảng thời gian quá lớn: {time_range_minutes} phút > 5000 phút"
+                f"Khoảng thời gian quá lớn: {time_range_minutes} phút > {TV_MAX_BARS} phút"
             )
-            # Chia nhỏ khoảng thời gian thành các phần 5000 phút
+            # Chia nhỏ khoảng thời gian thành các phần TV_MAX_BARS phút
             all_data = []
             current_start = start_time
 
             while current_start <= end_time:
-                current_end = min(current_start + timedelta(minutes=4999), end_time)
-                chunk_df = self._fetch_chunk(current_start, current_end)
+                current_end = min(
+                    current_start + timedelta(minutes=TV_MAX_BARS - 1), end_time
+                )
+                chunk_df = self._fetch_chunk(current_start, current_end, priority)
 
                 if chunk_df is not None and not chunk_df.empty:
                     all_data.append(chunk_df)
@@ -275,25 +328,35 @@ class RealtimeMetatraderExtract:
             else:
                 return None
         else:
-            return self._fetch_chunk(start_time, end_time)
+            return self._fetch_chunk(start_time, end_time, priority)
 
-    def _fetch_chunk(self, start_time, end_time):
+    def _fetch_chunk(self, start_time, end_time, priority="backfill"):
         """
-        Helper method để lấy một chunk dữ liệu
+        Helper method để lấy một chunk dữ liệu. TradingView chỉ trả về N bar gần
+        nhất nên phải lấy đủ số bar từ start_time tới hiện tại (tối đa TV_MAX_BARS),
+        không chỉ số phút của khoảng
         """
-        try:
-            # Khởi tạo TvDatafeed
-            tv = TvDatafeed()
+        df = self._fetch_chunk_frame(start_time, end_time, priority)
+        if df is None:
+            self.empty_fetches += 1
+        return df
 
-            # Tính số phút
-            time_range_minutes = int((end_time - start_time).total_seconds() // 60) + 1
+    def _fetch_chunk_frame(self, start_time, end_time, priority):
+        try:
+            # Số phút từ start_time tới hiện tại (>= số bar vì ngoài giờ không có bar)
+            current_minute = self.current_time().replace(second=0, microsecond=0)
+            minutes_to_now = int((current_minute - start_time).total_seconds() // 60) + 1
+            if minutes_to_now > TV_MAX_BARS:
+                self.logger.warning(
+                    f"Khoảng {start_time} đến {end_time} có thể nằm ngoài {TV_MAX_BARS} bar gần nhất của TradingView"
+                )
 
             # Lấy dữ liệu
-            df = tv.get_hist(
+            df = self.tv_adapter.get_hist(
                 symbol=self.symbol,
                 exchange=self.exchange,
-                interval=Interval.in_1_minute,
-                n_bars=time_range_minutes,
+                n_bars=max(1, min(minutes_to_now, TV_MAX_BARS)),
+                priority=priority,
             )
 
             if df is None or df.empty:
@@ -335,6 +398,11 @@ class RealtimeMetatraderExtract:
             )
             return df
 
+        except CircuitOpenError as e:
+            self.logger.warning(
+                f"Bỏ qua khoảng {start_time} đến {end_time}, TradingView tạm ngắt: {e}"
+            )
+            return None
         except Exception as e:
             self.logger.exception(
                 f"Lỗi khi lấy dữ liệu lịch sử cho khoảng {start_time} đến {end_time}: {e}"
@@ -346,7 +414,9 @@ class RealtimeMetatraderExtract:
             )
             return None
 
-    def check_and_fix_gaps(self, lookback_hours=24, start_date=None, end_date=None):
+    def check_and_fix_gaps(
+        self, lookback_hours=24, start_date=None, end_date=None, priority="backfill"
+    ):
         """
         Kiểm tra và sửa dữ liệu thiếu trong khoảng thời gian lookback_hours
         hoặc khoảng thời gian cụ thể từ start_date đến end_date
@@ -356,11 +426,13 @@ class RealtimeMetatraderExtract:
             lookback_hours (int): Số giờ cần kiểm tra ngược về quá khứ (khi không chỉ định start_date và end_date)
             start_date (datetime): Thời gian bắt đầu kiểm tra (nếu chỉ định)
             end_date (datetime): Thời gian kết thúc kiểm tra (nếu chỉ định)
+            priority (str): Mức ưu tiên với rate limiter TradingView (realtime cho
+                vòng lặp mỗi phút, backfill cho các lần quét nền)
 
         Returns:
             DataFrame: DataFrame chứa dữ liệu thiếu cần cập nhật
         """
-        now = datetime.now()
+        now = self.current_time()
 
         # Nếu có chỉ định start_date và end_date thì dùng chúng
         if start_date and end_date:
@@ -382,14 +454,61 @@ class RealtimeMetatraderExtract:
             # Thời gian kết thúc kiểm tra: thời điểm hiện tại - 1 phút
             end_time = now.replace(second=0, microsecond=0) - timedelta(minutes=1)
 
+        # Phút trước tier nóng đã nằm trong archive tháng, không điền lại vào collection chính
+        if RETENTION_CONFIG["enabled"]:
+            start_time = max(start_time, hot_boundary(now))
+            if start_time > end_time:
+                return pd.DataFrame()
+
         self.logger.info(f"Kiểm tra dữ liệu từ {start_time} đến {end_time}")
 
+        # Kiểm tra nhanh bằng array store: store chỉ là gợi ý (có thể lệch Mongo sau
+        # khi restore / xóa collection hoặc đổi MONGO_HOST), nên "đủ dữ liệu" phải
+        # được xác nhận bằng một count trên index datetime trước khi bỏ qua Mongo
+        if self.array_store is not None:
+            store_missing = [
+                minute
+                for minute in self.array_store.missing_minutes(start_time, end_time)
+                if not self.discord_alert._is_market_closed_time(minute)
+            ]
+            if not store_missing:
+                store_count = int(
+                    self.array_store.read_range(start_time, end_time)["present"].sum()
+                )
+                mongo_count = self.gold_collection.count_documents(
+                    {"datetime": {"$gte": start_time, "$lte": end_time}}
+                )
+                if mongo_count == store_count:
+                    self.logger.info(
+                        f"Array store có đủ dữ liệu từ {start_time} đến {end_time}, không có khoảng trống"
+                    )
+                    return pd.DataFrame()
+                self.logger.warning(
+                    f"Array store lệch Mongo từ {start_time} đến {end_time} "
+                    f"(store={store_count}, mongo={mongo_count}), kiểm tra lại bằng Mongo"
+                )
+
         # Lấy các records trong khoảng thời gian
         records = list(
             self.gold_collection.find(
                 {"datetime": {"$gte": start_time, "$lte": end_time}}
             ).sort("datetime", 1)
         )
+        if self.array_store is not None:
+            # Đồng bộ lại store theo Mongo: phút store đánh dấu có nhưng Mongo không có
+            existing = {record["datetime"] for record in records}
+            minutes = pd.date_range(start_time, end_time, freq="min")
+            stale = [
+                minute
+                for minute, present in zip(
+                    minutes.to_pydatetime(), self.array_store.present_mask(minutes)
+                )
+                if present and minute not in existing
+            ]
+            if stale:
+                self.array_store.remove(stale)
+            if records:
+                self.array_store.write_records(records)
 
         if not records:
             self.logger.warning(
@@ -397,7 +516,7 @@ class RealtimeMetatraderExtract:
             )
             # Lấy lại toàn bộ dữ liệu
             self.logger.info(f"Chuẩn bị lấy dữ liệu cho toàn bộ khoảng thời gian")
-            df = self.fetch_historical_range(start_time, end_time)
+            df = self.fetch_historical_range(start_time, end_time, priority=priority)
 
             if df is not None and not df.empty:
                 # Trả về DataFrame để load method sẽ xử lý việc lưu vào database
@@ -494,7 +613,7 @@ class RealtimeMetatraderExtract:
                 self.logger.info(f"Đang lấy dữ liệu cho phút thiếu: {start_gap}")
 
             # Lấy dữ liệu
-            df = self.fetch_historical_range(start_gap, end_gap)
+            df = self.fetch_historical_range(start_gap, end_gap, priority=priority)
 
             if df is not None and not df.empty:
                 all_gap_data.append(df)
@@ -515,12 +634,13 @@ class RealtimeMetatraderExtract:
             self.logger.warning("Không lấy được dữ liệu thiếu nào!")
             return pd.DataFrame()
 
-    def fetch_latest_n_bars(self, n_bars=5000):
+    def fetch_latest_n_bars(self, n_bars=5000, priority="backfill"):
         """
         Lấy n_bars dữ liệu mới nhất từ TradingView
 
         Args:
             n_bars (int): Số lượng bars cần lấy
+            priority (str): Mức ưu tiên với rate limiter TradingView
 
         Returns:
             tuple: (DataFrame chứa dữ liệu mới nhất, datetime cũ nhất của dữ liệu)
@@ -528,15 +648,12 @@ class RealtimeMetatraderExtract:
         self.logger.info(f"Lấy {n_bars} bars dữ liệu mới nhất từ TradingView")
 
         try:
-            # Khởi tạo TvDatafeed
-            tv = TvDatafeed()
-
             # Lấy dữ liệu mới nhất
-            df = tv.get_hist(
+            df = self.tv_adapter.get_hist(
                 symbol=self.symbol,
                 exchange=self.exchange,
-                interval=Interval.in_1_minute,
                 n_bars=n_bars,
+                priority=priority,
             )
 
             if df is None or df.empty:
@@ -571,6 +688,9 @@ class RealtimeMetatraderExtract:
 
             return df, oldest_datetime
 
+        except CircuitOpenError as e:
+            self.logger.warning(f"Không lấy {n_bars} bars, TradingView tạm ngắt: {e}")
+            return None, None
         except Exception as e:
             self.logger.exception(f"Lỗi khi lấy dữ liệu từ TradingView: {e}")
             # Gửi cảnh báo Discord về exception
@@ -580,59 +700,32 @@ class RealtimeMetatraderExtract:
             )
             return None, None
 
-    def maintain_latest_n_bars(self, n_bars=5000):
+    def maintain_latest_n_bars(self, n_bars=5000, priority="backfill"):
         """
-        Duy trì chính xác n_bars mới nhất trong database
-        và giữ lại dữ liệu cũ hơn thời điểm cũ nhất của n_bars
+        Lấy n_bars mới nhất để duy trì chính xác cửa sổ này trong database.
+        Việc so sánh với Mongo và insert/update/delete do
+        RealtimeMetatraderLoad.reconcile_window thực hiện (một lần merge + một bulk write)
 
         Args:
             n_bars (int): Số lượng bars mới nhất cần duy trì
+            priority (str): Mức ưu tiên với rate limiter TradingView
 
         Returns:
-            DataFrame: DataFrame chứa dữ liệu mới cần thêm vào database
+            DataFrame: n_bars mới nhất, sort theo datetime (rỗng nếu lỗi)
         """
         self.logger.info(f"Bắt đầu cập nhật và duy trì {n_bars} bars mới nhất")
 
         # Lấy dữ liệu mới nhất
-        df, oldest_datetime = self.fetch_latest_n_bars(n_bars)
+        df, oldest_datetime = self.fetch_latest_n_bars(n_bars, priority=priority)
 
         if df is None or df.empty or oldest_datetime is None:
             self.logger.error("Không lấy được dữ liệu mới nhất từ TradingView")
             return pd.DataFrame()
 
-        # Lấy danh sách datetime của n_bars mới
-        new_datetimes = df["datetime"].tolist()
-
-        # Xóa dữ liệu trong khoảng thời gian của n_bars mới nhưng không thuộc n_bars mới
-        # Tìm số lượng records sẽ bị xóa (nếu có)
-        now = datetime.now()
-        count_to_delete = self.gold_collection.count_documents(
-            {
-                "datetime": {"$gte": oldest_datetime, "$lte": now},
-                "datetime": {"$nin": new_datetimes},
-            }
+        return df[["datetime", "open", "high", "low", "close", "volume"]].sort_values(
+            "datetime"
         )
 
-        if count_to_delete > 0:
-            self.logger.info(
-                f"Sẽ xóa {count_to_delete} records cũ trong khoảng thời gian của {n_bars} bars mới"
-            )
-            # Thực hiện xóa nếu có records cần xóa
-            result = self.gold_collection.delete_many(
-                {
-                    "datetime": {"$gte": oldest_datetime, "$lte": now},
-                    "datetime": {"$nin": new_datetimes},
-                }
-            )
-            self.logger.info(f"Đã xóa {result.deleted_count} records cũ")
-        else:
-            self.logger.info(
-                f"Không có records cũ cần xóa trong khoảng thời gian của {n_bars} bars mới"
-            )
-
-        # Bây giờ kiểm tra xem records nào trong df đã tồn tại trong database
-        return self.filter_existing_data(df)
-
     def filter_existing_data(self, df):
         """
         Lọc dữ liệu mới từ DataFrame, chỉ giữ lại các records chưa tồn tại trong DB
@@ -646,19 +739,52 @@ class RealtimeMetatraderExtract:
         if df is None or df.empty:
             return df
 
-        # Tạo danh sách các datetime để kiểm tra
-        datetimes = df["datetime"].tolist()
+        # Phút trong cửa sổ của recent key index: trả lời hoàn toàn tại chỗ
+        decided = np.zeros(len(df), dtype=bool)
+        known = np.zeros(len(df), dtype=bool)
+        if self.recent_keys is not None:
+            if not self.recent_keys.is_warm:
+                self.recent_keys.warm(self.gold_collection, self.current_time())
+            decided, known = self.recent_keys.lookup(df["datetime"])
+            known &= decided
+
+        # Array store chỉ là gợi ý: các phút store báo có sẵn được xác nhận bằng một
+        # count_documents (không tải document) thay vì find; lệch thì hỏi Mongo như thường
+        if self.array_store is not None:
+            hinted = ~decided & self.array_store.present_mask(df["datetime"])
+            if hinted.any():
+                hinted_datetimes = list(set(df.loc[hinted, "datetime"]))
+                confirmed = self.gold_collection.count_documents(
+                    {"datetime": {"$in": hinted_datetimes}}
+                )
+                if confirmed == len(hinted_datetimes):
+                    known |= hinted
+
+        # Tạo danh sách các datetime còn lại để kiểm tra
+        datetimes = df.loc[~decided & ~known, "datetime"].tolist()
 
         # Kiểm tra xem các records đã tồn tại chưa
-        existing_records = list(
-            self.gold_collection.find({"datetime": {"$in": datetimes}}, {"datetime": 1})
-        )
+        existing_records = []
+        if datetimes:
+            existing_records = list(
+                self.gold_collection.find(
+                    {"datetime": {"$in": datetimes}},
+                    {"datetime": 1, "open": 1, "high": 1, "low": 1, "close": 1, "volume": 1},
+                )
+            )
+            if self.array_store is not None and existing_records:
+                self.array_store.write_records(existing_records)
 
         # Tạo set các datetime đã tồn tại để tìm kiếm nhanh
         existing_datetimes = set(record["datetime"] for record in existing_records)
+        if self.array_store is not None and datetimes:
+            # Phút store đánh dấu có nhưng Mongo không có: xóa khỏi store
+            stale = [dt for dt in datetimes if dt not in existing_datetimes]
+            if stale:
+                self.array_store.remove(stale)
 
         # Lọc chỉ giữ lại các records chưa tồn tại
-        new_df = df[~df["datetime"].isin(existing_datetimes)]
+        new_df = df[~known & ~df["datetime"].isin(existing_datetimes)]
 
         self.logger.info(
             f"Từ {len(df)} records, có {len(new_df)} records mới cần thêm vào database"
@@ -681,11 +807,11 @@ class RealtimeMetatraderExtract:
         # Phương thức mới: duy trì chính xác n_bars mới nhất
         if use_latest_n_bars:
             self.logger.info(f"Sử dụng phương thức duy trì {n_bars} bars mới nhất")
-            return self.maintain_latest_n_bars(n_bars)
+            return self.maintain_latest_n_bars(n_bars, priority="realtime")
 
         # Phương thức cũ: kiểm tra và điền các khoảng trống dữ liệu
         # Kiểm tra dữ liệu thiếu trong 1 giờ gần đây (rút gọn thành 1 giờ thay vì 24 giờ để không ảnh hưởng hiệu suất)
-        gap_df = self.check_and_fix_gaps(lookback_hours=1)
+        gap_df = self.check_and_fix_gaps(lookback_hours=1, priority="realtime")
         if not gap_df.empty:
             # Lọc chỉ lấy dữ liệu mới
             filtered_gap_df = self.filter_existing_data(gap_df)
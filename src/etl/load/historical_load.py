@@ -9,7 +9,7 @@ class HistoricalLoad:
             self.logger = LoggerConfig.logger_config("Load historical gold data")
             self.batch_size_extract = GOLD_DATA_CONFIG["batch_size_extract"]
             self.mongo_config = MongoConfig()
-            self.mongo_client = self.mongo_config.get_client()
+            self.mongo_client = self.mongo_config.get_client("bulk")
             self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
 
             self.gold_collection = self.gold_db.get_collection(
@@ -33,9 +33,6 @@ class HistoricalLoad:
         ):
             try:
                 chunk_data = chunk.to_dict("records")
-                self.gold_collection.create_index(
-                    [("Date", 1)], unique=True, background=True
-                )
                 self.gold_collection.insert_many(chunk_data, ordered=False)
                 batch_count += 1
                 self.logger.info(
@@ -1,28 +1,58 @@
 from config.logger_config import LoggerConfig
 from config.mongo_config import MongoConfig
-from config.variable_config import GOLD_DATA_CONFIG
+from config.variable_config import (
+    GOLD_DATA_CONFIG,
+    ROLLUP_CONFIG,
+    ARRAY_STORE_CONFIG,
+    RECENT_KEY_INDEX_CONFIG,
+)
 from pymongo.errors import BulkWriteError
+from src.etl.load.rollup_load import CandleRollupLoad
+from src.utils.ohlcv_array_store import OhlcvArrayStore
+from src.utils.recent_key_index_util import RecentKeyIndexUtil
+from src.utils.candle_state_util import FINAL
+from datetime import datetime
+import time
 
 
 class HistoricalMetatraderLoad:
-    def __init__(self) -> None:
+    def __init__(self, side_effects: bool = True) -> None:
+        """
+        Args:
+            side_effects: Cập nhật rollup / array store / recent key index sau mỗi batch.
+                Worker backfill song song tắt đi (file memmap không ghi được từ nhiều
+                process), pipeline backfill build lại rollup một lần khi xong.
+        """
         try:
             self.logger = LoggerConfig.logger_config(
                 "Load historical metatrader gold data"
             )
             self.batch_size_extract = GOLD_DATA_CONFIG["batch_size_extract"]
             self.mongo_config = MongoConfig()
-            self.mongo_client = self.mongo_config.get_client()
+            self.mongo_client = self.mongo_config.get_client("bulk")
             self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
             self.gold_collection = self.gold_db.get_collection(
                 GOLD_DATA_CONFIG["collection"]
             )
-            try:
-                self.gold_collection.create_index(
-                    [("datetime", 1)], unique=True, background=True
-                )
-            except Exception:
-                self.logger.debug("Index creation skipped or failed; continuing")
+            # Dữ liệu lịch sử là dữ liệu đã finalize: majority + journal
+            self.final_collection = self.gold_collection.with_options(
+                write_concern=self.mongo_config.write_concern("final")
+            )
+            self.rollups = (
+                CandleRollupLoad()
+                if side_effects and ROLLUP_CONFIG["enabled"]
+                else None
+            )
+            self.array_store = (
+                OhlcvArrayStore.get_store()
+                if side_effects and ARRAY_STORE_CONFIG["enabled"]
+                else None
+            )
+            self.recent_keys = (
+                RecentKeyIndexUtil.get_index()
+                if side_effects and RECENT_KEY_INDEX_CONFIG["enabled"]
+                else None
+            )
             self.logger.info("Successfully to connect MongoDB Config")
         except Exception as e:
             self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
@@ -32,21 +62,74 @@ class HistoricalMetatraderLoad:
         for i in range(0, len(metatrader_data_extract), chunk_size):
             yield metatrader_data_extract.iloc[i : i + chunk_size]
 
-    def historical_load(self, metatrader_data_extract):
+    def _after_inserted(self, docs):
+        """Cập nhật array store, recent key index và rollup cho các nến vừa insert thành công"""
+        if self.array_store is not None:
+            self.array_store.write_records(docs)
+        if self.recent_keys is not None:
+            self.recent_keys.add(doc["datetime"] for doc in docs)
+        if self.rollups is not None:
+            self.rollups.update_for_minutes(doc["datetime"] for doc in docs)
+
+    def _insert_chunk(self, chunk, watermark):
+        """
+        Insert một chunk; khi chạy cùng realtime chỉ ghi các phút trước watermark
+        (chunk được lọc tại chỗ để index trong BulkWriteError khớp với list)
+        """
+        if watermark is None:
+            return self.final_collection.insert_many(chunk, ordered=False)
+        with watermark.hold() as limit:
+            if limit is not None:
+                chunk[:] = [doc for doc in chunk if doc["datetime"] < limit]
+            if not chunk:
+                return None
+            return self.final_collection.insert_many(chunk, ordered=False)
+
+    def historical_load(
+        self,
+        metatrader_data_extract,
+        watermark=None,
+        chunk_size=None,
+        throttle_seconds=0.0,
+        progress=None,
+    ):
+        """
+        Import dữ liệu lịch sử theo batch
+
+        Args:
+            metatrader_data_extract: DataFrame dữ liệu lịch sử
+            watermark: IngestWatermarkUtil khi chạy song song với realtime (None = ghi tất cả)
+            chunk_size: Số record mỗi batch (mặc định: batch_size_extract)
+            throttle_seconds: Nghỉ giữa các batch để nhường tài nguyên cho realtime
+            progress: Hàm gọi với số record của mỗi batch đã xử lý xong
+
+        Returns:
+            dict: Tổng số record inserted / duplicates / errors
+        """
         self.logger.info("Start load batch historical metatrader data ...")
-        chunk_size = self.batch_size_extract
+        chunk_size = chunk_size or self.batch_size_extract
         batch_count = 0
+        summary = {"inserted": 0, "duplicates": 0, "errors": 0}
         for chunk in self.chunk_data_frame(
             metatrader_data_extract, chunk_size=chunk_size
         ):
+            if batch_count and throttle_seconds:
+                time.sleep(throttle_seconds)
             try:
-                chunk_data = chunk.to_dict("records")
-                result = self.gold_collection.insert_many(chunk_data, ordered=False)
+                # Dữ liệu lịch sử coi như đã finalize tại thời điểm import
+                now = datetime.now()
+                chunk_data = chunk.assign(
+                    first_seen_at=now, updated_at=now, finalized_at=now, state=FINAL
+                ).to_dict("records")
+                result = self._insert_chunk(chunk_data, watermark)
                 inserted = (
                     len(result.inserted_ids)
                     if result and getattr(result, "inserted_ids", None) is not None
                     else 0
                 )
+                if inserted:
+                    self._after_inserted(chunk_data)
+                summary["inserted"] += inserted
                 batch_count += 1
                 self.logger.info(
                     f"Batch {batch_count} inserted {inserted}/{len(chunk_data)} records"
@@ -57,6 +140,14 @@ class HistoricalMetatraderLoad:
                 writeErrors = details.get("writeErrors", []) or []
                 dup_count = sum(1 for we in writeErrors if we.get("code") == 11000)
                 other_errors = [we for we in writeErrors if we.get("code") != 11000]
+                summary["inserted"] += nInserted
+                summary["duplicates"] += dup_count
+                summary["errors"] += len(other_errors)
+                if nInserted:
+                    failed_indexes = {we.get("index") for we in writeErrors}
+                    self._after_inserted(
+                        [doc for i, doc in enumerate(chunk_data) if i not in failed_indexes]
+                    )
                 batch_count += 1
                 self.logger.info(
                     f"Batch {batch_count} partial insert: {nInserted}/{len(chunk_data)} inserted, duplicates: {dup_count}, other write errors: {len(other_errors)}"
@@ -69,4 +160,8 @@ class HistoricalMetatraderLoad:
                 self.logger.exception(
                     f"Unexpected error to load historical metatrader data: {str(e)}"
                 )
+                summary["errors"] += len(chunk)
+            if progress is not None:
+                progress(len(chunk))
         self.logger.info(f"Total batches processed: {batch_count}")
+        return summary
@@ -0,0 +1,206 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import GOLD_DATA_CONFIG, PARQUET_EXPORT_CONFIG
+from src.etl.load.retention_load import (
+    CandleArchiveReader,
+    archive_collection_name,
+    next_month,
+)
+from src.utils.candle_state_util import FINAL_FILTER, FORMING, PROVISIONAL
+
+EXPORT_COLUMNS = ["datetime", "open", "high", "low", "close", "volume"]
+
+
+class ParquetExportLoad:
+    """
+    Export nến phút từ Mongo ra Parquet, phân vùng theo symbol và ngày:
+        <root>/symbol=XAUUSD/date=2025-10-01/part-0.parquet
+
+    Ngày cuối cùng đã export được lưu trong <root>/_export_state.json nên mỗi lần
+    chạy chỉ đọc các ngày mới. Đọc Mongo bằng một cursor có projection và batch_size
+    cho toàn bộ khoảng cần export, ghi từng ngày ngay khi đọc xong ngày đó.
+
+    File Parquet của một ngày không được ghi lại, nên chỉ export nến final: export
+    dừng trước ngày đầu tiên còn nến forming / provisional. Các tháng retention đã
+    nén vào archive được đọc từ archive (gộp với nến đến muộn trong collection chính).
+    """
+
+    def __init__(self, root_path: Optional[str] = None) -> None:
+        try:
+            self.logger = LoggerConfig.logger_config("Export parquet gold data")
+            self.mongo_config = MongoConfig()
+            self.mongo_client = self.mongo_config.get_client("bulk")
+            self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
+            self.gold_collection = self.gold_db.get_collection(
+                GOLD_DATA_CONFIG["collection"]
+            )
+            self.archive = CandleArchiveReader(
+                self.gold_db.get_collection(archive_collection_name())
+            )
+            self.symbol = GOLD_DATA_CONFIG["symbol"]
+            root_path = root_path or PARQUET_EXPORT_CONFIG["root_path"]
+            if not os.path.isabs(root_path):
+                root_dir = os.path.dirname(
+                    os.path.dirname(
+                        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+                    )
+                )
+                root_path = os.path.join(root_dir, root_path)
+            self.root_path = root_path
+            self.state_path = os.path.join(root_path, "_export_state.json")
+            self.batch_size = PARQUET_EXPORT_CONFIG["batch_size"]
+            self.settle_days = PARQUET_EXPORT_CONFIG["settle_days"]
+            self.logger.info("Successfully to connect MongoDB Config")
+        except Exception as e:
+            self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
+            raise
+
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state(self, state: dict):
+        os.makedirs(self.root_path, exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _partition_path(self, day: datetime) -> str:
+        return os.path.join(
+            self.root_path,
+            f"symbol={self.symbol}",
+            f"date={day.strftime('%Y-%m-%d')}",
+            "part-0.parquet",
+        )
+
+    def _write_day(self, day: datetime, rows: list):
+        path = self._partition_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = pd.DataFrame(rows, columns=EXPORT_COLUMNS)
+        # Ghi ra file tạm rồi rename để reader không bao giờ thấy file ghi dở
+        tmp_path = path + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def _first_datetime(self) -> Optional[datetime]:
+        """Nến cũ nhất của cả hai tier (archive và collection chính)"""
+        first = self.gold_collection.find_one({}, {"datetime": 1}, sort=[("datetime", 1)])
+        candidates = [first["datetime"]] if first else []
+        archived_first = self.archive.first_datetime()
+        if archived_first is not None:
+            candidates.append(archived_first)
+        return min(candidates) if candidates else None
+
+    def _rows(self, start: datetime, end: datetime):
+        """Nến final trong [start, end), sort theo datetime, đọc từ archive rồi tới collection chính"""
+        projection = {"_id": 0, **{column: 1 for column in EXPORT_COLUMNS}}
+        boundary = self.archive.boundary()
+        # Tháng đã archive: giải nén từng tháng, nến trong collection chính ưu tiên
+        while boundary is not None and start < min(boundary, end):
+            chunk_end = min(next_month(start), boundary, end)
+            rows = {
+                row["datetime"]: row
+                for row in self.archive.read_range(start, chunk_end - timedelta(minutes=1))
+            }
+            rows.update(
+                (doc["datetime"], doc)
+                for doc in self.gold_collection.find(
+                    {"datetime": {"$gte": start, "$lt": chunk_end}, **FINAL_FILTER},
+                    projection,
+                )
+            )
+            yield from (rows[key] for key in sorted(rows))
+            start = chunk_end
+        if start < end:
+            yield from (
+                self.gold_collection.find(
+                    {"datetime": {"$gte": start, "$lt": end}, **FINAL_FILTER}, projection
+                )
+                .sort("datetime", 1)
+                .batch_size(self.batch_size)
+            )
+
+    def export_new_days(self, today: Optional[datetime] = None) -> int:
+        """
+        Export các ngày chưa export, tới ngày đã ổn định gần nhất
+
+        Args:
+            today: Ngày hiện tại (mặc định: hôm nay)
+
+        Returns:
+            int: Số ngày đã ghi file Parquet
+        """
+        today = (today or datetime.now()).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        end_exclusive = today - timedelta(days=self.settle_days)
+
+        state = self._load_state()
+        last_exported = state.get(self.symbol)
+        if last_exported:
+            start = datetime.fromisoformat(last_exported) + timedelta(days=1)
+        else:
+            first = self._first_datetime()
+            if first is None:
+                self.logger.info("No data in collection, nothing to export")
+                return 0
+            start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # Ngày còn nến chưa xác nhận chưa được export (file Parquet không bị ghi lại)
+        unconfirmed = self.gold_collection.find_one(
+            {
+                "state": {"$in": [FORMING, PROVISIONAL]},
+                "datetime": {"$gte": start, "$lt": end_exclusive},
+            },
+            {"datetime": 1},
+            sort=[("datetime", 1)],
+        )
+        if unconfirmed:
+            end_exclusive = unconfirmed["datetime"].replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+            self.logger.warning(
+                f"Unconfirmed candle at {unconfirmed['datetime']}, exporting only before {end_exclusive.date()}"
+            )
+
+        if start >= end_exclusive:
+            self.logger.info(f"Parquet export is up to date (last day: {last_exported})")
+            return 0
+
+        self.logger.info(
+            f"Exporting {self.symbol} from {start.date()} to {(end_exclusive - timedelta(days=1)).date()}"
+        )
+        days_written = 0
+        current_day = None
+        rows = []
+        for doc in self._rows(start, end_exclusive):
+            day = doc["datetime"].replace(hour=0, minute=0, second=0, microsecond=0)
+            if day != current_day:
+                if rows:
+                    self._write_day(current_day, rows)
+                    state[self.symbol] = current_day.strftime("%Y-%m-%d")
+                    self._save_state(state)
+                    days_written += 1
+                current_day = day
+                rows = []
+            rows.append([doc.get(column) for column in EXPORT_COLUMNS])
+
+        if rows:
+            self._write_day(current_day, rows)
+            days_written += 1
+
+        # Đánh dấu đã export tới hết khoảng (kể cả các ngày nghỉ không có dữ liệu)
+        state[self.symbol] = (end_exclusive - timedelta(days=1)).strftime("%Y-%m-%d")
+        self._save_state(state)
+        self.logger.info(f"Exported {days_written} day partitions to {self.root_path}")
+        return days_written
@@ -1,28 +1,108 @@
 from config.logger_config import LoggerConfig
 from config.mongo_config import MongoConfig
-from config.variable_config import GOLD_DATA_CONFIG
-from pymongo.errors import BulkWriteError
+from config.variable_config import (
+    GOLD_DATA_CONFIG,
+    ROLLUP_CONFIG,
+    PUBLISHER_CONFIG,
+    ARRAY_STORE_CONFIG,
+    SPOOL_CONFIG,
+    RECENT_KEY_INDEX_CONFIG,
+    WRITE_CONCERN_CONFIG,
+    CANDLE_STATE_CONFIG,
+)
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from src.etl.load.rollup_load import CandleRollupLoad
+from src.utils.candle_publisher import CandlePublisher
+from src.utils.candle_record import Candle
+from src.utils.ohlcv_array_store import OhlcvArrayStore
+from src.utils.freshness_tracker_util import FreshnessTrackerUtil
+from src.utils.write_spool_util import (
+    WriteSpoolUtil,
+    dead_letter,
+    is_transient_write_error,
+)
+from src.utils.recent_key_index_util import RecentKeyIndexUtil
+from src.utils.ingest_watermark_util import IngestWatermarkUtil
+from src.utils.candle_state_util import (
+    FINAL,
+    FORMING,
+    PROVISIONAL,
+    STATES,
+    writable_filter,
+)
+from datetime import datetime, timedelta
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
 
 
 class RealtimeMetatraderLoad:
-    def __init__(self) -> None:
+    def __init__(self, clock=None, side_effects: bool = True) -> None:
+        """
+        Args:
+            clock: Đồng hồ cho metadata ingest (replay truyền đồng hồ mô phỏng)
+            side_effects: Dùng spool, array store, recent key index, rollup và
+                publisher. Process ghi chạy song song với main.py (VD: scripts/backfill.py)
+                tắt đi vì spool / memmap / cổng publisher chỉ an toàn với một process.
+        """
         try:
             self.logger = LoggerConfig.logger_config(
                 "Load realtime metatrader gold data"
             )
             self.batch_size_extract = GOLD_DATA_CONFIG["batch_size_extract"]
             self.mongo_config = MongoConfig()
-            self.mongo_client = self.mongo_config.get_client()
+            self.mongo_client = self.mongo_config.get_client("realtime")
             self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
             self.gold_collection = self.gold_db.get_collection(
                 GOLD_DATA_CONFIG["collection"]
             )
-            try:
-                self.gold_collection.create_index(
-                    [("datetime", 1)], unique=True, background=True
-                )
-            except Exception:
-                self.logger.debug("Index creation skipped or failed; continuing")
+            # Nến đang hình thành ghi với write concern nhẹ (w=1, không journal);
+            # nến đã finalize ghi với majority + journal
+            self.provisional_collection = self.gold_collection.with_options(
+                write_concern=self.mongo_config.write_concern("provisional")
+            )
+            self.final_collection = self.gold_collection.with_options(
+                write_concern=self.mongo_config.write_concern("final")
+            )
+            self.spool_provisional = WRITE_CONCERN_CONFIG["provisional"]["spool"]
+            self.settle_seconds = CANDLE_STATE_CONFIG["settle_seconds"]
+            # Giá trị đã ghi gần nhất của các nến vừa upsert: bỏ qua lần ghi không đổi,
+            # chỉ gửi các trường thay đổi
+            self._last_written = {}
+            self.upsert_stats = {"sent": 0, "skipped": 0, "fields_sent": 0}
+            # Nến spike chờ xóa khi spool còn backlog (xem remove_candles)
+            self._pending_removals = set()
+            # Đồng hồ dùng cho metadata ingest (replay truyền đồng hồ mô phỏng)
+            self.clock = clock or datetime.now
+            self.freshness = FreshnessTrackerUtil()
+            self.rollups = (
+                CandleRollupLoad()
+                if side_effects and ROLLUP_CONFIG["enabled"]
+                else None
+            )
+            self.publisher = (
+                CandlePublisher()
+                if side_effects and PUBLISHER_CONFIG["enabled"]
+                else None
+            )
+            self.array_store = (
+                OhlcvArrayStore.get_store()
+                if side_effects and ARRAY_STORE_CONFIG["enabled"]
+                else None
+            )
+            # Mọi batch ghi đi qua spool trên đĩa, chỉ xóa sau khi Mongo xác nhận
+            self.spool = (
+                WriteSpoolUtil("realtime")
+                if side_effects and SPOOL_CONFIG["enabled"]
+                else None
+            )
+            # Import lịch sử chạy song song không ghi vào các phút realtime đã nhận
+            self.watermark = IngestWatermarkUtil()
+            self.recent_keys = (
+                RecentKeyIndexUtil.get_index()
+                if side_effects and RECENT_KEY_INDEX_CONFIG["enabled"]
+                else None
+            )
             self.logger.info("Successfully to connect MongoDB Config")
         except Exception as e:
             self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
@@ -32,19 +112,83 @@ class RealtimeMetatraderLoad:
         for i in range(0, len(df), chunk_size):
             yield df.iloc[i : i + chunk_size]
 
-    def realtime_load(self, df):
+    def _after_finalized(
+        self, candles, finalized_at, source, event="insert", state=FINAL
+    ):
+        """
+        Cập nhật thống kê độ trễ, rollup và phát event sau khi các nến phút đóng cửa
+        (state=provisional) hoặc được ghi thẳng ở trạng thái final
+        """
+        candles = list(candles)
+        datetimes = [candle["datetime"] for candle in candles]
+        self.freshness.record_many(datetimes, finalized_at, source)
+        if self.recent_keys is not None:
+            self.recent_keys.add(datetimes)
+        if self.array_store is not None:
+            self.array_store.write_records(candles)
+        if self.rollups is not None:
+            self.rollups.update_for_minutes(datetimes)
+        if self.publisher is not None:
+            for candle in candles:
+                self.publisher.publish(
+                    event, {**candle, "state": state, "final": state == FINAL}
+                )
+
+    def _spool_backlogged(self):
+        """
+        True nếu spool còn batch chưa ghi được vào Mongo. Khi đó thử replay trước,
+        nếu vẫn còn pending thì các lần ghi mới chỉ được append vào spool để giữ
+        đúng thứ tự và không chặn vòng ingest chờ Mongo timeout.
+        """
+        if self.spool is None or not self.spool.has_pending():
+            return False
+        self.replay_spool()
+        return self.spool.has_pending()
+
+    def realtime_load(self, df, source="realtime"):
+        """
+        Insert các nến đã hoàn thành (đã finalize) kèm metadata ingest
+
+        Args:
+            df: DataFrame các nến cần insert
+            source: Nguồn ghi để thống kê độ trễ (realtime, gap_fill, ...)
+
+        Returns:
+            dict: inserted, duplicates (phút đã có), errors (không ghi được và không
+                nằm trong spool), queued (nằm trong spool chờ replay)
+        """
         self.logger.info("Start load batch realtime metatrader data ...")
         chunk_size = self.batch_size_extract
         batch_count = 0
+        counts = {"inserted": 0, "duplicates": 0, "errors": 0, "queued": 0}
+        if df is not None and not df.empty:
+            self.watermark.claim(df["datetime"].min())
+        backlogged = self._spool_backlogged()
         for chunk in self.chunk_data_frame(df, chunk_size=chunk_size):
+            now = self.clock()
+            chunk_data = chunk.assign(
+                first_seen_at=now, updated_at=now, finalized_at=now, state=FINAL
+            ).to_dict("records")
+            batch_id = (
+                self.spool.append_inserts(chunk_data) if self.spool is not None else None
+            )
+            if backlogged:
+                self.logger.warning(
+                    f"MongoDB backlog in spool, queued {len(chunk_data)} records for replay"
+                )
+                counts["queued"] += len(chunk_data)
+                continue
             try:
-                chunk_data = chunk.to_dict("records")
-                result = self.gold_collection.insert_many(chunk_data, ordered=False)
+                result = self.final_collection.insert_many(chunk_data, ordered=False)
                 inserted = (
                     len(result.inserted_ids)
                     if result and getattr(result, "inserted_ids", None) is not None
                     else 0
                 )
+                if batch_id:
+                    self.spool.ack(batch_id)
+                counts["inserted"] += inserted
+                self._after_finalized(chunk_data, now, source)
                 batch_count += 1
                 self.logger.info(
                     f"Batch {batch_count} inserted {inserted}/{len(chunk_data)} records"
@@ -55,45 +199,373 @@ class RealtimeMetatraderLoad:
                 writeErrors = details.get("writeErrors", []) or []
                 dup_count = sum(1 for we in writeErrors if we.get("code") == 11000)
                 other_errors = [we for we in writeErrors if we.get("code") != 11000]
+                failed_indexes = {we.get("index") for we in writeErrors}
+                transient = [we for we in other_errors if is_transient_write_error(we)]
+                # Lỗi vĩnh viễn (VD: 121 document validation) không được giữ trong
+                # spool: ghi lại sẽ bị từ chối mãi và chặn mọi lần ghi sau
+                rejected = [
+                    (chunk_data[we["index"]], we)
+                    for we in other_errors
+                    if not is_transient_write_error(we)
+                ]
+                dead_lettered = dead_letter(self.final_collection, rejected, source)
+                if batch_id and not transient and dead_lettered:
+                    self.spool.ack(batch_id)
+                elif batch_id:
+                    # Batch vẫn nằm trong spool, các batch sau xếp hàng chờ replay
+                    backlogged = True
+                counts["inserted"] += nInserted
+                counts["duplicates"] += dup_count
+                counts["errors"] += len(rejected)
+                counts["queued" if batch_id else "errors"] += len(transient)
+                if self.recent_keys is not None:
+                    # Duplicate key nghĩa là phút đó đã có trong Mongo
+                    self.recent_keys.add(
+                        chunk_data[we["index"]]["datetime"]
+                        for we in writeErrors
+                        if we.get("code") == 11000
+                    )
+                self._after_finalized(
+                    (doc for i, doc in enumerate(chunk_data) if i not in failed_indexes),
+                    now,
+                    source,
+                )
                 batch_count += 1
                 self.logger.info(
                     f"Batch {batch_count} partial insert: {nInserted}/{len(chunk_data)} inserted, duplicates: {dup_count}, other write errors: {len(other_errors)}"
                 )
                 if other_errors:
                     self.logger.error(
-                        f"Non-duplicate write error in batch {batch_count}: {other_errors[0]}"
+                        f"Non-duplicate write error in batch {batch_count} "
+                        f"({len(rejected)} moved to quarantine): {other_errors[0]}"
                     )
             except Exception as e:
                 self.logger.error(f"Error to load realtime metatrader data: {str(e)}")
+                counts["queued" if batch_id else "errors"] += len(chunk_data)
+                if batch_id:
+                    # Batch vẫn nằm trong spool, các batch sau xếp hàng chờ replay
+                    backlogged = True
         self.logger.info(f"Total batches processed: {batch_count}")
+        return counts
+
+    def replay_spool(self) -> int:
+        """
+        Ghi lại vào Mongo các batch còn pending trong spool (gọi khi khởi động và định kỳ)
 
-    def upsert_current_minute_candle(self, df):
-        """Upsert nến phút hiện tại - update nếu tồn tại, insert nếu chưa có"""
+        Returns:
+            int: Số operation đã replay thành công
+        """
+        if self.spool is None or not self.spool.has_pending():
+            return 0
+        ops = self.spool.replay(self.final_collection)
+        now = self.clock()
+        finalized = [op["doc"] for op in ops if op["op"] == "insert"]
+        provisional, forming = [], []
+        for op in ops:
+            if op["op"] != "update":
+                continue
+            # Upsert chỉ gửi trường thay đổi: phần còn lại nằm trong $setOnInsert
+            candle = {**op["update"].get("$setOnInsert", {}), **op["update"]["$set"]}
+            if "$min" in op["update"]:
+                provisional.append(candle)
+            else:
+                forming.append(candle)
+        if finalized:
+            self._after_finalized(finalized, now, "spool_replay")
+        if provisional:
+            self._after_finalized(
+                provisional, now, "spool_replay", event="update", state=PROVISIONAL
+            )
+        if forming:
+            if self.array_store is not None:
+                self.array_store.write_records(forming)
+            if self.recent_keys is not None:
+                self.recent_keys.add(c["datetime"] for c in forming)
+            if self.rollups is not None:
+                self.rollups.update_for_minutes([c["datetime"] for c in forming])
+        return len(ops)
+
+    def reconcile_window(self, df, source="latest_n_bars", keep=None):
+        """
+        Đồng bộ Mongo với đúng các nến vừa lấy trong khoảng [nến cũ nhất, nến mới nhất]:
+        merge tuần tự danh sách nến (đã sort) với cursor Mongo (sort theo datetime,
+        chỉ lấy OHLCV) trên cùng khoảng, sinh ra tập insert / update / delete chính xác
+        và ghi bằng một bulk_write. Chi phí tỉ lệ với kích thước cửa sổ, không phải
+        cả collection. Nến phút hiện tại (đang hình thành) do job upsert xử lý.
+        Đây là đường sửa dữ liệu theo nguồn nên được ghi đè cả nến final; mọi nến
+        ghi ở đây đều ở trạng thái final.
+
+        Args:
+            df: DataFrame các nến (datetime, open, high, low, close, volume)
+            source: Nguồn ghi để thống kê độ trễ
+            keep: Các datetime nguồn có trả về nhưng bị loại khi validate -
+                giữ nguyên bản trong Mongo thay vì xóa
+
+        Returns:
+            dict: Số nến inserted / updated / deleted / unchanged
+        """
+        counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        if df is None or df.empty:
+            return counts
+
+        now = self.clock()
+        current_minute = now.replace(second=0, microsecond=0)
+        bars = (
+            df[df["datetime"] < current_minute]
+            .sort_values("datetime")
+            .drop_duplicates(subset=["datetime"])
+        )
+        if bars.empty:
+            return counts
+        window_start = bars["datetime"].iloc[0]
+        window_end = bars["datetime"].iloc[-1]
+        self.watermark.claim(window_start)
+        fetched = bars[["datetime", *OHLCV_FIELDS]].to_dict("records")
+
+        cursor = self.gold_collection.find(
+            {"datetime": {"$gte": window_start, "$lte": window_end}},
+            {"datetime": 1, **{field: 1 for field in OHLCV_FIELDS}},
+        ).sort("datetime", 1)
+
+        requests, inserted, updated, deleted = [], [], [], []
+        fetched_iter = iter(fetched)
+        bar = next(fetched_iter, None)
+        for doc in cursor:
+            # Các nến lấy về nằm trước doc hiện tại: chưa có trong Mongo
+            while bar is not None and bar["datetime"] < doc["datetime"]:
+                inserted.append(bar)
+                bar = next(fetched_iter, None)
+            if bar is not None and bar["datetime"] == doc["datetime"]:
+                if any(bar[field] != doc.get(field) for field in OHLCV_FIELDS):
+                    updated.append(bar)
+                else:
+                    counts["unchanged"] += 1
+                bar = next(fetched_iter, None)
+            elif keep and doc["datetime"] in keep:
+                counts["unchanged"] += 1
+            else:
+                # Có trong Mongo nhưng không còn trong dữ liệu nguồn
+                deleted.append(doc)
+        while bar is not None:
+            inserted.append(bar)
+            bar = next(fetched_iter, None)
+
+        for candle in inserted:
+            requests.append(
+                InsertOne(
+                    {
+                        **candle,
+                        "first_seen_at": now,
+                        "updated_at": now,
+                        "finalized_at": now,
+                        "state": FINAL,
+                    }
+                )
+            )
+        for candle in updated:
+            requests.append(
+                UpdateOne(
+                    {"datetime": candle["datetime"]},
+                    {"$set": {**candle, "updated_at": now, "state": FINAL}},
+                )
+            )
+        for doc in deleted:
+            requests.append(DeleteOne({"_id": doc["_id"]}))
+
+        if not requests:
+            self.logger.info(
+                f"Window {window_start} -> {window_end} already in sync ({counts['unchanged']} candles)"
+            )
+            return counts
+
+        failed_indexes = set()
+        try:
+            self.final_collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as bwe:
+            write_errors = (bwe.details or {}).get("writeErrors", []) or []
+            failed_indexes = {we.get("index") for we in write_errors}
+            other_errors = [we for we in write_errors if we.get("code") != 11000]
+            if other_errors:
+                self.logger.error(
+                    f"Non-duplicate write error while reconciling window: {other_errors[0]}"
+                )
+        except Exception as e:
+            self.logger.error(f"Error to reconcile latest window: {str(e)}")
+            return counts
+
+        n_inserted, n_updated = len(inserted), len(updated)
+        inserted = [c for i, c in enumerate(inserted) if i not in failed_indexes]
+        updated = [
+            c for i, c in enumerate(updated, n_inserted) if i not in failed_indexes
+        ]
+        deleted = [
+            d["datetime"]
+            for i, d in enumerate(deleted, n_inserted + n_updated)
+            if i not in failed_indexes
+        ]
+
+        if inserted:
+            self._after_finalized(inserted, now, source)
+        if updated:
+            self._after_finalized(updated, now, source, event="update")
+        if deleted:
+            if self.recent_keys is not None:
+                self.recent_keys.remove(deleted)
+            if self.array_store is not None:
+                self.array_store.remove(deleted)
+            if self.rollups is not None:
+                self.rollups.update_for_minutes(deleted)
+
+        counts.update(
+            inserted=len(inserted), updated=len(updated), deleted=len(deleted)
+        )
+        self.logger.info(
+            f"Reconciled window {window_start} -> {window_end}: "
+            f"inserted={counts['inserted']}, updated={counts['updated']}, "
+            f"deleted={counts['deleted']}, unchanged={counts['unchanged']}"
+        )
+        return counts
+
+    def upsert_current_minute_candle(self, df, finalize=False):
+        """Upsert các nến trong DataFrame (xem upsert_candles)"""
         if df.empty:
             self.logger.warning("No data to upsert")
             return
+        self.upsert_candles(Candle.from_frame(df), finalize=finalize)
+
+    def upsert_candles(self, candles, finalize=False):
+        """
+        Upsert nến phút hiện tại - update nếu tồn tại, insert nếu chưa có.
+        Upsert có điều kiện theo state: nến forming chỉ ghi đè nến forming, nến
+        provisional chỉ ghi đè nến forming / provisional; nến đã final bị bỏ qua.
+        Nến không đổi so với lần ghi trước thì không gửi; nến có thay đổi chỉ $set
+        các trường đổi (các trường còn lại trong $setOnInsert phòng khi document
+        chưa có).
+
+        Args:
+            candles: Danh sách Candle cần upsert (đường realtime mỗi tick không
+                tạo DataFrame)
+            finalize: True khi nến vừa đóng cửa (state=provisional), sẽ ghi
+                finalized_at và thống kê độ trễ; promote_settled_candles chuyển
+                sang final sau settle_seconds
+        """
+        if not candles:
+            self.logger.warning("No data to upsert")
+            return
 
         self.logger.info("Upserting current minute candle...")
+        self.watermark.claim(min(candle.datetime for candle in candles))
+        backlogged = self._spool_backlogged()
+        collection = self.final_collection if finalize else self.provisional_collection
+        spool = self.spool if finalize or self.spool_provisional else None
+        state = PROVISIONAL if finalize else FORMING
 
-        for _, row in df.iterrows():
-            candle_data = row.to_dict()
-            datetime_key = candle_data["datetime"]
+        for candle in candles:
+            datetime_key = candle.datetime
+            fields = candle.fields()
+            changed = self._changed_fields(datetime_key, fields, state)
+            if changed is None:
+                self.upsert_stats["skipped"] += 1
+                continue
 
             try:
-                # Sử dụng upsert: update nếu tồn tại, insert nếu chưa có
-                result = self.gold_collection.update_one(
-                    {"datetime": datetime_key},  # Filter theo datetime
-                    {"$set": candle_data},  # Update toàn bộ document
-                    upsert=True,  # Insert nếu không tìm thấy
+                now = self.clock()
+                update = {
+                    "$set": {**changed, "updated_at": now, "state": state},
+                    "$setOnInsert": {
+                        "datetime": datetime_key,
+                        "first_seen_at": now,
+                        **{k: v for k, v in fields.items() if k not in changed},
+                    },
+                }
+                if finalize:
+                    # $min giữ lại thời điểm finalize đầu tiên nếu nến bị ghi lại
+                    update["$min"] = {"finalized_at": now}
+
+                condition = writable_filter(datetime_key, state)
+                batch_id = (
+                    spool.append_update(condition, update)
+                    if spool is not None
+                    else None
                 )
+                if backlogged:
+                    if batch_id:
+                        self._remember_written(datetime_key, fields, state)
+                    self.logger.warning(
+                        f"MongoDB backlog in spool, "
+                        f"{'queued' if batch_id else 'skipped provisional'} candle {datetime_key}"
+                    )
+                    continue
+
+                # Sử dụng upsert: update nếu tồn tại, insert nếu chưa có
+                try:
+                    result = collection.update_one(
+                        condition,  # Filter theo datetime + state được phép ghi đè
+                        update,
+                        upsert=True,  # Insert nếu không tìm thấy
+                    )
+                except DuplicateKeyError:
+                    # Nến đã ở trạng thái sau (VD: đã final), không ghi lại
+                    if batch_id:
+                        self.spool.ack(batch_id)
+                    self._remember_written(
+                        datetime_key, None, STATES[STATES.index(state) + 1]
+                    )
+                    self.logger.debug(
+                        f"Candle {datetime_key} already past '{state}', upsert skipped"
+                    )
+                    continue
+                except WriteError as e:
+                    self._last_written.pop(datetime_key, None)
+                    write_error = {"code": e.code, "errmsg": str(e)}
+                    if is_transient_write_error(write_error) or not dead_letter(
+                        collection, [(candle.to_doc(), write_error)], "realtime"
+                    ):
+                        backlogged = batch_id is not None
+                        raise
+                    # Bị từ chối vĩnh viễn: đã vào quarantine, không giữ trong spool
+                    if batch_id:
+                        self.spool.ack(batch_id)
+                    self.logger.error(
+                        f"Candle {datetime_key} rejected by MongoDB, moved to quarantine: {e}"
+                    )
+                    continue
+                except Exception:
+                    backlogged = batch_id is not None
+                    self._last_written.pop(datetime_key, None)
+                    raise
+                if batch_id:
+                    self.spool.ack(batch_id)
+                self._remember_written(datetime_key, fields, state)
+                self.upsert_stats["sent"] += 1
+                self.upsert_stats["fields_sent"] += len(changed)
+                # w=0: không có kết quả, coi như update (upsert_id / modified_count không xác định)
+                upserted_id = result.upserted_id if result.acknowledged else None
+                event = "insert" if upserted_id else "update"
+                candle_data = candle.to_doc()
+                if finalize:
+                    self._after_finalized(
+                        [candle_data], now, "realtime", event=event, state=PROVISIONAL
+                    )
+                else:
+                    if self.array_store is not None:
+                        self.array_store.write_record(candle_data)
+                    if self.recent_keys is not None:
+                        self.recent_keys.add([datetime_key])
+                    if upserted_id and self.rollups is not None:
+                        self.rollups.update_for_minutes([datetime_key])
+                    if self.publisher is not None:
+                        self.publisher.publish(
+                            event, {**candle_data, "state": FORMING, "final": False}
+                        )
 
-                if result.upserted_id:
+                if upserted_id:
                     self.logger.info(
-                        f"Inserted new candle for {datetime_key}: close={candle_data.get('close')}, volume={candle_data.get('volume')}"
+                        f"Inserted new candle for {datetime_key}: close={candle.close}, volume={candle.volume}"
                     )
-                elif result.modified_count > 0:
+                elif result.acknowledged and result.modified_count > 0:
                     self.logger.info(
-                        f"Updated candle for {datetime_key}: close={candle_data.get('close')}, volume={candle_data.get('volume')}"
+                        f"Updated candle for {datetime_key}: close={candle.close}, volume={candle.volume}"
                     )
                 else:
                     self.logger.debug(f"No changes for candle {datetime_key}")
@@ -102,3 +574,131 @@ class RealtimeMetatraderLoad:
                 self.logger.error(
                     f"Error upserting candle for {datetime_key}: {str(e)}"
                 )
+
+    def _changed_fields(self, datetime_key, fields, state):
+        """
+        So với lần ghi trước của cùng nến
+
+        Returns:
+            dict | None: Các trường cần $set (toàn bộ nếu chưa ghi lần nào),
+                None nếu không cần ghi (không đổi, hoặc nến đã qua state này)
+        """
+        last = self._last_written.get(datetime_key)
+        if last is None:
+            return fields
+        if STATES.index(last["state"]) > STATES.index(state):
+            return None
+        if last["state"] != state or last["fields"] is None:
+            return fields
+        changed = {k: v for k, v in fields.items() if last["fields"].get(k) != v}
+        return changed or None
+
+    def _remember_written(self, datetime_key, fields, state):
+        """Ghi nhớ giá trị vừa ghi, chỉ giữ vài phút gần nhất"""
+        self._last_written[datetime_key] = {"state": state, "fields": fields}
+        if len(self._last_written) > 4:
+            for key in sorted(self._last_written)[:-4]:
+                del self._last_written[key]
+
+    def remove_candles(self, datetimes) -> int:
+        """
+        Xóa các nến phút đã load nhưng bị validate xác định là spike muộn
+        (CandleValidateTransform.pop_late_spikes). Khi spool còn batch chưa ghi,
+        nến có thể vẫn nằm trong spool: giữ lại và xóa ở lần gọi sau.
+
+        Returns:
+            int: Số nến đã xóa khỏi Mongo
+        """
+        self._pending_removals.update(datetimes)
+        if not self._pending_removals or self._spool_backlogged():
+            return 0
+        removed = sorted(self._pending_removals)
+        try:
+            result = self.final_collection.delete_many({"datetime": {"$in": removed}})
+        except Exception as e:
+            self.logger.error(f"Error to remove {len(removed)} spike candles: {str(e)}")
+            return 0
+        self._pending_removals.clear()
+        for key in removed:
+            self._last_written.pop(key, None)
+        if self.recent_keys is not None:
+            self.recent_keys.remove(removed)
+        if self.array_store is not None:
+            self.array_store.remove(removed)
+        if self.rollups is not None:
+            self.rollups.update_for_minutes(removed)
+        self.logger.warning(
+            f"Removed {result.deleted_count} spike candles: {removed[0]} -> {removed[-1]}"
+        )
+        return result.deleted_count
+
+    def get_upsert_stats(self) -> dict:
+        """Số lần upsert nến đã gửi / bỏ qua vì không đổi và tổng số trường đã $set"""
+        return dict(self.upsert_stats)
+
+    def _settle_cutoff(self, now):
+        """Nến phút t đóng cửa lúc t + 1 phút, coi là đã ổn định sau settle_seconds"""
+        return now - timedelta(seconds=self.settle_seconds, minutes=1)
+
+    def stale_forming_candles(self) -> list:
+        """
+        Datetime các nến vẫn ở trạng thái forming dù phút đã đóng cửa quá
+        settle_seconds (process khởi động lại / lần finalize bị lỡ). Giá trị của
+        chúng là ảnh chụp giữa phút: pipeline lấy lại từ nguồn qua đường finalize.
+        """
+        cutoff = self._settle_cutoff(self.clock())
+        return [
+            doc["datetime"]
+            for doc in self.gold_collection.find(
+                {"state": FORMING, "datetime": {"$lte": cutoff}},
+                {"_id": 0, "datetime": 1},
+            ).sort("datetime", 1)
+        ]
+
+    def promote_settled_candles(self) -> int:
+        """
+        Chuyển các nến provisional đã đóng cửa quá settle_seconds sang final
+        (một find + một update_many có điều kiện state). Nến forming bị bỏ lại quá
+        hạn mà không lấy lại được từ nguồn cũng được chuyển sang final với giá trị
+        cuối cùng đã ghi, để không nằm ở trạng thái forming mãi mãi.
+
+        Returns:
+            int: Số nến đã chuyển sang final
+        """
+        now = self.clock()
+        cutoff = self._settle_cutoff(now)
+        unconfirmed = {"$in": [FORMING, PROVISIONAL]}
+        candles = list(
+            self.gold_collection.find(
+                {"state": unconfirmed, "datetime": {"$lte": cutoff}},
+                {"_id": 0, "state": 1, "datetime": 1, **{field: 1 for field in OHLCV_FIELDS}},
+            ).sort("datetime", 1)
+        )
+        if not candles:
+            return 0
+        try:
+            result = self.final_collection.update_many(
+                {
+                    "datetime": {"$in": [c["datetime"] for c in candles]},
+                    "state": unconfirmed,
+                },
+                {"$set": {"state": FINAL, "confirmed_at": now}},
+            )
+        except Exception as e:
+            self.logger.error(f"Error to promote provisional candles: {str(e)}")
+            return 0
+        stale = [c["datetime"] for c in candles if c.pop("state") == FORMING]
+        if stale:
+            self.logger.warning(
+                f"Promoted {len(stale)} stale forming candles without a refetch: "
+                f"{stale[0]} -> {stale[-1]}"
+            )
+        if self.publisher is not None:
+            for candle in candles:
+                self.publisher.publish(
+                    "update", {**candle, "state": FINAL, "final": True}
+                )
+        self.logger.info(
+            f"Promoted {result.modified_count} provisional candles to final (before {cutoff})"
+        )
+        return result.modified_count
@@ -0,0 +1,238 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import GOLD_DATA_CONFIG, RETENTION_CONFIG
+from src.utils.candle_archive_codec import decode_month, decode_rows, encode_month
+
+ARCHIVE_PROJECTION = {
+    "_id": 0,
+    "datetime": 1,
+    "open": 1,
+    "high": 1,
+    "low": 1,
+    "close": 1,
+    "volume": 1,
+}
+
+
+def archive_collection_name(collection_name: Optional[str] = None) -> str:
+    """Tên collection archive tháng, VD: gold_minute_data_archive"""
+    return f"{collection_name or GOLD_DATA_CONFIG['collection']}_archive"
+
+
+def month_start(dt: datetime) -> datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(dt: datetime) -> datetime:
+    dt = month_start(dt)
+    return dt.replace(year=dt.year + 1, month=1) if dt.month == 12 else dt.replace(month=dt.month + 1)
+
+
+def hot_boundary(now: datetime, hot_days: Optional[int] = None) -> datetime:
+    """
+    Phút đầu tiên của tier nóng: đầu tháng chứa (now - hot_days).
+    Chỉ archive trọn tháng nên tier nóng giữ từ hot_days tới hot_days + 1 tháng.
+    """
+    hot_days = RETENTION_CONFIG["hot_days"] if hot_days is None else hot_days
+    return month_start(now - timedelta(days=hot_days))
+
+
+class CandleArchiveReader:
+    """
+    Đọc nến phút từ collection archive (một document mỗi tháng) để query và
+    coverage check thấy dữ liệu của cả hai tier.
+    """
+
+    def __init__(self, archive_collection, boundary_ttl_seconds: float = 60.0):
+        self.archive_collection = archive_collection
+        self.boundary_ttl_seconds = boundary_ttl_seconds
+        self._boundary = None
+        self._boundary_expires = 0.0
+        self._lock = threading.Lock()
+
+    def boundary(self) -> Optional[datetime]:
+        """Đầu tháng kế tiếp tháng archive mới nhất (None = chưa có archive), cache ngắn hạn"""
+        with self._lock:
+            if time.monotonic() < self._boundary_expires:
+                return self._boundary
+        latest = self.archive_collection.find_one(
+            {}, {"_id": 0, "month": 1}, sort=[("month", -1)]
+        )
+        boundary = next_month(latest["month"]) if latest else None
+        with self._lock:
+            self._boundary = boundary
+            self._boundary_expires = time.monotonic() + self.boundary_ttl_seconds
+        return boundary
+
+    def invalidate(self):
+        with self._lock:
+            self._boundary_expires = 0.0
+
+    def _months(self, start: datetime, end: datetime, projection=None):
+        return self.archive_collection.find(
+            {"month": {"$gte": month_start(start), "$lte": end}}, projection
+        ).sort("month", 1)
+
+    def read_range(
+        self, start: datetime, end: datetime, limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Nến phút trong [start, end] đã archive, sort theo datetime"""
+        rows = []
+        for doc in self._months(start, end):
+            rows.extend(decode_rows(doc, start, end))
+            if limit is not None and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+
+    def day_counts(self, start: datetime, end: datetime) -> Dict[str, int]:
+        """Số nến mỗi ngày trong archive (đọc từ tóm tắt của document, không giải nén)"""
+        counts = {}
+        first_day, last_day = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+        for doc in self._months(start, end, {"_id": 0, "days": 1}):
+            for day, count in doc.get("days", {}).items():
+                if first_day <= day <= last_day:
+                    counts[day] = counts.get(day, 0) + count
+        return counts
+
+    def first_datetime(self) -> Optional[datetime]:
+        first = self.archive_collection.find_one(
+            {}, {"_id": 0, "start": 1}, sort=[("month", 1)]
+        )
+        return first["start"] if first else None
+
+
+class CandleRetentionLoad:
+    """
+    Giữ hot_days gần nhất dạng document phút trong collection chính; các tháng cũ
+    hơn được nén thành một document mỗi tháng trong <collection>_archive:
+
+        {_id: "2024-01", month, symbol, count, start, end, days: {ngày: số nến},
+         codec, columns: {datetime|open|high|low|close|volume: cột delta + zlib}}
+
+    Mỗi tháng: đọc nến phút (gộp với archive đã có nếu có nến đến muộn), ghi
+    archive, đọc lại để kiểm tra, rồi mới xóa đúng các phút đã archive khỏi
+    collection chính. Dừng giữa chừng thì lần chạy sau gộp lại, không mất dữ liệu.
+    """
+
+    def __init__(self, hot_days: Optional[int] = None) -> None:
+        try:
+            self.logger = LoggerConfig.logger_config("Retention gold data")
+            self.mongo_config = MongoConfig()
+            self.mongo_client = self.mongo_config.get_client("bulk")
+            self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
+            self.gold_collection = self.gold_db.get_collection(
+                GOLD_DATA_CONFIG["collection"]
+            )
+            # Archive phải bền (majority + journal) trước khi xóa nến phút
+            self.archive_collection = self.gold_db.get_collection(
+                archive_collection_name()
+            ).with_options(write_concern=self.mongo_config.write_concern("final"))
+            self.reader = CandleArchiveReader(self.archive_collection)
+            self.symbol = GOLD_DATA_CONFIG["symbol"]
+            self.hot_days = RETENTION_CONFIG["hot_days"] if hot_days is None else hot_days
+            self.price_scale = RETENTION_CONFIG["price_scale"]
+            self.volume_scale = RETENTION_CONFIG["volume_scale"]
+            self.compression_level = RETENTION_CONFIG["compression_level"]
+            self.delete_batch_size = GOLD_DATA_CONFIG["batch_size_extract"]
+            self.logger.info("Successfully to connect MongoDB Config")
+        except Exception as e:
+            self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
+            raise
+
+    def archive_month(self, month: datetime) -> dict:
+        """
+        Nén một tháng vào archive và xóa các phút đó khỏi collection chính
+
+        Returns:
+            dict: {"archived": số nến trong archive của tháng, "deleted": số document đã xóa}
+        """
+        month = month_start(month)
+        end = next_month(month)
+        live_df = pd.DataFrame(
+            list(
+                self.gold_collection.find(
+                    {"datetime": {"$gte": month, "$lt": end}}, ARCHIVE_PROJECTION
+                )
+                .sort("datetime", 1)
+                .batch_size(self.delete_batch_size)
+            )
+        )
+        if live_df.empty:
+            return {"archived": 0, "deleted": 0}
+
+        key = month.strftime("%Y-%m")
+        existing = self.archive_collection.find_one({"_id": key})
+        # Nến trong collection chính mới hơn bản trong archive
+        df = pd.concat([decode_month(existing), live_df]) if existing else live_df
+        encoded = encode_month(
+            df,
+            price_scale=self.price_scale,
+            volume_scale=self.volume_scale,
+            level=self.compression_level,
+        )
+        doc = {
+            "_id": key,
+            "month": month,
+            "symbol": self.symbol,
+            **encoded,
+            "archived_at": datetime.now(),
+        }
+        self.archive_collection.replace_one({"_id": key}, doc, upsert=True)
+
+        # Chỉ xóa khi đọc lại archive thấy đủ mọi phút sắp xóa
+        stored = decode_month(self.archive_collection.find_one({"_id": key}))
+        live_minutes = pd.to_datetime(live_df["datetime"])
+        if len(stored) != encoded["count"] or not live_minutes.isin(stored["datetime"]).all():
+            raise RuntimeError(f"Archive verification failed for {key}, live data kept")
+
+        deleted = 0
+        datetimes = [ts.to_pydatetime() for ts in live_minutes]
+        for i in range(0, len(datetimes), self.delete_batch_size):
+            result = self.gold_collection.delete_many(
+                {"datetime": {"$in": datetimes[i : i + self.delete_batch_size]}}
+            )
+            deleted += result.deleted_count
+        self.reader.invalidate()
+        self.logger.info(
+            f"Archived {key}: {encoded['count']} candles, removed {deleted} minute documents"
+        )
+        return {"archived": encoded["count"], "deleted": deleted}
+
+    def run(self, now: Optional[datetime] = None) -> dict:
+        """
+        Archive mọi tháng trọn vẹn nằm trước tier nóng
+
+        Returns:
+            dict: {"boundary", "months", "archived", "deleted"}
+        """
+        boundary = hot_boundary(now or datetime.now(), self.hot_days)
+        summary = {"boundary": boundary, "months": 0, "archived": 0, "deleted": 0}
+        first = self.gold_collection.find_one(
+            {"datetime": {"$lt": boundary}},
+            {"_id": 0, "datetime": 1},
+            sort=[("datetime", 1)],
+        )
+        if first is None:
+            self.logger.info(f"Nothing older than {boundary} to archive")
+            return summary
+
+        month = month_start(first["datetime"])
+        while month < boundary:
+            result = self.archive_month(month)
+            if result["deleted"]:
+                summary["months"] += 1
+                summary["archived"] += result["archived"]
+                summary["deleted"] += result["deleted"]
+            month = next_month(month)
+        self.logger.info(
+            f"Retention done: {summary['months']} months archived before {boundary}, "
+            f"{summary['deleted']} minute documents removed"
+        )
+        return summary
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from pymongo import DeleteOne, UpdateOne
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import GOLD_DATA_CONFIG, ROLLUP_CONFIG
+from src.utils.timeframe_util import bucket_start, mongo_ohlcv_group, timeframe_delta
+
+
+def rollup_collection_name(timeframe: str) -> str:
+    """Tên collection rollup của khung thời gian, VD: gold_minute_data_5m"""
+    return f"{GOLD_DATA_CONFIG['collection']}_{timeframe}"
+
+
+class CandleRollupLoad:
+    """
+    Duy trì các collection nến khung lớn (5m, 15m, 1h, 4h, 1d) từ nến phút.
+
+    Mỗi khung được tính từ khung liền trước (1m → 5m → 15m → 1h → 4h → 1d),
+    nên cập nhật một bucket chỉ đọc vài document nguồn. Khi nến phút được
+    insert/finalize, chỉ các bucket chứa các phút đó được tính lại.
+    """
+
+    def __init__(self) -> None:
+        try:
+            self.logger = LoggerConfig.logger_config("Load rollup gold data")
+            self.mongo_config = MongoConfig()
+            self.mongo_client = self.mongo_config.get_client()
+            self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
+            self.timeframes = ROLLUP_CONFIG["timeframes"]
+            # Nguồn của mỗi khung là khung liền trước, khung đầu tiên đọc từ nến phút
+            self.sources = {}
+            self.collections = {}
+            source = self.gold_db.get_collection(GOLD_DATA_CONFIG["collection"])
+            for timeframe in self.timeframes:
+                collection = self.gold_db.get_collection(
+                    rollup_collection_name(timeframe)
+                )
+                self.sources[timeframe] = source
+                self.collections[timeframe] = collection
+                source = collection
+            self.logger.info("Successfully to connect MongoDB Config")
+        except Exception as e:
+            self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
+            raise
+
+    def _rebuild_buckets(self, timeframe, range_start, range_end, buckets=None):
+        """
+        Tính lại các bucket của timeframe trong [range_start, range_end) từ collection nguồn
+
+        Bucket không còn nến nguồn nào (các phút đã bị xóa: spike, reconcile) bị xóa
+        khỏi rollup thay vì giữ giá trị cũ.
+
+        Args:
+            buckets: Nếu có, chỉ ghi các bucket thuộc tập này
+
+        Returns:
+            int: Số bucket đã ghi hoặc xóa
+        """
+        pipeline = [
+            {"$match": {"datetime": {"$gte": range_start, "$lt": range_end}}},
+            {"$sort": {"datetime": 1}},
+            mongo_ohlcv_group(timeframe),
+        ]
+        now = datetime.now()
+        operations = []
+        rebuilt = set()
+        for bar in self.sources[timeframe].aggregate(pipeline, allowDiskUse=True):
+            bucket = bar.pop("_id")
+            if buckets is not None and bucket not in buckets:
+                continue
+            rebuilt.add(bucket)
+            operations.append(
+                UpdateOne(
+                    {"datetime": bucket},
+                    {"$set": {"datetime": bucket, **bar, "updated_at": now}},
+                    upsert=True,
+                )
+            )
+        if buckets is not None:
+            operations.extend(
+                DeleteOne({"datetime": bucket}) for bucket in sorted(buckets - rebuilt)
+            )
+        if operations:
+            self.collections[timeframe].bulk_write(operations, ordered=False)
+        if buckets is None:
+            # Build cả khoảng: xóa các bucket cũ không còn nến nguồn
+            self.collections[timeframe].delete_many(
+                {"datetime": {"$gte": range_start, "$lt": range_end, "$nin": list(rebuilt)}}
+            )
+        return len(operations)
+
+    def update_for_minutes(self, minute_datetimes: Iterable[datetime]):
+        """
+        Cập nhật các bucket bị ảnh hưởng bởi các nến phút vừa insert/finalize
+
+        Args:
+            minute_datetimes: datetime của các nến phút đã thay đổi
+        """
+        changed = {
+            dt.to_pydatetime() if hasattr(dt, "to_pydatetime") else dt
+            for dt in minute_datetimes
+        }
+        if not changed:
+            return
+        try:
+            for timeframe in self.timeframes:
+                buckets = {bucket_start(dt, timeframe) for dt in changed}
+                self._rebuild_buckets(
+                    timeframe,
+                    min(buckets),
+                    max(buckets) + timeframe_delta(timeframe),
+                    buckets=buckets,
+                )
+                # Khung tiếp theo chỉ cần xét các bucket vừa thay đổi
+                changed = buckets
+        except Exception as e:
+            self.logger.error(f"Error to update rollup candles: {str(e)}")
+
+    def build_all(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ):
+        """
+        Build toàn bộ rollup từ lịch sử có sẵn (chạy một lần), xử lý theo từng cửa sổ ngày
+
+        Args:
+            start: Thời điểm bắt đầu (mặc định: nến phút cũ nhất)
+            end: Thời điểm kết thúc (mặc định: nến phút mới nhất)
+        """
+        minute_collection = self.sources[self.timeframes[0]]
+        if start is None:
+            first = minute_collection.find_one(
+                {}, {"datetime": 1}, sort=[("datetime", 1)]
+            )
+            start = first["datetime"] if first else None
+        if end is None:
+            last = minute_collection.find_one(
+                {}, {"datetime": 1}, sort=[("datetime", -1)]
+            )
+            end = last["datetime"] if last else None
+        if start is None or end is None:
+            self.logger.warning("No minute data found, nothing to build")
+            return
+
+        window = timedelta(days=ROLLUP_CONFIG["build_window_days"])
+        for timeframe in self.timeframes:
+            step = timeframe_delta(timeframe)
+            range_start = bucket_start(start, "1d")
+            range_end = bucket_start(end, timeframe) + step
+            total = 0
+            while range_start < range_end:
+                window_end = min(range_start + window, range_end)
+                total += self._rebuild_buckets(timeframe, range_start, window_end)
+                range_start = window_end
+            self.logger.info(
+                f"Built {total} {timeframe} candles into {rollup_collection_name(timeframe)}"
+            )
@@ -0,0 +1,365 @@
+import math
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pymongo.errors import PyMongoError
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import GOLD_DATA_CONFIG, VALIDATION_CONFIG
+from src.utils.candle_record import Candle
+
+PRICE_FIELDS = ["open", "high", "low", "close"]
+
+# Mỗi lỗi một bit, một nến có thể vi phạm nhiều kiểm tra cùng lúc
+INVALID_DATETIME = 1
+INVALID_PRICE = 2
+HIGH_BELOW_LOW = 4
+OUTSIDE_RANGE = 8
+INVALID_VOLUME = 16
+DUPLICATE_DATETIME = 32
+PRICE_SPIKE = 64
+
+REASONS = {
+    INVALID_DATETIME: "invalid_datetime",
+    INVALID_PRICE: "invalid_price",
+    HIGH_BELOW_LOW: "high_below_low",
+    OUTSIDE_RANGE: "open_close_outside_high_low",
+    INVALID_VOLUME: "invalid_volume",
+    DUPLICATE_DATETIME: "duplicate_datetime",
+    PRICE_SPIKE: "price_spike",
+}
+
+
+def quarantine_collection_name(collection_name: Optional[str] = None) -> str:
+    """Tên collection chứa nến bị loại, VD: gold_minute_data_quarantine"""
+    return f"{collection_name or GOLD_DATA_CONFIG['collection']}_quarantine"
+
+
+class CandleValidateTransform:
+    """
+    Kiểm tra cả batch nến bằng numpy trước khi load (realtime, gap fill, lịch sử):
+
+    - datetime rỗng, giá NaN/inf/<= 0, high < low, open/close nằm ngoài [low, high]
+    - volume NaN hoặc âm, datetime trùng trong batch (giữ bản cuối)
+    - spike: close lệch khỏi median các nến trước quá spike_sigma lần độ lệch
+      chuẩn (ước lượng bằng MAD của log return) và nến kế tiếp quay lại mức cũ.
+      Giá nhảy rồi giữ mức mới (tin tức) không bị coi là spike.
+
+    Nến cuối batch (và nến đơn lẻ của realtime) chưa có nến kế tiếp nên được nhận
+    tạm: nó được kiểm tra lại khi nến kế tiếp tới ở batch sau, nếu là spike thì
+    vào quarantine và nằm trong pop_late_spikes() để pipeline xóa khỏi Mongo.
+
+    Nến lỗi được ghi vào <collection>_quarantine kèm lý do, không chặn batch.
+    Mỗi instance giữ vài nến hợp lệ gần nhất làm ngữ cảnh cho batch nhỏ của realtime.
+    """
+
+    def __init__(self) -> None:
+        try:
+            self.logger = LoggerConfig.logger_config("Validate gold data")
+            self.enabled = VALIDATION_CONFIG["enabled"]
+            self.spike_sigma = VALIDATION_CONFIG["spike_sigma"]
+            self.spike_window = VALIDATION_CONFIG["spike_window"]
+            self.min_sigma = VALIDATION_CONFIG["min_sigma"]
+            self.context_size = VALIDATION_CONFIG["context_size"]
+            self.symbol = GOLD_DATA_CONFIG["symbol"]
+            self.mongo_config = MongoConfig()
+            self.mongo_client = self.mongo_config.get_client("realtime")
+            self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
+            self.quarantine_collection = self.gold_db.get_collection(
+                quarantine_collection_name()
+            )
+            # Close của các nến hợp lệ gần nhất, index là datetime
+            self._context = pd.Series(dtype="float64", index=pd.DatetimeIndex([]))
+            # Nến hợp lệ mới nhất, chưa có nến kế tiếp để kết luận spike
+            self._pending: Optional[dict] = None
+            # Spike phát hiện muộn: datetime -> close, chờ pipeline xóa khỏi Mongo
+            self._late_spikes = {}
+            # Spike đã rút lại gần đây: nguồn trả lại đúng nến đó thì vẫn loại
+            self._retracted = {}
+            self.counts = {"checked": 0, "passed": 0, "quarantined": 0}
+            self.reason_counts = {name: 0 for name in REASONS.values()}
+            self.logger.info("Successfully to connect MongoDB Config")
+        except Exception as e:
+            self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
+            raise
+
+    def _spike_flags(self, datetimes: np.ndarray, closes: np.ndarray, ok: np.ndarray):
+        """Đánh dấu spike trên các nến đã qua các kiểm tra khác (mảng đã sort theo datetime)"""
+        flags = np.zeros(len(closes), dtype=bool)
+        candidates = np.flatnonzero(ok)
+        if len(candidates) == 0:
+            return flags
+        context = self._context[self._context.index < datetimes[candidates[0]]]
+        series = np.concatenate([context.to_numpy(), closes[candidates]])
+        log_prices = np.log(series)
+        returns = np.diff(log_prices)
+        if len(returns) == 0:
+            return flags
+        sigma = max(
+            1.4826 * float(np.median(np.abs(returns - np.median(returns)))),
+            self.min_sigma,
+        )
+        threshold = self.spike_sigma * sigma
+        reference = (
+            pd.Series(log_prices)
+            .rolling(self.spike_window, min_periods=1)
+            .median()
+            .shift(1)
+            .to_numpy()
+        )
+        offset = len(context)
+        deviation = np.abs(log_prices - reference)[offset:]
+        # Nến kế tiếp quay lại: lệch khỏi nến spike cũng vượt ngưỡng
+        reverted = np.zeros(len(candidates), dtype=bool)
+        reverted[:-1] = np.abs(np.diff(log_prices[offset:])) > threshold
+        flags[candidates] = (deviation > threshold) & reverted
+        return flags
+
+    def _settle_pending(self, datetimes: np.ndarray, candle_at, source: str):
+        """
+        Kiểm tra lại nến đang chờ khi đã có nến kế tiếp (nến sớm nhất mới hơn nó),
+        rồi giữ nến mới nhất vừa nhận làm nến chờ tiếp theo.
+
+        Args:
+            datetimes: datetime64 của các nến hợp lệ vừa nhận (không cần sort)
+            candle_at: Hàm trả document (datetime + OHLCV) của nến thứ i
+        """
+        if len(datetimes) == 0:
+            return
+        pending = self._pending
+        if pending is not None:
+            newer = np.flatnonzero(datetimes > np.datetime64(pending["datetime"]))
+            if len(newer):
+                following = candle_at(newer[np.argmin(datetimes[newer])])
+                if self._is_late_spike(pending, following["close"]):
+                    self._retract(pending, source)
+                pending = None
+        latest = int(np.argmax(datetimes))
+        if pending is None or datetimes[latest] > np.datetime64(pending["datetime"]):
+            pending = candle_at(latest)
+        self._pending = pending
+
+    def _is_late_spike(self, pending: dict, following_close: float) -> bool:
+        """Cùng tiêu chí với _spike_flags cho một nến và nến kế tiếp của nó"""
+        history = self._context[self._context.index < pending["datetime"]]
+        if history.empty:
+            return False
+        log_prices = np.log(
+            np.concatenate([history.to_numpy(), [pending["close"], following_close]])
+        )
+        returns = np.diff(log_prices)
+        sigma = max(
+            1.4826 * float(np.median(np.abs(returns - np.median(returns)))),
+            self.min_sigma,
+        )
+        threshold = self.spike_sigma * sigma
+        reference = float(np.median(log_prices[:-2][-self.spike_window :]))
+        return (
+            abs(log_prices[-2] - reference) > threshold
+            and abs(log_prices[-1] - log_prices[-2]) > threshold
+        )
+
+    def _retract(self, candle: dict, source: str):
+        """Nến đã được nhận hóa ra là spike: quarantine và chờ xóa khỏi Mongo"""
+        key = candle["datetime"]
+        self._context = self._context[self._context.index != key]
+        self._late_spikes[key] = candle["close"]
+        self._retracted[key] = candle["close"]
+        while len(self._retracted) > self.context_size:
+            self._retracted.pop(next(iter(self._retracted)))
+        self.counts["passed"] -= 1
+        self.counts["quarantined"] += 1
+        self.reason_counts[REASONS[PRICE_SPIKE]] += 1
+        self._quarantine(pd.DataFrame([candle]), np.array([PRICE_SPIKE]), source)
+        self.logger.warning(
+            f"Late price spike at {key} (close={candle['close']}), retracting candle"
+        )
+
+    def pop_late_spikes(self) -> list:
+        """
+        Datetime các nến đã load nhưng được xác định là spike khi nến kế tiếp tới;
+        caller xóa chúng khỏi Mongo (RealtimeMetatraderLoad.remove_candles)
+        """
+        late = sorted(self._late_spikes)
+        self._late_spikes = {}
+        return late
+
+    def _is_retracted(self, datetime_key, close) -> bool:
+        return self._retracted.get(datetime_key) == close
+
+    def _remember(self, datetimes: np.ndarray, closes: np.ndarray):
+        if len(closes) == 0:
+            return
+        context = pd.concat([self._context, pd.Series(closes, index=datetimes)])
+        context = context[~context.index.duplicated(keep="last")].sort_index()
+        self._context = context.iloc[-self.context_size :]
+
+    def check(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Bitmask lỗi của từng dòng (0 = hợp lệ), theo thứ tự của df
+        """
+        datetimes = pd.to_datetime(df["datetime"]).to_numpy()
+        prices = df[PRICE_FIELDS].to_numpy(dtype="float64", na_value=np.nan)
+        volumes = df["volume"].to_numpy(dtype="float64", na_value=np.nan)
+        open_, high, low, close = prices.T
+
+        mask = np.zeros(len(df), dtype=np.int64)
+        mask[pd.isna(datetimes)] |= INVALID_DATETIME
+        mask[~np.isfinite(prices).all(axis=1) | (prices <= 0).any(axis=1)] |= INVALID_PRICE
+        with np.errstate(invalid="ignore"):
+            mask[high < low] |= HIGH_BELOW_LOW
+            mask[(np.maximum(open_, close) > high) | (np.minimum(open_, close) < low)] |= (
+                OUTSIDE_RANGE
+            )
+            mask[~np.isfinite(volumes) | (volumes < 0)] |= INVALID_VOLUME
+        # Giữ bản đầu tiên của phút trùng, giống drop_duplicates ở extract và adapter
+        mask[pd.Series(datetimes).duplicated(keep="first").to_numpy()] |= DUPLICATE_DATETIME
+        if self._retracted:
+            keys = np.array(list(self._retracted), dtype="datetime64[ns]")
+            for i in np.flatnonzero(np.isin(datetimes, keys)):
+                if self._is_retracted(pd.Timestamp(datetimes[i]).to_pydatetime(), close[i]):
+                    mask[i] |= PRICE_SPIKE
+
+        order = np.argsort(datetimes, kind="stable")
+        spikes = self._spike_flags(datetimes[order], close[order], mask[order] == 0)
+        mask[order[spikes]] |= PRICE_SPIKE
+        return mask
+
+    def check_candle(self, candle: Candle) -> int:
+        """
+        Bitmask lỗi của một nến (0 = hợp lệ), tính bằng phép so sánh scalar.
+        Một nến đơn lẻ không thể trùng datetime; nó chưa có nến kế tiếp nên chỉ
+        bị coi là spike nếu chính nến đó vừa bị rút lại (xem _settle_pending).
+        """
+        prices = [
+            float("nan") if p is None else float(p)
+            for p in (candle.open, candle.high, candle.low, candle.close)
+        ]
+        open_, high, low, close = prices
+        volume = float("nan") if candle.volume is None else float(candle.volume)
+
+        mask = 0
+        if pd.isna(candle.datetime):
+            mask |= INVALID_DATETIME
+        if not all(math.isfinite(p) and p > 0 for p in prices):
+            mask |= INVALID_PRICE
+        if high < low:
+            mask |= HIGH_BELOW_LOW
+        if max(open_, close) > high or min(open_, close) < low:
+            mask |= OUTSIDE_RANGE
+        if not math.isfinite(volume) or volume < 0:
+            mask |= INVALID_VOLUME
+        if self._retracted and self._is_retracted(candle.datetime, close):
+            mask |= PRICE_SPIKE
+        return mask
+
+    def _quarantine(self, bad: pd.DataFrame, mask: np.ndarray, source: str):
+        now = datetime.now()
+        docs = [
+            {
+                "datetime": row["datetime"] if not pd.isna(row["datetime"]) else None,
+                "symbol": self.symbol,
+                "source": source,
+                "reasons": [name for bit, name in REASONS.items() if code & bit],
+                "candle": {field: row.get(field) for field in [*PRICE_FIELDS, "volume"]},
+                "quarantined_at": now,
+            }
+            for row, code in zip(bad.to_dict("records"), mask)
+        ]
+        try:
+            self.quarantine_collection.insert_many(docs, ordered=False)
+        except PyMongoError as e:
+            # Quarantine lỗi không được chặn ingest nến hợp lệ
+            self.logger.error(f"Cannot write {len(docs)} quarantined candles: {e}")
+
+    def validate(self, df: pd.DataFrame, source: str = "realtime", forming: bool = False):
+        """
+        Loại nến lỗi khỏi batch trước khi load
+
+        Args:
+            df: DataFrame nến (datetime, open, high, low, close, volume)
+            source: Nguồn của batch, lưu cùng nến bị quarantine
+            forming: Nến đang hình thành - chỉ loại bỏ, không ghi quarantine
+                (được upsert lại mỗi vài giây) và không dùng làm ngữ cảnh spike
+
+        Returns:
+            DataFrame: Các nến hợp lệ (giữ nguyên thứ tự và các cột khác)
+        """
+        if not self.enabled or df is None or df.empty:
+            return df
+        mask = self.check(df)
+        valid = mask == 0
+        self.counts["checked"] += len(df)
+        self.counts["passed"] += int(valid.sum())
+
+        if not valid.all():
+            bad_mask = mask[~valid]
+            self.counts["quarantined"] += len(bad_mask)
+            for bit, name in REASONS.items():
+                self.reason_counts[name] += int(np.count_nonzero(bad_mask & bit))
+            if not forming:
+                self._quarantine(df[~valid], bad_mask, source)
+            self.logger.warning(
+                f"Quarantined {len(bad_mask)}/{len(df)} {source} candles: "
+                + ", ".join(
+                    f"{name}={int(np.count_nonzero(bad_mask & bit))}"
+                    for bit, name in REASONS.items()
+                    if np.any(bad_mask & bit)
+                )
+            )
+            df = df[valid]
+
+        if not forming and not df.empty:
+            datetimes = pd.to_datetime(df["datetime"]).to_numpy()
+            self._settle_pending(
+                datetimes,
+                lambda i: {
+                    "datetime": pd.Timestamp(datetimes[i]).to_pydatetime(),
+                    **df[[*PRICE_FIELDS, "volume"]].iloc[i].to_dict(),
+                },
+                source,
+            )
+            self._remember(datetimes, df["close"].to_numpy(dtype="float64"))
+        return df
+
+    def validate_candle(
+        self, candle: Optional[Candle], source: str = "realtime", forming: bool = False
+    ) -> Optional[Candle]:
+        """
+        Giống validate cho một nến (đường realtime mỗi tick), không tạo DataFrame
+
+        Returns:
+            Candle nếu hợp lệ, None nếu bị loại (hoặc không có nến)
+        """
+        if candle is None or not self.enabled:
+            return candle
+        code = self.check_candle(candle)
+        self.counts["checked"] += 1
+        if code:
+            self.counts["quarantined"] += 1
+            reasons = [name for bit, name in REASONS.items() if code & bit]
+            for name in reasons:
+                self.reason_counts[name] += 1
+            if not forming:
+                self._quarantine(
+                    pd.DataFrame([candle.to_doc()]), np.array([code]), source
+                )
+            self.logger.warning(
+                f"Quarantined 1/1 {source} candles: "
+                + ", ".join(f"{name}=1" for name in reasons)
+            )
+            return None
+
+        self.counts["passed"] += 1
+        if not forming:
+            datetimes = np.array([candle.datetime], dtype="datetime64[ns]")
+            self._settle_pending(datetimes, lambda i: candle.to_doc(), source)
+            self._remember(datetimes, np.array([candle.close], dtype="float64"))
+        return candle
+
+    def get_stats(self) -> dict:
+        return {**self.counts, "reasons": dict(self.reason_counts)}
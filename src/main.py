@@ -1,20 +1,64 @@
 import sys
 import os
 import signal
+import threading
+import time
+from datetime import timedelta
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../")))
 
-from src.pipepline.historical_metatrader_pipepline import HistoricalMetatraderPipepline
-from src.pipepline.realtime_metatrader_pipepline import RealtimeMetatraderPipepline
+from src.utils.startup_timer_util import StartupTimerUtil
+
+
+def run_historical_background(watermark):
+    """Import lịch sử trong thread nền, lỗi không ảnh hưởng tới realtime"""
+    try:
+        started = time.perf_counter()
+        # Import muộn: gdown và pipeline lịch sử không nằm trên đường khởi động realtime
+        from src.pipepline.historical_metatrader_pipepline import (
+            HistoricalMetatraderPipepline,
+        )
+
+        print("Historical import started in background")
+        HistoricalMetatraderPipepline().run(watermark=watermark)
+        print(f"Historical import finished in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        print(f"Historical import failed: {e}")
 
 
 def main():
-    # Run Metatrader historical data once
-    hist = HistoricalMetatraderPipepline()
-    hist.run()
+    startup_timer = StartupTimerUtil()
 
-    # Start realtime pipeline (blocking loop)
-    realtime = RealtimeMetatraderPipepline()
+    with startup_timer.stage("import realtime pipeline"):
+        from src.pipepline.realtime_metatrader_pipepline import (
+            RealtimeMetatraderPipepline,
+        )
+        from src.utils.ingest_watermark_util import IngestWatermarkUtil
+        from config.variable_config import HISTORICAL_CONFIG
+
+    with startup_timer.stage("verify Mongo indexes"):
+        from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+        SchemaBootstrapUtil.ensure()
+
+    with startup_timer.stage("init realtime pipeline"):
+        realtime = RealtimeMetatraderPipepline()
+
+    # Realtime nhận các phút trong khoảng lookback trước khi import lịch sử bắt đầu,
+    # nên hai bên không bao giờ ghi cùng một phút
+    watermark = IngestWatermarkUtil()
+    watermark.claim(
+        realtime.extractor.current_time()
+        - timedelta(hours=HISTORICAL_CONFIG["realtime_lookback_hours"])
+    )
+
+    # Run Metatrader historical data in background (download + import)
+    threading.Thread(
+        target=run_historical_background,
+        args=(watermark,),
+        name="historical-import",
+        daemon=True,
+    ).start()
 
     def handle_sigterm(signum, frame):
         print("Received stop signal, exiting...")
@@ -23,7 +67,8 @@ def main():
     signal.signal(signal.SIGTERM, handle_sigterm)
     signal.signal(signal.SIGINT, handle_sigterm)
 
-    realtime.run_realtime()
+    # Start realtime pipeline (blocking loop)
+    realtime.run_realtime(startup_timer=startup_timer)
 
 
 if __name__ == "__main__":
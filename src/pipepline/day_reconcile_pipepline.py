@@ -0,0 +1,187 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+import pandas as pd
+
+from src.etl.extract.realtime_metatrader_extract import RealtimeMetatraderExtract
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.etl.load.retention_load import hot_boundary
+from src.etl.transform.candle_validate import CandleValidateTransform
+from config.mongo_config import MongoConfig
+from src.utils.day_fingerprint_util import (
+    fingerprints_match,
+    frame_day_fingerprints,
+    mongo_day_fingerprints,
+)
+from config.variable_config import GOLD_DATA_CONFIG, RECONCILE_CONFIG, RETENTION_CONFIG
+
+
+class DayReconcilePipepline:
+    """
+    So fingerprint từng ngày (count, tổng close, tổng volume, sha1) của nến
+    trong Mongo với cùng fingerprint tính từ dữ liệu nguồn vừa lấy. Ngày khớp
+    không bị ghi; ngày lệch được ghi lại bằng reconcile_window (insert/update/delete
+    đúng các phút khác nhau). Khác check_and_fix_gaps: phát hiện cả nến sai giá trị,
+    không chỉ phút bị thiếu.
+    """
+
+    def __init__(self, source=None, extractor=None, loader=None, validator=None):
+        self.source = source or RECONCILE_CONFIG["source"]
+        self.extractor = extractor or RealtimeMetatraderExtract()
+        self.loader = loader or RealtimeMetatraderLoad(clock=self.extractor.current_time)
+        self.validator = validator or CandleValidateTransform()
+        # Aggregation fingerprint quét nhiều tháng: dùng client "bulk" (timeout dài),
+        # không dùng client "realtime" của loader
+        self.fingerprint_collection = (
+            MongoConfig()
+            .get_client("bulk")
+            .get_database(GOLD_DATA_CONFIG["database"])
+            .get_collection(GOLD_DATA_CONFIG["collection"])
+        )
+
+    def _fetch_source(self, start=None, end=None):
+        """
+        Lấy dữ liệu nguồn và khoảng các ngày trọn vẹn trong đó
+
+        Returns:
+            tuple: (DataFrame, ngày đầu, ngày cuối (không bao gồm)) hoặc (None, None, None)
+        """
+        today = self.extractor.current_time().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        if self.source == "metatrader":
+            from src.etl.extract.historical_metatrader_extract import (
+                HistoricalMetatraderExtract,
+            )
+
+            df = HistoricalMetatraderExtract().historical_extract()
+            if df is None or df.empty:
+                return None, None, None
+            # Ngày cuối của file có thể chưa đủ nến
+            last_day = df["datetime"].max().normalize().to_pydatetime()
+            first_day = df["datetime"].min().normalize().to_pydatetime()
+            day_start, day_end = first_day, min(last_day, today)
+        else:
+            df, oldest = self.extractor.fetch_latest_n_bars(
+                RECONCILE_CONFIG["tv_bars"], priority="backfill"
+            )
+            if df is None or df.empty:
+                return None, None, None
+            # Ngày đầu chỉ trọn vẹn nếu nến cũ nhất thuộc ngày trước đó
+            day_start = oldest.normalize().to_pydatetime() + timedelta(days=1)
+            day_end = today
+
+        if start is not None:
+            day_start = max(day_start, start)
+        if end is not None:
+            day_end = min(day_end, end)
+        if RETENTION_CONFIG["enabled"]:
+            # Các tháng đã archive không được ghi lại vào collection chính
+            day_start = max(day_start, hot_boundary(self.extractor.current_time()))
+        return df, day_start, day_end
+
+    @staticmethod
+    def _day_key(df):
+        """Cột ngày (YYYY-MM-DD) của từng nến, dùng làm khóa groupby"""
+        return pd.to_datetime(df["datetime"]).dt.strftime("%Y-%m-%d")
+
+    def run(self, start=None, end=None, dry_run=False):
+        """
+        Args:
+            start: Ngày đầu cần đối chiếu (mặc định: ngày trọn vẹn đầu tiên của nguồn)
+            end: Ngày kết thúc, không bao gồm (mặc định: hôm nay)
+            dry_run: Chỉ báo cáo các ngày lệch, không ghi Mongo
+
+        Returns:
+            dict: Số ngày checked / matched / mismatched và số nến đã ghi lại
+        """
+        summary = {
+            "checked": 0,
+            "matched": 0,
+            "mismatched": [],
+            "inserted": 0,
+            "updated": 0,
+            "deleted": 0,
+        }
+        df, day_start, day_end = self._fetch_source(start, end)
+        if df is None or day_start >= day_end:
+            print(f"Day reconcile ({self.source}): no complete source days to compare")
+            return summary
+
+        df = df[(df["datetime"] >= day_start) & (df["datetime"] < day_end)]
+        valid = self.validator.validate(df, source=f"reconcile_{self.source}")
+        source_days = frame_day_fingerprints(valid)
+        # Nến nguồn bị quarantine: reconcile_window giữ bản đang lưu, nên cũng bỏ
+        # phút đó khỏi fingerprint của Mongo (nếu không ngày đó lệch mãi mãi)
+        rejected_all = set(df["datetime"]) - set(valid["datetime"])
+        stored_days = mongo_day_fingerprints(
+            self.fingerprint_collection, day_start, day_end, exclude=rejected_all
+        )
+        # Khóa ngày tính một lần, mỗi ngày lệch chỉ lấy nhóm của nó
+        source_by_day = dict(tuple(df.groupby(self._day_key(df))["datetime"]))
+        valid_by_day = dict(tuple(valid.groupby(self._day_key(valid))))
+
+        for day, fingerprint in sorted(source_days.items()):
+            summary["checked"] += 1
+            stored = stored_days.get(day)
+            if fingerprints_match(stored, fingerprint):
+                summary["matched"] += 1
+                continue
+            summary["mismatched"].append(day)
+            print(
+                f"Day {day} differs: stored={stored or 'missing'} source={fingerprint}"
+            )
+            if dry_run:
+                continue
+            day_valid = valid_by_day.get(day, valid.iloc[0:0])
+            # Nến nguồn bị quarantine không được coi là đã biến mất khỏi nguồn
+            rejected = set(source_by_day.get(day, ())) - set(day_valid["datetime"])
+            counts = self.loader.reconcile_window(
+                day_valid, source="reconcile", keep=rejected
+            )
+            for key in ("inserted", "updated", "deleted"):
+                summary[key] += counts[key]
+
+        for day in sorted(set(stored_days) - set(source_days)):
+            print(f"Day {day} has {stored_days[day]['count']} stored candles but none in source")
+
+        print(
+            f"Day reconcile ({self.source}): {summary['checked']} days checked, "
+            f"{summary['matched']} matched, {len(summary['mismatched'])} rewritten"
+            + (" (dry run)" if dry_run else "")
+            + f" - inserted={summary['inserted']}, updated={summary['updated']}, "
+            f"deleted={summary['deleted']}"
+        )
+        return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+    parser = argparse.ArgumentParser(
+        description="Compare per-day fingerprints of stored candles with the source and rewrite days that differ"
+    )
+    parser.add_argument(
+        "--source",
+        choices=["tradingview", "metatrader"],
+        help="Source to compare against (default: RECONCILE_SOURCE)",
+    )
+    parser.add_argument("--start", help="First day to compare, e.g. 2025-10-01")
+    parser.add_argument("--end", help="Day to stop at (exclusive)")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Only report mismatched days"
+    )
+    args = parser.parse_args()
+
+    SchemaBootstrapUtil.ensure()
+    pipepline = DayReconcilePipepline(source=args.source)
+    pipepline.run(
+        start=datetime.fromisoformat(args.start) if args.start else None,
+        end=datetime.fromisoformat(args.end) if args.end else None,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,359 @@
+import sys
+import os
+import io
+import multiprocessing
+import queue
+import time
+from datetime import timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from src.etl.extract.historical_metatrader_extract import HistoricalMetatraderExtract
+from src.etl.load.historical_metatrader_load import HistoricalMetatraderLoad
+from src.etl.load.retention_load import CandleArchiveReader, archive_collection_name
+from src.etl.transform.candle_validate import CandleValidateTransform
+from src.utils.historical_coverage_util import HistoricalCoverageUtil
+from config.variable_config import HISTORICAL_CONFIG, ROLLUP_CONFIG
+
+# Queue tiến độ của process worker, gán trong initializer của pool
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _report(kind, count):
+    if _progress_queue is not None:
+        _progress_queue.put((kind, count))
+
+
+def _line_at(f, pos):
+    """Dòng đầy đủ đầu tiên bắt đầu tại hoặc sau offset pos: (offset đầu dòng, nội dung)"""
+    if pos > 0:
+        f.seek(pos - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+    else:
+        f.seek(0)
+    start = f.tell()
+    return start, f.readline()
+
+
+def _seek_day(f, lo, hi, day_key, strict=False):
+    """
+    Offset đầu dòng đầu tiên trong [lo, hi) có ngày >= day_key (> nếu strict),
+    hi nếu không có. File Metatrader sort theo thời gian nên tìm nhị phân trên offset byte.
+    """
+    limit = hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start, line = _line_at(f, mid)
+        day = line.split(b"\t", 1)[0]
+        if start >= limit or not line or (day > day_key if strict else day >= day_key):
+            hi = mid
+        else:
+            lo = mid + 1
+    return min(_line_at(f, lo)[0], limit)
+
+
+def split_by_day(path, shards, start=None, end=None):
+    """
+    Chia file lịch sử thành tối đa `shards` đoạn byte liền nhau, mỗi đoạn là một
+    khoảng ngày trọn vẹn (không ngày nào nằm ở hai shard)
+
+    Args:
+        path: File tab-separated export từ Metatrader (dòng đầu là header)
+        shards: Số shard mong muốn
+        start: Chỉ lấy từ ngày của start (lọc chính xác theo phút trong worker)
+        end: Dừng trước end
+
+    Returns:
+        list: Các cặp (offset đầu, offset cuối) theo thứ tự thời gian
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header_end = len(f.readline())
+        lo, hi = header_end, size
+        if start is not None:
+            lo = _seek_day(f, lo, hi, start.strftime("%Y.%m.%d").encode())
+        if end is not None:
+            last_day = (end - timedelta(minutes=1)).strftime("%Y.%m.%d").encode()
+            hi = _seek_day(f, lo, hi, last_day, strict=True)
+        if lo >= hi:
+            return []
+
+        cuts = {lo, hi}
+        for i in range(1, shards):
+            line_start, line = _line_at(f, lo + (hi - lo) * i // shards)
+            if not line or line_start >= hi:
+                continue
+            # Cắt ở dòng đầu tiên của ngày kế tiếp
+            day = line.split(b"\t", 1)[0]
+            cuts.add(_seek_day(f, line_start, hi, day, strict=True))
+    cuts = sorted(cuts)
+    return list(zip(cuts[:-1], cuts[1:]))
+
+
+def _backfill_shard(task):
+    """
+    Chạy trong process worker: đọc và parse đoạn byte của shard, validate rồi
+    insert_many bằng client Mongo riêng của process
+
+    Returns:
+        dict: Kết quả của shard (số record, inserted, duplicates, errors, manifest)
+    """
+    started = time.perf_counter()
+    with open(task["path"], "rb") as f:
+        f.seek(task["offset"])
+        data = f.read(task["end_offset"] - task["offset"])
+    df = HistoricalMetatraderExtract.read_frame(io.BytesIO(data), header=False)
+    if task["start"] is not None:
+        df = df[df["datetime"] >= task["start"]]
+    if task["end"] is not None:
+        df = df[df["datetime"] < task["end"]]
+
+    # Context spike check bắt đầu rỗng ở mỗi shard: vài nến đầu shard chỉ qua các
+    # kiểm tra không cần lịch sử
+    valid = CandleValidateTransform().validate(df, source="backfill")
+    to_load = valid
+    if task["boundary"] is not None:
+        to_load = valid[valid["datetime"] >= task["boundary"]]
+    _report("parsed", len(to_load))
+
+    result = {
+        "shard": task["shard"],
+        "rows": len(df),
+        "quarantined": len(df) - len(valid),
+        "archived": len(valid) - len(to_load),
+        "first": valid["datetime"].min() if not valid.empty else None,
+        "last": valid["datetime"].max() if not valid.empty else None,
+        "manifest": HistoricalCoverageUtil.build_manifest(valid, task["source"])
+        if not valid.empty
+        else None,
+    }
+    loader = HistoricalMetatraderLoad(side_effects=False)
+    if task["dry_run"]:
+        # Chỉ đếm số phút chưa có trong Mongo (một query datetime trên khoảng của shard)
+        missing = 0
+        if not to_load.empty:
+            stored = {
+                doc["datetime"]
+                for doc in loader.gold_collection.find(
+                    {
+                        "datetime": {
+                            "$gte": to_load["datetime"].min(),
+                            "$lte": to_load["datetime"].max(),
+                        }
+                    },
+                    {"_id": 0, "datetime": 1},
+                )
+            }
+            missing = int((~to_load["datetime"].isin(stored)).sum())
+        result.update(inserted=0, duplicates=0, errors=0, missing=missing)
+        _report("loaded", len(to_load))
+    else:
+        result.update(
+            loader.historical_load(
+                to_load,
+                chunk_size=task["chunk_size"],
+                progress=lambda count: _report("loaded", count),
+            )
+        )
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+class HistoricalBackfillPipepline:
+    """
+    Rebuild lịch sử từ file Metatrader bằng nhiều process: file được chia theo
+    khoảng ngày (tìm nhị phân trên offset byte, không đọc cả file ở process chính),
+    mỗi worker tự parse, validate và insert shard của mình với client Mongo riêng.
+    Tiến độ của các worker được gộp về một báo cáo ở process chính.
+
+    Khác HistoricalMetatraderPipepline.run: không coverage check, không chạy cùng
+    watermark realtime (insert trùng phút chỉ bị bỏ qua), rollup được build lại một
+    lần sau khi mọi shard xong thay vì sau mỗi batch.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = (
+            processes
+            or HISTORICAL_CONFIG["backfill_processes"]
+            or os.cpu_count()
+            or 1
+        )
+        self.chunk_size = HISTORICAL_CONFIG["backfill_batch_size"]
+        self.coverage = HistoricalCoverageUtil()
+        self.loader = HistoricalMetatraderLoad(side_effects=False)
+        self.archive = CandleArchiveReader(
+            self.loader.gold_db.get_collection(archive_collection_name())
+        )
+
+    @staticmethod
+    def _print_progress(status):
+        print(
+            f"Backfill: {status['rows_done']}/{status['rows_total']} rows, "
+            f"{status['shards_done']}/{status['shards']} shards done, "
+            f"{status['elapsed']:.1f}s"
+        )
+
+    def run(
+        self,
+        path=None,
+        start=None,
+        end=None,
+        shards=None,
+        progress=None,
+        progress_interval=5.0,
+        dry_run=False,
+    ):
+        """
+        Args:
+            path: File lịch sử (mặc định: tải từ Google Drive)
+            start: Thời điểm bắt đầu (mặc định: đầu file)
+            end: Thời điểm kết thúc, không bao gồm (mặc định: hết file)
+            shards: Số shard (mặc định: bằng số process)
+            progress: Hàm nhận dict tiến độ (rows_done, rows_total, shards_done,
+                shards, elapsed); mặc định in ra stdout
+            progress_interval: Số giây giữa hai lần gọi progress
+            dry_run: Parse và validate nhưng không ghi Mongo, chỉ đếm số phút còn thiếu
+
+        Returns:
+            dict: Tổng hợp rows / inserted / duplicates / errors / quarantined của mọi shard
+        """
+        started = time.perf_counter()
+        # File tự tải: lưu phiên bản trên Drive vào manifest (file local thì không biết)
+        remote = None
+        if path is None:
+            remote = self.coverage.remote_version()
+            path = HistoricalMetatraderExtract().download()
+        progress = progress or self._print_progress
+        ranges = split_by_day(path, shards or self.processes, start, end)
+        boundary = self.archive.boundary()
+        tasks = [
+            {
+                "shard": i,
+                "path": path,
+                "offset": offset,
+                "end_offset": end_offset,
+                "start": start,
+                "end": end,
+                "boundary": boundary,
+                "source": self.coverage.source,
+                "chunk_size": self.chunk_size,
+                "dry_run": dry_run,
+            }
+            for i, (offset, end_offset) in enumerate(ranges)
+        ]
+        summary = {
+            "shards": len(tasks),
+            "failed_shards": 0,
+            "rows": 0,
+            "quarantined": 0,
+            "archived": 0,
+            "inserted": 0,
+            "duplicates": 0,
+            "errors": 0,
+        }
+        if dry_run:
+            summary["missing"] = 0
+        if not tasks:
+            print("Backfill: no rows in the requested range")
+            summary["seconds"] = time.perf_counter() - started
+            return summary
+
+        status = {
+            "rows_done": 0,
+            "rows_total": 0,
+            "shards_done": 0,
+            "shards": len(tasks),
+            "elapsed": 0.0,
+        }
+        results = []
+        # spawn: worker không kế thừa client Mongo / lock của process chính
+        context = multiprocessing.get_context("spawn")
+        progress_queue = context.Queue()
+        with context.Pool(
+            min(self.processes, len(tasks)),
+            initializer=_init_worker,
+            initargs=(progress_queue,),
+        ) as pool:
+            pending = [pool.apply_async(_backfill_shard, (task,)) for task in tasks]
+            next_report = time.perf_counter() + progress_interval
+            while pending or not progress_queue.empty():
+                try:
+                    kind, count = progress_queue.get(timeout=0.2)
+                    status["rows_total" if kind == "parsed" else "rows_done"] += count
+                except queue.Empty:
+                    pass
+                for async_result in [r for r in pending if r.ready()]:
+                    pending.remove(async_result)
+                    status["shards_done"] += 1
+                    try:
+                        results.append(async_result.get())
+                    except Exception as e:
+                        summary["failed_shards"] += 1
+                        print(f"Backfill shard failed: {e}")
+                if time.perf_counter() >= next_report:
+                    status["elapsed"] = time.perf_counter() - started
+                    progress(dict(status))
+                    next_report = time.perf_counter() + progress_interval
+        status["elapsed"] = time.perf_counter() - started
+        progress(dict(status))
+
+        for result in results:
+            for key in summary:
+                if key in result and key != "shards":
+                    summary[key] += result[key]
+
+        firsts = [r["first"] for r in results if r["first"] is not None]
+        lasts = [r["last"] for r in results if r["last"] is not None]
+        summary["start"] = min(firsts) if firsts else None
+        summary["end"] = max(lasts) if lasts else None
+        if ROLLUP_CONFIG["enabled"] and summary["inserted"] and firsts:
+            from src.etl.load.rollup_load import CandleRollupLoad
+
+            CandleRollupLoad().build_all(start=min(firsts), end=max(lasts))
+
+        # Manifest chỉ hợp lệ khi đã import trọn file không lỗi
+        if (
+            not dry_run
+            and start is None
+            and end is None
+            and not summary["failed_shards"]
+            and not summary["errors"]
+        ):
+            manifest = self.coverage.merge_manifests([r["manifest"] for r in results])
+            if manifest:
+                self.coverage.save_manifest(manifest, remote=remote)
+
+        summary["seconds"] = time.perf_counter() - started
+        summary["rows_per_second"] = summary["rows"] / summary["seconds"]
+        print(
+            f"Backfill{' (dry run)' if dry_run else ''} done in {summary['seconds']:.1f}s with {self.processes} processes: "
+            f"{summary['rows']} rows in {summary['shards']} shards, "
+            f"inserted={summary['inserted']}, duplicates={summary['duplicates']}, "
+            f"quarantined={summary['quarantined']}, errors={summary['errors']}, "
+            f"failed_shards={summary['failed_shards']}"
+        )
+        return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+    parser = argparse.ArgumentParser(
+        description="Rebuild minute history from the Metatrader file with a process pool"
+    )
+    parser.add_argument("--file", help="Local Metatrader export (default: download)")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, help="Date-range shards (default: processes)")
+    args = parser.parse_args()
+
+    SchemaBootstrapUtil.ensure()
+    pipepline = HistoricalBackfillPipepline(processes=args.processes)
+    pipepline.run(path=args.file, shards=args.shards)
@@ -5,20 +5,84 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"
 
 from src.etl.extract.historical_metatrader_extract import HistoricalMetatraderExtract
 from src.etl.load.historical_metatrader_load import HistoricalMetatraderLoad
+from src.etl.load.retention_load import CandleArchiveReader, archive_collection_name
+from src.etl.transform.candle_validate import CandleValidateTransform
+from src.utils.historical_coverage_util import HistoricalCoverageUtil
+from config.variable_config import HISTORICAL_CONFIG
 
 
 class HistoricalMetatraderPipepline:
     def __init__(self):
         self.extractor = HistoricalMetatraderExtract()
         self.loader = HistoricalMetatraderLoad()
+        self.validator = CandleValidateTransform()
+        self.coverage = HistoricalCoverageUtil()
+        self.archive = CandleArchiveReader(
+            self.loader.gold_db.get_collection(archive_collection_name())
+        )
 
-    def run(self):
+    def run(self, watermark=None):
+        """
+        Args:
+            watermark: IngestWatermarkUtil khi chạy nền cùng realtime - chỉ ghi các
+                phút realtime chưa nhận, batch nhỏ hơn và có nghỉ giữa các batch
+        """
+        # Pre-flight: bỏ qua download nếu Mongo đã có đủ dữ liệu của lần import trước
+        if not HISTORICAL_CONFIG["force_import"]:
+            complete, reason = self.coverage.check(
+                self.loader.gold_collection, archive=self.archive
+            )
+            if complete:
+                print(f"Skip historical import: {reason}")
+                return
+            print(f"Historical import needed: {reason}")
+
+        # Phiên bản file lấy trước khi tải: dòng thêm vào sau đó buộc lần sau import lại
+        remote = self.coverage.remote_version()
         # Extract dữ liệu
         metatrader_data = self.extractor.historical_extract()
+        if metatrader_data is None:
+            return
+        # Nến lỗi vào quarantine; manifest chỉ tính nến hợp lệ để coverage check không
+        # đòi import lại các nến đã bị loại
+        metatrader_data = self.validator.validate(metatrader_data, source="historical")
+        stats = self.validator.get_stats()
+        print(
+            f"Validated {stats['checked']} historical candles, "
+            f"{stats['quarantined']} quarantined"
+        )
+        # Các tháng đã nén vào archive không được ghi lại vào collection chính
+        to_load = metatrader_data
+        boundary = self.archive.boundary()
+        if boundary is not None:
+            to_load = metatrader_data[metatrader_data["datetime"] >= boundary]
+            print(f"Skip {len(metatrader_data) - len(to_load)} rows already archived before {boundary}")
+
         # Load dữ liệu vào MongoDB
-        self.loader.historical_load(metatrader_data)
+        if watermark is None:
+            summary = self.loader.historical_load(to_load)
+        else:
+            summary = self.loader.historical_load(
+                to_load,
+                watermark=watermark,
+                chunk_size=HISTORICAL_CONFIG["background_batch_size"],
+                throttle_seconds=HISTORICAL_CONFIG["background_throttle_seconds"],
+            )
+
+        # Chỉ ghi manifest khi mọi record đã vào Mongo (inserted hoặc đã có sẵn)
+        if summary["errors"] == 0:
+            manifest = self.coverage.build_manifest(
+                metatrader_data,
+                self.coverage.source,
+                limit=watermark.value if watermark is not None else None,
+            )
+            if manifest:
+                self.coverage.save_manifest(manifest, remote=remote)
 
 
 if __name__ == "__main__":
+    from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+    SchemaBootstrapUtil.ensure()
     pipepline = HistoricalMetatraderPipepline()
     pipepline.run()
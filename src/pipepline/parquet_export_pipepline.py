@@ -0,0 +1,28 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from src.etl.load.parquet_export_load import ParquetExportLoad
+
+
+class ParquetExportPipepline:
+    def __init__(self, root_path=None):
+        self.loader = ParquetExportLoad(root_path=root_path)
+
+    def run(self):
+        # Chỉ export các ngày mới kể từ lần chạy trước
+        return self.loader.export_new_days()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Export finalized minute candles to Parquet partitioned by symbol/date"
+    )
+    parser.add_argument("--root-path", help="Output directory (default: PARQUET_EXPORT_PATH)")
+    args = parser.parse_args()
+
+    pipepline = ParquetExportPipepline(root_path=args.root_path)
+    pipepline.run()
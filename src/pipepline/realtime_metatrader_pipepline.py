@@ -2,17 +2,32 @@ import sys
 import os
 import schedule
 import time
+from datetime import timedelta
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
 
 from src.etl.extract.realtime_metatrader_extract import RealtimeMetatraderExtract
 from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.etl.transform.candle_validate import CandleValidateTransform
+from src.utils.candle_record import Candle
+from src.utils.startup_timer_util import StartupTimerUtil
+from config.variable_config import (
+    REPLAY_CONFIG,
+    FRESHNESS_CONFIG,
+    PARQUET_EXPORT_CONFIG,
+    RETENTION_CONFIG,
+    RECONCILE_CONFIG,
+)
 
 
 class RealtimeMetatraderPipepline:
-    def __init__(self, use_latest_n_bars=False, n_bars=5000):
-        self.extractor = RealtimeMetatraderExtract()
-        self.loader = RealtimeMetatraderLoad()
+    def __init__(self, use_latest_n_bars=False, n_bars=5000, tv_adapter=None):
+        self.extractor = RealtimeMetatraderExtract(tv_adapter=tv_adapter)
+        self.loader = RealtimeMetatraderLoad(clock=self.extractor.current_time)
+        # Kiểm tra nến giữa extract và load, nến lỗi vào collection quarantine
+        self.validator = CandleValidateTransform()
+        # Hệ số tốc độ thời gian: replay nhanh gấp N lần thì lịch chạy cũng nhanh gấp N lần
+        self.time_scale = getattr(tv_adapter, "speed", 1.0)
         # Lưu phút cuối cùng đã cập nhật
         self.last_updated_minute = None
         self.use_latest_n_bars = use_latest_n_bars
@@ -23,14 +38,56 @@ class RealtimeMetatraderPipepline:
         df = self.extractor.realtime_extract(
             use_latest_n_bars=self.use_latest_n_bars, n_bars=self.n_bars
         )
-        self.loader.realtime_load(df)
+        if self.use_latest_n_bars:
+            self.reconcile_latest_bars(df)
+        else:
+            self.loader.realtime_load(self.validator.validate(df, source="realtime"))
+        self.retract_late_spikes()
+        # Nến forming bị bỏ lại (khởi động lại / lỡ finalize) lấy lại giá cuối từ nguồn
+        self.refetch_stale_forming()
+        # Nến provisional đã qua thời gian chờ được xác nhận final
+        self.loader.promote_settled_candles()
+
+    def refetch_stale_forming(self):
+        """
+        Nến forming của các phút đã đóng cửa chỉ là ảnh chụp giữa phút: lấy lại nến
+        đóng cửa từ nguồn và ghi qua đường finalize (provisional). Nến không lấy lại
+        được vẫn được promote_settled_candles chuyển sang final.
+        """
+        stale = self.loader.stale_forming_candles()
+        if not stale:
+            return
+        current_minute = self.extractor.current_time().replace(second=0, microsecond=0)
+        df = self.extractor.fetch_historical_range(
+            stale[0], current_minute - timedelta(minutes=1), priority="finalize"
+        )
+        if df is None or df.empty:
+            return
+        valid = self.validator.validate(
+            df[df["datetime"].isin(stale)], source="finalize"
+        )
+        candles = Candle.from_frame(valid)
+        if candles:
+            self.loader.upsert_candles(candles, finalize=True)
+            print(f"Refetched {len(candles)}/{len(stale)} stale forming candles")
+
+    def reconcile_latest_bars(self, df):
+        """Cửa sổ n_bars: merge với Mongo để insert/update/delete chính xác"""
+        if df is None or df.empty:
+            return
+        valid = self.validator.validate(df, source="latest_n_bars")
+        # Nến bị quarantine không được coi là "đã biến mất khỏi nguồn"
+        rejected = set(df["datetime"]) - set(valid["datetime"])
+        self.loader.reconcile_window(valid, keep=rejected)
+
+    def retract_late_spikes(self):
+        """Xóa khỏi Mongo các nến đã load nhưng bị xác định là spike khi nến kế tiếp tới"""
+        self.loader.remove_candles(self.validator.pop_late_spikes())
 
     def update_previous_minute_final_state(self):
         """Cập nhật trạng thái cuối cùng của nến phút trước"""
-        from datetime import datetime
-
         # Lấy phút hiện tại
-        now = datetime.now()
+        now = self.extractor.current_time()
         current_minute = now.replace(second=0, microsecond=0)
 
         # Kiểm tra xem đã chuyển phút hay chưa
@@ -39,10 +96,14 @@ class RealtimeMetatraderPipepline:
             or self.last_updated_minute != current_minute
         ):
             # Cập nhật nến phút trước khi chuyển sang phút mới
-            previous_candle = self.extractor.get_previous_minute_final_candle()
-            if not previous_candle.empty:
-                self.loader.upsert_current_minute_candle(previous_candle)
+            # Đường mỗi tick dùng Candle, không tạo DataFrame
+            previous_candle = self.validator.validate_candle(
+                self.extractor.get_previous_final_candle(), source="finalize"
+            )
+            if previous_candle is not None:
+                self.loader.upsert_candles([previous_candle], finalize=True)
                 print(f"Updated final state of previous minute candle")
+            self.retract_late_spikes()
 
             # Ghi nhớ phút hiện tại đã cập nhật
             self.last_updated_minute = current_minute
@@ -54,8 +115,10 @@ class RealtimeMetatraderPipepline:
 
         # Chỉ upsert nến hiện tại khi không còn data thiếu
         if self.extractor.is_data_up_to_date():
-            df = self.extractor.get_current_minute_candle()
-            self.loader.upsert_current_minute_candle(df)
+            candle = self.validator.validate_candle(
+                self.extractor.get_current_candle(), source="forming", forming=True
+            )
+            self.loader.upsert_candles([candle] if candle is not None else [])
         else:
             print("Data not up-to-date, skipping current minute upsert")
 
@@ -67,42 +130,151 @@ class RealtimeMetatraderPipepline:
             lookback_hours (int): Số giờ cần kiểm tra ngược về quá khứ
         """
         # Sử dụng phương thức mới trong extractor để lấy dữ liệu thiếu
-        gap_df = self.extractor.check_and_fix_gaps(lookback_hours=lookback_hours)
+        gap_df = self.validator.validate(
+            self.extractor.check_and_fix_gaps(
+                lookback_hours=lookback_hours, priority="backfill"
+            ),
+            source="gap_fill",
+        )
 
         if not gap_df.empty:
             # Load dữ liệu vào database
-            self.loader.realtime_load(gap_df)
+            self.loader.realtime_load(gap_df, source="gap_fill")
+            self.retract_late_spikes()
             print(
                 f"Fixed {len(gap_df)} missing records in the last {lookback_hours} hours"
             )
         else:
             print(f"No data gaps found in the last {lookback_hours} hours")
 
-    def run_realtime(self):
+    def report_freshness(self):
+        """Log percentile độ trễ nến đóng cửa → finalize và cảnh báo nếu quá chậm"""
+        stats = self.loader.freshness.get_percentiles()
+        if not stats:
+            print("Freshness: no finalized candles recorded yet")
+            return
+        for source, s in stats.items():
+            print(
+                f"Freshness [{source}]: n={s['count']}, p50={s['p50']:.1f}s, "
+                f"p90={s['p90']:.1f}s, p99={s['p99']:.1f}s, max={s['max']:.1f}s"
+            )
+        realtime = stats.get("realtime")
+        if realtime:
+            self.extractor.discord_alert.check_and_alert_data_latency(
+                source="TradingView_Realtime", p90_seconds=realtime["p90"]
+            )
+
+    def report_validation(self):
+        """In số nến đã kiểm tra / bị quarantine theo từng lý do"""
+        stats = self.validator.get_stats()
+        reasons = ", ".join(
+            f"{name}={count}" for name, count in stats["reasons"].items() if count
+        )
+        print(
+            f"Validation: checked={stats['checked']}, passed={stats['passed']}, "
+            f"quarantined={stats['quarantined']}" + (f" ({reasons})" if reasons else "")
+        )
+
+    def report_upsert_stats(self):
+        """In số lần upsert nến phút hiện tại đã gửi / bỏ qua vì nến không đổi"""
+        stats = self.loader.get_upsert_stats()
+        total = stats["sent"] + stats["skipped"]
+        print(
+            f"Current candle upserts: sent={stats['sent']}, skipped={stats['skipped']}"
+            + (f" ({stats['skipped'] / total:.0%} unchanged)" if total else "")
+            + f", fields_sent={stats['fields_sent']}"
+        )
+
+    def report_tradingview_status(self):
+        """In trạng thái rate limiter / circuit breaker của TradingView"""
+        guard = self.extractor.tv_adapter.guard
+        if guard is None:
+            return
+        status = guard.get_status()
+        print(
+            f"TradingView guard: state={status['state']}, tokens={status['tokens']}, "
+            f"waiting={status['waiting']}, calls={status['calls']}, "
+            f"failures={status['failures']}, trips={status['trips']}, "
+            f"rejected_open={status['rejected_open']}, "
+            f"rejected_timeout={status['rejected_timeout']}"
+        )
+
+    def report_replay_stats(self):
+        """In thống kê replay và độ trễ dữ liệu trong DB so với đồng hồ mô phỏng"""
+        stats = self.extractor.tv_adapter.get_stats()
+        latest_minute = self.extractor.get_latest_minute()
+        backlog = (
+            int((stats["sim_time"] - latest_minute).total_seconds() // 60)
+            if latest_minute
+            else None
+        )
+        print(
+            f"Replay stats: sim_time={stats['sim_time']}, latest_db={latest_minute}, "
+            f"backlog_minutes={backlog}, calls={stats['calls']}, "
+            f"bars_served={stats['bars_served']}, bars_dropped={stats['bars_dropped']}, "
+            f"outage_errors={stats['outage_errors']}"
+        )
+
+    def _every(self, seconds):
+        """Tạo schedule job theo giây, đã chia theo hệ số tốc độ thời gian"""
+        return schedule.every(seconds / self.time_scale).seconds
+
+    def replay_spool(self):
+        """Ghi lại các batch còn trong spool (bị lỗi do Mongo không sẵn sàng)"""
+        if self.loader.spool is None or not self.loader.spool.has_pending():
+            return
+        replayed = self.loader.replay_spool()
+        print(
+            f"Spool replay: {replayed} operations written, "
+            f"{self.loader.spool.pending_count()} batches still pending"
+        )
+
+    def run_realtime(self, startup_timer=None):
+        """
+        Args:
+            startup_timer: StartupTimerUtil của src/main.py - các bước khởi động được
+                đo và in bảng thời gian trước khi vào vòng lặp schedule
+        """
+        startup_timer = startup_timer or StartupTimerUtil()
+
+        # Ghi nốt dữ liệu còn trong spool từ lần chạy trước
+        with startup_timer.stage("replay write spool"):
+            self.replay_spool()
+
         # Kiểm tra và sửa dữ liệu thiếu khi khởi động
-        if self.use_latest_n_bars:
-            print(f"Maintaining exactly {self.n_bars} latest bars on startup...")
-            df = self.extractor.maintain_latest_n_bars(n_bars=self.n_bars)
-            self.loader.realtime_load(df)
-        else:
-            print("Checking for historical data gaps on startup...")
-            self.check_and_fix_historical_gaps(lookback_hours=24)
+        with startup_timer.stage("startup gap check / latest bars"):
+            if self.use_latest_n_bars:
+                print(f"Maintaining exactly {self.n_bars} latest bars on startup...")
+                df = self.extractor.maintain_latest_n_bars(
+                    n_bars=self.n_bars, priority="backfill"
+                )
+                self.reconcile_latest_bars(df)
+            else:
+                print("Checking for historical data gaps on startup...")
+                self.check_and_fix_historical_gaps(lookback_hours=24)
 
-        schedule.every(1).minutes.do(self.run_once)
-        schedule.every(5).seconds.do(self.upsert_current_minute)
+        if self.loader.publisher is not None:
+            self.loader.publisher.start_server()
+
+        self._every(60).do(self.run_once)
+        self._every(5).do(self.upsert_current_minute)
 
         if self.use_latest_n_bars:
             # Duy trì đúng n_bars mới nhất mỗi 4 giờ
-            schedule.every(4).hours.do(lambda: self.run_once())
+            self._every(4 * 3600).do(lambda: self.run_once())
             print(f"Running in maintain-latest-{self.n_bars}-bars mode")
         else:
             # Kiểm tra và sửa khoảng trống dữ liệu mỗi 4 giờ
-            schedule.every(4).hours.do(
+            self._every(4 * 3600).do(
                 lambda: self.check_and_fix_historical_gaps(lookback_hours=24)
             )
 
         print("Realtime pipeline started with enhanced gap detection:")
         print("- Every 1 minute: Fetch missing completed candles (priority)")
+        print(
+            f"- Every 1 minute: Promote provisional candles closed more than "
+            f"{self.loader.settle_seconds}s ago to final"
+        )
         print(
             "- Every 5 seconds: Update previous minute's final state (if just changed)"
         )
@@ -110,12 +282,67 @@ class RealtimeMetatraderPipepline:
             "- Every 5 seconds: Update current minute candle (only when data is up-to-date)"
         )
         print("- Every 4 hours: Check and fix historical data gaps (last 24 hours)")
+        print(
+            f"- Every {FRESHNESS_CONFIG['report_interval_minutes']} minutes: Report candle close -> finalized latency"
+        )
+        self._every(FRESHNESS_CONFIG["report_interval_minutes"] * 60).do(
+            self.report_freshness
+        )
+        self._every(FRESHNESS_CONFIG["report_interval_minutes"] * 60).do(
+            self.report_validation
+        )
+        self._every(FRESHNESS_CONFIG["report_interval_minutes"] * 60).do(
+            self.report_upsert_stats
+        )
+        if self.extractor.tv_adapter.guard is not None:
+            self._every(FRESHNESS_CONFIG["report_interval_minutes"] * 60).do(
+                self.report_tradingview_status
+            )
+        if self.loader.spool is not None:
+            self._every(60).do(self.replay_spool)
+            print("- Every 1 minute: Replay spooled writes if MongoDB was unavailable")
+
+        if PARQUET_EXPORT_CONFIG["enabled"]:
+            from src.pipepline.parquet_export_pipepline import ParquetExportPipepline
+
+            exporter = ParquetExportPipepline()
+            schedule.every().day.at(PARQUET_EXPORT_CONFIG["run_at"]).do(exporter.run)
+            print(
+                f"- Every day at {PARQUET_EXPORT_CONFIG['run_at']}: Export new days to Parquet"
+            )
+
+        if RETENTION_CONFIG["enabled"]:
+            from src.pipepline.retention_pipepline import RetentionPipepline
+
+            retention = RetentionPipepline()
+            schedule.every().day.at(RETENTION_CONFIG["run_at"]).do(retention.run)
+            print(
+                f"- Every day at {RETENTION_CONFIG['run_at']}: Archive months older than "
+                f"{RETENTION_CONFIG['hot_days']} days"
+            )
+
+        if RECONCILE_CONFIG["enabled"]:
+            from src.pipepline.day_reconcile_pipepline import DayReconcilePipepline
+
+            reconciler = DayReconcilePipepline(
+                extractor=self.extractor, loader=self.loader, validator=self.validator
+            )
+            schedule.every().day.at(RECONCILE_CONFIG["run_at"]).do(reconciler.run)
+            print(
+                f"- Every day at {RECONCILE_CONFIG['run_at']}: Compare day fingerprints "
+                f"with {reconciler.source} and rewrite days that differ"
+            )
+
+        if hasattr(self.extractor.tv_adapter, "get_stats"):
+            self._every(60).do(self.report_replay_stats)
+            print(f"Replay mode: time runs {self.time_scale}x faster than real time")
+        startup_timer.report()
         print("Press Ctrl+C to stop.")
 
         try:
             while True:
                 schedule.run_pending()
-                time.sleep(1)
+                time.sleep(min(1.0, 1.0 / self.time_scale))
         except KeyboardInterrupt:
             print("Received shutdown signal. Exiting...")
             sys.exit(0)
@@ -137,10 +364,68 @@ if __name__ == "__main__":
         help="Number of latest bars to maintain (default: 5000)",
     )
 
+    parser.add_argument(
+        "--replay-parquet",
+        help="Replay bars from a Parquet file instead of TradingView",
+    )
+    parser.add_argument(
+        "--replay-mongo",
+        action="store_true",
+        help="Replay bars from REPLAY_SOURCE_COLLECTION instead of TradingView",
+    )
+    parser.add_argument(
+        "--replay-start",
+        help="Simulated start time, e.g. '2025-10-01 06:00' (default: first bar + 1 day)",
+    )
+    parser.add_argument(
+        "--replay-speed",
+        type=float,
+        default=REPLAY_CONFIG["speed"],
+        help="Replay speed multiple of real time (default: REPLAY_SPEED or 1)",
+    )
+
     args = parser.parse_args()
 
+    tv_adapter = None
+    if args.replay_parquet or args.replay_mongo:
+        from datetime import datetime, timedelta
+        from src.utils.replay_datafeed_adapter import (
+            ReplayDataFeedAdapter,
+            use_replay_collections,
+        )
+
+        # Replay không bao giờ ghi vào collection thật
+        try:
+            target = use_replay_collections(
+                None if args.replay_parquet else REPLAY_CONFIG["source_collection"]
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Replay mode: writing to collection '{target}'")
+        replay_kwargs = dict(
+            start_time=(
+                datetime.fromisoformat(args.replay_start) if args.replay_start else None
+            ),
+            speed=args.replay_speed,
+            latency_seconds=REPLAY_CONFIG["latency_seconds"],
+            drop_rate=REPLAY_CONFIG["drop_rate"],
+            outage_rate=REPLAY_CONFIG["outage_rate"],
+            outage_duration=timedelta(minutes=REPLAY_CONFIG["outage_minutes"]),
+        )
+        if args.replay_parquet:
+            tv_adapter = ReplayDataFeedAdapter.from_parquet(
+                args.replay_parquet, **replay_kwargs
+            )
+        else:
+            tv_adapter = ReplayDataFeedAdapter.from_mongo(**replay_kwargs)
+
+    from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+    SchemaBootstrapUtil.ensure()
     pipepline = RealtimeMetatraderPipepline(
-        use_latest_n_bars=args.maintain_latest, n_bars=args.n_bars
+        use_latest_n_bars=args.maintain_latest,
+        n_bars=args.n_bars,
+        tv_adapter=tv_adapter,
     )
 
     pipepline.run_realtime()
@@ -0,0 +1,38 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from src.etl.load.retention_load import CandleRetentionLoad
+
+
+class RetentionPipepline:
+    def __init__(self, hot_days=None):
+        self.loader = CandleRetentionLoad(hot_days=hot_days)
+
+    def run(self):
+        # Nén các tháng đã ra khỏi tier nóng vào archive
+        summary = self.loader.run()
+        print(
+            f"Retention: {summary['months']} months archived before {summary['boundary']}, "
+            f"{summary['deleted']} minute documents removed"
+        )
+        return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+    parser = argparse.ArgumentParser(
+        description="Compact minute candles older than the hot window into monthly archives"
+    )
+    parser.add_argument(
+        "--hot-days", type=int, help="Days kept as minute documents (default: RETENTION_HOT_DAYS)"
+    )
+    args = parser.parse_args()
+
+    SchemaBootstrapUtil.ensure()
+    pipepline = RetentionPipepline(hot_days=args.hot_days)
+    pipepline.run()
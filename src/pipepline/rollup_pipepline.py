@@ -0,0 +1,36 @@
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from src.etl.load.rollup_load import CandleRollupLoad
+
+
+class RollupPipepline:
+    def __init__(self):
+        self.loader = CandleRollupLoad()
+
+    def run(self, start=None, end=None):
+        # Build toàn bộ nến khung lớn từ lịch sử nến phút có sẵn
+        self.loader.build_all(start=start, end=end)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Build 5m/15m/1h/4h/1d rollup collections from minute candles"
+    )
+    parser.add_argument("--start", help="Start time, e.g. 2020-01-01 (default: oldest)")
+    parser.add_argument("--end", help="End time, e.g. 2025-10-01 (default: newest)")
+    args = parser.parse_args()
+
+    from src.utils.schema_bootstrap_util import SchemaBootstrapUtil
+
+    SchemaBootstrapUtil.ensure()
+    pipepline = RollupPipepline()
+    pipepline.run(
+        start=datetime.fromisoformat(args.start) if args.start else None,
+        end=datetime.fromisoformat(args.end) if args.end else None,
+    )
@@ -0,0 +1,143 @@
+import sys
+import os
+import json
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../")))
+
+from config.logger_config import LoggerConfig
+from config.variable_config import GOLD_DATA_CONFIG, QUERY_CONFIG
+from src.query.ohlcv_query import OhlcvQuery
+
+logger = LoggerConfig.logger_config("OHLCV HTTP server")
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class OhlcvRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+        GET /api/health
+        GET /api/gold/latest?symbol=XAUUSD
+        GET /api/gold/ohlcv?symbol=XAUUSD&start=...&end=...&timeframe=5m
+            &page_size=1000&cursor=...   -> một trang JSON kèm next_cursor
+            &stream=1                    -> NDJSON, đọc lần lượt từng trang
+    """
+
+    query: OhlcvQuery = None  # type: ignore
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/api/health":
+                self._send_json(
+                    200, {"status": "ok", "cache": self.query.get_cache_stats()}
+                )
+            elif url.path == "/api/gold/latest":
+                symbol = params.get("symbol", GOLD_DATA_CONFIG["symbol"])
+                final_only = params.get("final") in ("1", "true")
+                self._send_json(
+                    200, {"data": self.query.get_latest(symbol, final_only=final_only)}
+                )
+            elif url.path in ("/api/gold/ohlcv", "/api/gold/range"):
+                self._handle_ohlcv(params)
+            else:
+                self._send_json(404, {"error": f"Unknown path {url.path}"})
+        except KeyError as e:
+            self._send_json(404, {"error": str(e)})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.exception(f"Error serving {self.path}: {e}")
+            self._send_json(500, {"error": str(e)})
+
+    def _handle_ohlcv(self, params):
+        if "start" not in params or "end" not in params:
+            raise ValueError("Both 'start' and 'end' are required (ISO format)")
+        symbol = params.get("symbol", GOLD_DATA_CONFIG["symbol"])
+        start = datetime.fromisoformat(params["start"])
+        end = datetime.fromisoformat(params["end"])
+        timeframe = params.get("timeframe", "1m")
+        page_size = int(params["page_size"]) if "page_size" in params else None
+        # final=1: chỉ trả nến đã xác nhận, bỏ nến đang hình thành / vừa đóng cửa
+        final_only = params.get("final") in ("1", "true")
+
+        if params.get("stream") in ("1", "true"):
+            # Stream NDJSON: mỗi trang được ghi ra ngay, không giữ toàn bộ kết quả trong RAM
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            for rows in self.query.iter_pages(
+                symbol, start, end, timeframe, page_size=page_size, final_only=final_only
+            ):
+                chunk = "".join(
+                    json.dumps(row, default=_json_default) + "\n" for row in rows
+                )
+                self.wfile.write(chunk.encode("utf-8"))
+            return
+
+        cursor = (
+            datetime.fromisoformat(params["cursor"]) if params.get("cursor") else None
+        )
+        rows, next_cursor = self.query.get_page(
+            symbol,
+            start,
+            end,
+            timeframe,
+            page_size=page_size,
+            cursor=cursor,
+            final_only=final_only,
+        )
+        self._send_json(
+            200,
+            {
+                "symbol": symbol.upper(),
+                "timeframe": timeframe,
+                "count": len(rows),
+                "next_cursor": next_cursor,
+                "data": rows,
+            },
+        )
+
+
+def run_server(host=None, port=None):
+    OhlcvRequestHandler.query = OhlcvQuery()
+    host = host or QUERY_CONFIG["host"]
+    port = port or QUERY_CONFIG["port"]
+    server = ThreadingHTTPServer((host, port), OhlcvRequestHandler)
+    logger.info(f"OHLCV query service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Received shutdown signal. Exiting...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run local OHLCV query service")
+    parser.add_argument("--host", default=QUERY_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=QUERY_CONFIG["port"])
+    args = parser.parse_args()
+
+    run_server(args.host, args.port)
@@ -0,0 +1,336 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import (
+    GOLD_DATA_CONFIG,
+    QUERY_CONFIG,
+    ROLLUP_CONFIG,
+    CANDLE_STATE_CONFIG,
+)
+from src.etl.load.retention_load import CandleArchiveReader, archive_collection_name
+from src.etl.load.rollup_load import rollup_collection_name
+from src.utils.candle_state_util import FINAL_FILTER, FORMING, PROVISIONAL
+from src.utils.timeframe_util import (
+    bucket_start,
+    mongo_ohlcv_group,
+    timeframe_delta,
+)
+
+OHLCV_PROJECTION = {
+    "_id": 0,
+    "datetime": 1,
+    "open": 1,
+    "high": 1,
+    "low": 1,
+    "close": 1,
+    "volume": 1,
+}
+
+
+class OhlcvQuery:
+    """
+    Đọc OHLCV theo symbol, khoảng thời gian và khung thời gian (1m, 5m, 15m, 1h, 4h, 1d).
+
+    - Resample được đẩy xuống Mongo bằng aggregation ($group theo bucket)
+    - Kết quả trả theo trang, mỗi trang kèm cursor để lấy trang tiếp theo,
+      không materialize toàn bộ khoảng thời gian
+    - Các trang đã đóng hoàn toàn (không chứa nến đang hình thành) được cache LRU
+    - Khoảng thời gian đã được retention nén vào archive tháng được đọc và
+      resample trong Python, gộp với dữ liệu trong collection chính
+    - final_only=True chỉ trả về nến đã xác nhận (bỏ nến forming / provisional),
+      resample từ nến phút thay vì đọc rollup
+    """
+
+    def __init__(self) -> None:
+        try:
+            self.logger = LoggerConfig.logger_config("Query OHLCV gold data")
+            self.mongo_config = MongoConfig()
+            self.mongo_client = self.mongo_config.get_client("query")
+            self.gold_db = self.mongo_client.get_database(GOLD_DATA_CONFIG["database"])
+            self.collections = {
+                GOLD_DATA_CONFIG["symbol"]: self.gold_db.get_collection(
+                    GOLD_DATA_CONFIG["collection"]
+                )
+            }
+            # Archive tháng của các nến phút đã ra khỏi tier nóng
+            self.archives = {
+                GOLD_DATA_CONFIG["symbol"]: CandleArchiveReader(
+                    self.gold_db.get_collection(archive_collection_name())
+                )
+            }
+            # Collection rollup theo khung thời gian, đọc trực tiếp thay vì resample
+            self.rollup_collections = {}
+            if QUERY_CONFIG["use_rollups"]:
+                self.rollup_collections = {
+                    timeframe: self.gold_db.get_collection(
+                        rollup_collection_name(timeframe)
+                    )
+                    for timeframe in ROLLUP_CONFIG["timeframes"]
+                }
+            self.page_size = QUERY_CONFIG["page_size"]
+            self.max_page_size = QUERY_CONFIG["max_page_size"]
+            self.cache_size = QUERY_CONFIG["cache_size"]
+            self.cache_ttl = QUERY_CONFIG["cache_ttl_seconds"]
+            self._cache = OrderedDict()
+            self._cache_lock = threading.Lock()
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.logger.info("Successfully to connect MongoDB Config")
+        except Exception as e:
+            self.logger.error(f"Can not to connect MongoDB Config: {str(e)}")
+            raise
+
+    def _collection(self, symbol: str):
+        collection = self.collections.get(symbol.upper())
+        if collection is None:
+            raise KeyError(
+                f"Unknown symbol '{symbol}', available: {list(self.collections)}"
+            )
+        return collection
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._cache.pop(key, None)
+                self.cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return entry[1]
+
+    def _cache_put(self, key, value):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, value)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _minute_rows(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        limit: Optional[int] = None,
+        final_only: bool = False,
+    ) -> List[dict]:
+        """Nến phút trong [start, end] từ archive và collection chính (collection chính ưu tiên)"""
+        match = {"datetime": {"$gte": start, "$lte": end}}
+        if final_only:
+            match.update(FINAL_FILTER)
+        cursor = self._collection(symbol).find(match, OHLCV_PROJECTION).sort("datetime", 1)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        rows = {
+            row["datetime"]: row
+            for row in self.archives[symbol.upper()].read_range(start, end, limit=limit)
+        }
+        rows.update((row["datetime"], row) for row in cursor)
+        rows = [rows[key] for key in sorted(rows)]
+        return rows[:limit] if limit is not None else rows
+
+    @staticmethod
+    def _resample_rows(rows: List[dict], timeframe: str) -> List[dict]:
+        """Resample nến phút (đã sort) giống stage $group của mongo_ohlcv_group"""
+        if not rows:
+            return []
+        df = pd.DataFrame(rows)
+        buckets = df["datetime"].dt.floor(timeframe_delta(timeframe))
+        grouped = df.groupby(buckets, sort=True).agg(
+            open=("open", "first"),
+            high=("high", "max"),
+            low=("low", "min"),
+            close=("close", "last"),
+            volume=("volume", "sum"),
+        )
+        return [
+            {
+                "datetime": bucket.to_pydatetime(),
+                "open": row.open,
+                "high": row.high,
+                "low": row.low,
+                "close": row.close,
+                "volume": row.volume,
+            }
+            for bucket, row in zip(grouped.index, grouped.itertuples(index=False))
+        ]
+
+    def get_page(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        timeframe: str = "1m",
+        page_size: Optional[int] = None,
+        cursor: Optional[datetime] = None,
+        final_only: bool = False,
+    ) -> Tuple[List[dict], Optional[datetime]]:
+        """
+        Lấy một trang OHLCV
+
+        Args:
+            symbol: Symbol (VD: XAUUSD)
+            start: Thời điểm bắt đầu (được làm tròn về đầu bucket)
+            end: Thời điểm kết thúc (bao gồm)
+            timeframe: Khung thời gian (1m, 5m, 15m, 1h, 4h, 1d)
+            page_size: Số nến tối đa mỗi trang
+            cursor: Cursor trả về từ trang trước (None = trang đầu)
+            final_only: Chỉ lấy nến ở trạng thái final
+
+        Returns:
+            tuple: (danh sách nến, cursor trang tiếp theo hoặc None nếu hết)
+        """
+        step = timeframe_delta(timeframe)
+        page_size = min(page_size or self.page_size, self.max_page_size)
+        page_start = cursor or bucket_start(start, timeframe)
+        if page_start > end:
+            return [], None
+
+        # Rollup gộp cả nến chưa final nên final_only luôn resample từ nến phút
+        rollup = None if final_only else self.rollup_collections.get(timeframe)
+        if timeframe == "1m" or rollup is not None:
+            page_end = end
+        else:
+            # Giới hạn cửa sổ quét để mỗi trang chỉ group tối đa page_size bucket
+            page_end = min(end, page_start + step * page_size - timedelta(minutes=1))
+
+        key = (symbol.upper(), timeframe, page_start, page_end, page_size, final_only)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        collection = self._collection(symbol)
+        if rollup is not None:
+            collection = rollup
+        match = {"datetime": {"$gte": page_start, "$lte": page_end}}
+        if final_only:
+            match.update(FINAL_FILTER)
+        # Trang bắt đầu trước ranh giới archive thì đọc nến phút của cả hai tier
+        # (collection rollup không bị retention nên đọc trực tiếp)
+        boundary = (
+            self.archives[symbol.upper()].boundary() if rollup is None else None
+        )
+
+        if boundary is not None and page_start < boundary:
+            if timeframe == "1m":
+                rows = self._minute_rows(
+                    symbol, page_start, page_end, limit=page_size, final_only=final_only
+                )
+                next_cursor = (
+                    rows[-1]["datetime"] + step if len(rows) == page_size else None
+                )
+            else:
+                rows = self._resample_rows(
+                    self._minute_rows(
+                        symbol, page_start, page_end, final_only=final_only
+                    ),
+                    timeframe,
+                )
+                next_cursor = page_end + timedelta(minutes=1) if page_end < end else None
+        elif timeframe == "1m" or rollup is not None:
+            rows = list(
+                collection.find(match, OHLCV_PROJECTION)
+                .sort("datetime", 1)
+                .limit(page_size)
+            )
+            next_cursor = (
+                rows[-1]["datetime"] + step if len(rows) == page_size else None
+            )
+        else:
+            pipeline = [
+                {"$match": match},
+                {"$sort": {"datetime": 1}},
+                mongo_ohlcv_group(timeframe),
+                {"$sort": {"_id": 1}},
+                {
+                    "$project": {
+                        "_id": 0,
+                        "datetime": "$_id",
+                        "open": 1,
+                        "high": 1,
+                        "low": 1,
+                        "close": 1,
+                        "volume": 1,
+                    }
+                },
+            ]
+            rows = list(collection.aggregate(pipeline, allowDiskUse=True))
+            next_cursor = page_end + timedelta(minutes=1) if page_end < end else None
+
+        result = (rows, next_cursor)
+        # Chỉ cache khi mọi bucket trong trang đã đóng cửa (final_only: đã qua thời gian xác nhận)
+        closed_at = bucket_start(page_end, timeframe) + step
+        if final_only:
+            closed_at += timedelta(seconds=CANDLE_STATE_CONFIG["settle_seconds"])
+        if closed_at <= datetime.now() and not (
+            final_only and self._has_unconfirmed(symbol, page_start, page_end)
+        ):
+            self._cache_put(key, result)
+        return result
+
+    def _has_unconfirmed(self, symbol: str, start: datetime, end: datetime) -> bool:
+        """
+        Còn nến forming / provisional trong khoảng: promote_settled_candles chỉ chạy
+        mỗi phút trong process realtime (và không chạy khi process đó chậm / dừng),
+        nên qua settle_seconds chưa có nghĩa là nến đã final. Trang final_only thiếu
+        các nến này không được cache.
+        """
+        return (
+            self._collection(symbol).find_one(
+                {
+                    "datetime": {"$gte": start, "$lte": end},
+                    "state": {"$in": [FORMING, PROVISIONAL]},
+                },
+                {"_id": 1},
+            )
+            is not None
+        )
+
+    def iter_pages(
+        self,
+        symbol: str,
+        start: datetime,
+        end: datetime,
+        timeframe: str = "1m",
+        page_size: Optional[int] = None,
+        final_only: bool = False,
+    ) -> Iterator[List[dict]]:
+        """Duyệt lần lượt từng trang OHLCV trong khoảng thời gian"""
+        cursor = None
+        while True:
+            rows, cursor = self.get_page(
+                symbol,
+                start,
+                end,
+                timeframe,
+                page_size=page_size,
+                cursor=cursor,
+                final_only=final_only,
+            )
+            if rows:
+                yield rows
+            if cursor is None:
+                break
+
+    def get_latest(self, symbol: str, final_only: bool = False) -> Optional[dict]:
+        """Nến phút mới nhất của symbol (final_only: nến final mới nhất)"""
+        return self._collection(symbol).find_one(
+            FINAL_FILTER if final_only else {},
+            OHLCV_PROJECTION,
+            sort=[("datetime", -1)],
+        )
+
+    def get_cache_stats(self) -> dict:
+        with self._cache_lock:
+            return {
+                "entries": len(self._cache),
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+            }
@@ -0,0 +1,112 @@
+# Mã hóa nến phút của một tháng thành các cột nén (delta encoding + zlib)
+import zlib
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from bson import Binary
+
+CODEC_VERSION = 1
+PRICE_FIELDS = ("open", "high", "low", "close")
+EPOCH = np.datetime64("1970-01-01T00:00", "m")
+
+
+def _pack(values: np.ndarray, level: int) -> Binary:
+    return Binary(zlib.compress(values.astype("<i8").tobytes(), level))
+
+
+def _unpack(blob: bytes) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype="<i8")
+
+
+def _encode_column(values: np.ndarray, scale: int, level: int) -> dict:
+    """
+    Giá trị số thực được đổi sang số nguyên theo scale rồi lưu delta giữa các
+    phút liên tiếp (thường rất nhỏ nên zlib nén tốt). Nếu scale làm mất độ chính
+    xác thì lưu nguyên float64.
+    """
+    scaled = np.round(values * scale)
+    if np.all(np.isfinite(values)) and np.array_equal(scaled / scale, values):
+        ints = scaled.astype("int64")
+        deltas = np.diff(ints, prepend=np.int64(0))
+        return {"encoding": "delta", "scale": scale, "data": _pack(deltas, level)}
+    return {
+        "encoding": "raw",
+        "data": Binary(zlib.compress(values.astype("<f8").tobytes(), level)),
+    }
+
+
+def _decode_column(column: dict) -> np.ndarray:
+    if column["encoding"] == "delta":
+        return np.cumsum(_unpack(column["data"])) / column["scale"]
+    return np.frombuffer(zlib.decompress(column["data"]), dtype="<f8")
+
+
+def encode_month(
+    df: pd.DataFrame, price_scale: int = 1000, volume_scale: int = 1, level: int = 6
+) -> dict:
+    """
+    Args:
+        df: Nến của một tháng (datetime, open, high, low, close, volume)
+        price_scale: 10^số chữ số thập phân của giá
+        volume_scale: 10^số chữ số thập phân của volume
+        level: Mức nén zlib
+
+    Returns:
+        dict: Phần dữ liệu của document archive (count, start, end, days, columns)
+    """
+    df = df.sort_values("datetime").drop_duplicates(subset=["datetime"], keep="last")
+    minutes = (
+        pd.to_datetime(df["datetime"]).to_numpy().astype("datetime64[m]") - EPOCH
+    ).astype("int64")
+    columns = {
+        "datetime": {
+            "encoding": "delta",
+            "scale": 1,
+            "data": _pack(np.diff(minutes, prepend=np.int64(0)), level),
+        }
+    }
+    for field in PRICE_FIELDS:
+        columns[field] = _encode_column(
+            df[field].to_numpy(dtype="float64"), price_scale, level
+        )
+    columns["volume"] = _encode_column(
+        df["volume"].to_numpy(dtype="float64"), volume_scale, level
+    )
+    days = pd.to_datetime(df["datetime"]).dt.strftime("%Y-%m-%d").value_counts()
+    return {
+        "codec": CODEC_VERSION,
+        "count": int(len(df)),
+        "start": pd.Timestamp(df["datetime"].iloc[0]).to_pydatetime(),
+        "end": pd.Timestamp(df["datetime"].iloc[-1]).to_pydatetime(),
+        "days": {day: int(count) for day, count in sorted(days.items())},
+        "columns": columns,
+    }
+
+
+def decode_month(doc: dict) -> pd.DataFrame:
+    """Giải mã document archive thành DataFrame (datetime, open, high, low, close, volume)"""
+    columns = doc["columns"]
+    minutes = np.cumsum(_unpack(columns["datetime"]["data"]))
+    data = {"datetime": pd.to_datetime(EPOCH + minutes.astype("timedelta64[m]"))}
+    for field in (*PRICE_FIELDS, "volume"):
+        data[field] = _decode_column(columns[field])
+    return pd.DataFrame(data)
+
+
+def decode_rows(doc: dict, start: datetime, end: datetime) -> List[Dict]:
+    """Các nến trong [start, end] của một document archive, dạng dict giống document Mongo"""
+    df = decode_month(doc)
+    df = df[(df["datetime"] >= start) & (df["datetime"] <= end)]
+    return [
+        {
+            "datetime": row.datetime.to_pydatetime(),
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+            "volume": row.volume,
+        }
+        for row in df.itertuples(index=False)
+    ]
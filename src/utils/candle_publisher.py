@@ -0,0 +1,194 @@
+# Phát nến mới/cập nhật tới các subscriber qua TCP (NDJSON) thay cho việc poll Mongo
+import json
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Iterator, Optional
+
+from config.logger_config import LoggerConfig
+from config.variable_config import PUBLISHER_CONFIG
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "item"):  # numpy scalar
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _SubscriberHandler(socketserver.StreamRequestHandler):
+    """
+    Mỗi kết nối: client có thể gửi 1 dòng JSON {"resume_token": "..."} ngay khi
+    kết nối, server gửi lại các event sau token đó rồi stream event mới.
+    """
+
+    def handle(self):
+        publisher: "CandlePublisher" = self.server.publisher  # type: ignore
+        resume_token = None
+        self.connection.settimeout(PUBLISHER_CONFIG["handshake_timeout_seconds"])
+        try:
+            line = self.rfile.readline()
+            if line.strip():
+                resume_token = json.loads(line).get("resume_token")
+        except (socket.timeout, ValueError):
+            pass
+        self.connection.settimeout(None)
+
+        subscriber = publisher._subscribe(resume_token)
+        try:
+            while True:
+                try:
+                    message = subscriber.get(
+                        timeout=PUBLISHER_CONFIG["heartbeat_seconds"]
+                    )
+                except queue.Empty:
+                    message = {"type": "heartbeat", "seq": publisher.seq}
+                if message is None:
+                    break
+                self.wfile.write(
+                    (json.dumps(message, default=_json_default) + "\n").encode("utf-8")
+                )
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            publisher._unsubscribe(subscriber)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class CandlePublisher:
+    """
+    Publisher trong process (singleton): loader gọi publish() sau mỗi lần ghi nến,
+    các subscriber nhận event qua TCP với số thứ tự (seq) và resume token.
+
+    Resume token = "<epoch>:<seq>", epoch đổi mỗi lần process khởi động. Nếu token
+    thuộc epoch khác hoặc đã trôi khỏi buffer, subscriber nhận event "reset" và
+    nên đọc lại trạng thái từ Mongo trước khi tiếp tục.
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CandlePublisher, cls).__new__(cls)
+            cls._instance._init_publisher()
+        return cls._instance
+
+    def _init_publisher(self):
+        self.logger = LoggerConfig.logger_config("Candle publisher")
+        self.epoch = str(int(time.time()))
+        self.seq = 0
+        self._buffer = deque(maxlen=PUBLISHER_CONFIG["buffer_size"])
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def publish(self, event: str, candle: dict):
+        """
+        Phát một event nến
+
+        Args:
+            event: "insert" hoặc "update"
+            candle: Dữ liệu nến (datetime, open, high, low, close, volume, ...)
+        """
+        with self._lock:
+            self.seq += 1
+            message = {
+                "type": event,
+                "seq": self.seq,
+                "resume_token": f"{self.epoch}:{self.seq}",
+                "candle": {k: v for k, v in candle.items() if k != "_id"},
+            }
+            self._buffer.append(message)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Subscriber quá chậm: ngắt để client kết nối lại bằng resume token
+                self.logger.warning("Subscriber queue full, disconnecting slow consumer")
+                self._unsubscribe(subscriber)
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def _subscribe(self, resume_token: Optional[str] = None) -> queue.Queue:
+        subscriber = queue.Queue(maxsize=PUBLISHER_CONFIG["subscriber_queue_size"])
+        with self._lock:
+            if resume_token:
+                epoch, _, seq = resume_token.partition(":")
+                oldest = self._buffer[0]["seq"] if self._buffer else self.seq + 1
+                if epoch != self.epoch or not seq.isdigit() or int(seq) + 1 < oldest:
+                    subscriber.put_nowait(
+                        {"type": "reset", "seq": self.seq, "epoch": self.epoch}
+                    )
+                else:
+                    for message in self._buffer:
+                        if message["seq"] > int(seq):
+                            try:
+                                subscriber.put_nowait(message)
+                            except queue.Full:
+                                break
+            self._subscribers.append(subscriber)
+        self.logger.info(f"Subscriber connected ({len(self._subscribers)} active)")
+        return subscriber
+
+    def _unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def start_server(self, host: Optional[str] = None, port: Optional[int] = None):
+        """Khởi động TCP server trong background thread (gọi nhiều lần cũng chỉ chạy 1 server)"""
+        if self._server is not None:
+            return
+        host = host or PUBLISHER_CONFIG["host"]
+        port = port or PUBLISHER_CONFIG["port"]
+        self._server = _ThreadingTCPServer((host, port), _SubscriberHandler)
+        self._server.publisher = self  # type: ignore
+        threading.Thread(
+            target=self._server.serve_forever, name="candle-publisher", daemon=True
+        ).start()
+        self.logger.info(f"Candle publisher listening on tcp://{host}:{port}")
+
+    def get_status(self) -> dict:
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "seq": self.seq,
+                "buffered": len(self._buffer),
+                "subscribers": len(self._subscribers),
+            }
+
+
+def subscribe(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    resume_token: Optional[str] = None,
+) -> Iterator[dict]:
+    """
+    Client đơn giản: kết nối tới publisher và yield từng event (bỏ qua heartbeat)
+
+    Lưu lại event["resume_token"] để kết nối lại mà không mất event.
+    """
+    host = host or PUBLISHER_CONFIG["host"]
+    port = port or PUBLISHER_CONFIG["port"]
+    with socket.create_connection((host, port)) as sock:
+        sock.sendall((json.dumps({"resume_token": resume_token}) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                message = json.loads(line)
+                if message.get("type") != "heartbeat":
+                    yield message
@@ -0,0 +1,66 @@
+# Nến phút gọn cho đường realtime mỗi tick: extract, validate, upsert không cần DataFrame
+from datetime import datetime
+from typing import List
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class Candle:
+    """
+    Một nến phút (datetime + OHLCV) dạng __slots__: mỗi tick chỉ tạo vài object
+    nhỏ thay vì nhiều DataFrame. Chuyển sang document Mongo bằng to_doc().
+    """
+
+    __slots__ = ("datetime", "open", "high", "low", "close", "volume")
+
+    def __init__(
+        self,
+        datetime: datetime,
+        open: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float,
+    ) -> None:
+        self.datetime = datetime
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def fields(self) -> dict:
+        """OHLCV (không có datetime)"""
+        return {
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+        }
+
+    def to_doc(self) -> dict:
+        return {"datetime": self.datetime, **self.fields()}
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "Candle":
+        return cls(doc["datetime"], *(doc[field] for field in OHLCV_FIELDS))
+
+    @classmethod
+    def from_frame(cls, df) -> List["Candle"]:
+        """Chuyển DataFrame (cột datetime + OHLCV) sang danh sách Candle"""
+        if df is None or df.empty:
+            return []
+        columns = [df["datetime"].tolist()] + [df[f].tolist() for f in OHLCV_FIELDS]
+        return [cls(*values) for values in zip(*columns)]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Candle):
+            return NotImplemented
+        return all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __repr__(self) -> str:
+        return (
+            f"Candle({self.datetime}, o={self.open}, h={self.high}, l={self.low}, "
+            f"c={self.close}, v={self.volume})"
+        )
@@ -0,0 +1,27 @@
+# Vòng đời của nến phút: forming -> provisional -> final
+from datetime import datetime
+
+# Phút chưa đóng cửa, được ghi lại mỗi vài giây
+FORMING = "forming"
+# Phút đã đóng cửa, giá đóng cửa lấy ngay khi chuyển phút (nguồn còn có thể sửa)
+PROVISIONAL = "provisional"
+# Nến đã xác nhận: không bị ghi lại bởi các lần upsert forming / provisional
+FINAL = "final"
+
+STATES = (FORMING, PROVISIONAL, FINAL)
+
+# Bản ghi cũ chưa có trường state được coi là final
+FINAL_FILTER = {"state": {"$nin": [FORMING, PROVISIONAL]}}
+
+
+def writable_filter(datetime_key: datetime, state: str) -> dict:
+    """
+    Filter của upsert có điều kiện: chỉ khớp nến đang ở trạng thái trước state.
+    Nến đã ở trạng thái sau (hoặc final) không khớp, upsert sẽ thử insert và bị
+    unique index datetime_1 từ chối (duplicate key) - nghĩa là không được ghi lại.
+    """
+    if state == FORMING:
+        return {"datetime": datetime_key, "state": FORMING}
+    if state == PROVISIONAL:
+        return {"datetime": datetime_key, "state": {"$in": [FORMING, PROVISIONAL]}}
+    raise ValueError(f"Final candles are written by insert / reconcile, not '{state}' upsert")
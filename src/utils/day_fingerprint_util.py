@@ -0,0 +1,98 @@
+# Fingerprint theo ngày của nến phút: tính từ Mongo (cursor projection) và từ DataFrame nguồn
+import hashlib
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.variable_config import GOLD_DATA_CONFIG, RECONCILE_CONFIG
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+
+def _scale(field: str) -> int:
+    return (
+        RECONCILE_CONFIG["volume_scale"]
+        if field == "volume"
+        else RECONCILE_CONFIG["price_scale"]
+    )
+
+
+def _canonical_rows(datetimes: pd.Series, values: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Ma trận int64 little-endian [phút trong ngày, open, high, low, close, volume]
+    với giá/volume đổi sang tick: cùng cách làm tròn cho cả hai phía
+    """
+    columns = [(datetimes.dt.hour * 60 + datetimes.dt.minute).to_numpy(dtype="int64")]
+    for field in FIELDS:
+        columns.append(
+            np.floor(values[field].astype("float64") * _scale(field) + 0.5).astype("int64")
+        )
+    return np.column_stack(columns).astype("<i8")
+
+
+def _fingerprints(df: pd.DataFrame) -> Dict[str, dict]:
+    """Fingerprint mỗi ngày từ DataFrame đã sort theo datetime và không trùng phút"""
+    if df.empty:
+        return {}
+    datetimes = pd.to_datetime(df["datetime"])
+    rows = _canonical_rows(datetimes, {field: df[field].to_numpy() for field in FIELDS})
+    days = datetimes.dt.strftime("%Y-%m-%d").to_numpy()
+    # Vị trí đầu mỗi ngày trong mảng đã sort
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    ends = np.r_[starts[1:], len(days)]
+    close = df["close"].to_numpy(dtype="float64")
+    volume = df["volume"].to_numpy(dtype="float64")
+    return {
+        days[a]: {
+            "count": int(b - a),
+            "sum_close": float(close[a:b].sum()),
+            "sum_volume": float(volume[a:b].sum()),
+            "sha1": hashlib.sha1(rows[a:b].tobytes()).hexdigest(),
+        }
+        for a, b in zip(starts, ends)
+    }
+
+
+def mongo_day_fingerprints(
+    collection,
+    start: datetime,
+    end: datetime,
+    exclude: Optional[Iterable[datetime]] = None,
+) -> Dict[str, dict]:
+    """
+    Fingerprint mỗi ngày trong [start, end): count, tổng close, tổng volume và
+    sha1 của các nến (phút, OHLCV đổi sang tick) sort theo datetime.
+    Nến đọc bằng cursor projection (không tải document đầy đủ) theo batch.
+
+    Args:
+        exclude: Các phút bỏ qua (nến đang giữ lại vì bản nguồn bị quarantine)
+    """
+    projection = {"_id": 0, "datetime": 1, **{field: 1 for field in FIELDS}}
+    cursor = (
+        collection.find({"datetime": {"$gte": start, "$lt": end}}, projection)
+        .sort("datetime", 1)
+        .batch_size(GOLD_DATA_CONFIG["batch_size_extract"])
+    )
+    df = pd.DataFrame(list(cursor), columns=["datetime", *FIELDS])
+    if exclude:
+        df = df[~df["datetime"].isin(list(exclude))]
+    return _fingerprints(df)
+
+
+def frame_day_fingerprints(df: pd.DataFrame) -> Dict[str, dict]:
+    """Cùng fingerprint với mongo_day_fingerprints, tính từ DataFrame nguồn"""
+    if df is None or df.empty:
+        return {}
+    df = df.drop_duplicates(subset=["datetime"], keep="first").sort_values("datetime")
+    return _fingerprints(df)
+
+
+def fingerprints_match(stored: dict, source: dict) -> bool:
+    """Số nến và sha1 khớp tuyệt đối (tổng close/volume chỉ để log khi lệch)"""
+    return (
+        stored is not None
+        and stored["count"] == source["count"]
+        and stored["sha1"] == source["sha1"]
+    )
@@ -1,8 +1,7 @@
-import requests
 import time
 from datetime import datetime, timedelta
 from typing import Optional
-from config.variable_config import DISCORD_CONFIG
+from config.variable_config import DISCORD_CONFIG, FRESHNESS_CONFIG
 from config.logger_config import LoggerConfig
 
 
@@ -13,6 +12,15 @@ class DiscordAlertUtil:
     Tự động bỏ qua cảnh báo vào T7/CN khi thị trường đóng cửa.
     """
 
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> "DiscordAlertUtil":
+        """Instance dùng chung trong process (chung cả trạng thái cooldown)"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
     def __init__(self):
         self.logger = LoggerConfig.logger_config("Discord Alert")
         self.webhook_url = DISCORD_CONFIG["webhook_url"]
@@ -25,6 +33,8 @@ class DiscordAlertUtil:
         self.no_data_threshold = timedelta(
             minutes=1
         )  # Cảnh báo sau 1 phút không có data
+        # Cảnh báo khi p90 độ trễ nến đóng cửa → finalize vượt ngưỡng
+        self.latency_p90_threshold = FRESHNESS_CONFIG["alert_p90_seconds"]
 
         if not self.enabled:
             self.logger.info("Discord alerts are disabled")
@@ -131,6 +141,8 @@ class DiscordAlertUtil:
             return False
 
         try:
+            import requests
+
             payload = {"content": message}
 
             response = requests.post(self.webhook_url, json=payload, timeout=10)
@@ -349,3 +361,28 @@ class DiscordAlertUtil:
         else:
             # Lần đầu tiên check, không gửi cảnh báo ngay
             self.last_successful_data_time[tracking_key] = now
+
+    def check_and_alert_data_latency(self, source: str, p90_seconds: float):
+        """
+        Cảnh báo khi dữ liệu vẫn về nhưng về trễ (p90 độ trễ vượt ngưỡng)
+        Tự động bỏ qua nếu thị trường đóng cửa
+
+        Args:
+            source: Tên nguồn data
+            p90_seconds: Percentile 90 của độ trễ nến đóng cửa → finalize (giây)
+        """
+        if self._is_market_closed_time():
+            return
+
+        if p90_seconds < self.latency_p90_threshold:
+            return
+
+        alert_key = f"data_latency_{source}"
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        message = f"**GOLD - CẢNH BÁO: Dữ liệu từ {source} về trễ**\n"
+        message += f"Thời gian: {timestamp}\n"
+        message += f"Độ trễ p90: {p90_seconds:.1f} giây (ngưỡng {self.latency_p90_threshold:.0f} giây)\n"
+        message += f"Nến đã đóng cửa nhưng được finalize vào database chậm"
+
+        self._send_discord_message(message, alert_key)
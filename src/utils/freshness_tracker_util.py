@@ -0,0 +1,57 @@
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from config.variable_config import FRESHNESS_CONFIG
+
+
+class FreshnessTrackerUtil:
+    """
+    Theo dõi độ trễ "nến đóng cửa → đã finalize trong Mongo" theo cửa sổ trượt.
+
+    Mỗi nguồn ghi (VD: realtime, gap_fill) có một cửa sổ riêng để độ trễ của
+    việc điền khoảng trống không làm lệch số liệu của luồng realtime.
+    """
+
+    def __init__(self, window_size: Optional[int] = None):
+        self.window_size = window_size or FRESHNESS_CONFIG["window_size"]
+        self._latencies: Dict[str, deque] = {}
+
+    @staticmethod
+    def candle_close_time(candle_time: datetime) -> datetime:
+        """Thời điểm nến phút đóng cửa"""
+        return candle_time + timedelta(minutes=1)
+
+    def record(self, candle_time: datetime, finalized_at: datetime, source: str):
+        """Ghi nhận độ trễ (giây) của một nến vừa được finalize"""
+        latency = (finalized_at - self.candle_close_time(candle_time)).total_seconds()
+        window = self._latencies.get(source)
+        if window is None:
+            window = self._latencies[source] = deque(maxlen=self.window_size)
+        window.append(latency)
+
+    def record_many(
+        self, candle_times: Iterable[datetime], finalized_at: datetime, source: str
+    ):
+        for candle_time in candle_times:
+            self.record(candle_time, finalized_at, source)
+
+    def get_percentiles(self, percentiles=(50, 90, 99)) -> Dict[str, dict]:
+        """
+        Tính percentile độ trễ cho từng nguồn
+
+        Returns:
+            dict: {source: {"count": n, "p50": s, "p90": s, "p99": s, "max": s}}
+        """
+        result = {}
+        for source, window in self._latencies.items():
+            if not window:
+                continue
+            values = np.fromiter(window, dtype="float64", count=len(window))
+            stats = {"count": len(values), "max": float(values.max())}
+            for p, v in zip(percentiles, np.percentile(values, percentiles)):
+                stats[f"p{p}"] = float(v)
+            result[source] = stats
+        return result
@@ -0,0 +1,225 @@
+# Kiểm tra nhanh Mongo đã có đủ dữ liệu của file lịch sử chưa, để bỏ qua download/import
+import json
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.variable_config import GOLD_DATA_CONFIG, HISTORICAL_CONFIG
+
+
+class HistoricalCoverageUtil:
+    """
+    Sau mỗi lần import thành công, lưu manifest của file nguồn (nguồn, datetime
+    đầu/cuối, số nến mỗi ngày) vào file JSON cạnh dữ liệu. Lần khởi động sau chỉ
+    cần so sánh manifest với Mongo:
+
+    1. min/max datetime (2 truy vấn find_one trên index datetime)
+    2. số document mỗi ngày trong khoảng của manifest (aggregate chỉ dùng trường datetime)
+
+    Nếu Mongo có đủ mọi ngày thì không cần tải lại file từ Google Drive.
+    File trên Drive có thể được thêm dòng mới: manifest lưu phiên bản file lúc tải
+    (ETag / Last-Modified / size từ HEAD) và chỉ được dùng khi phiên bản hiện tại
+    vẫn giống; không lấy được phiên bản thì manifest có hạn manifest_max_age_hours.
+    Các tháng đã được retention nén vào archive được tính từ tóm tắt số nến
+    mỗi ngày của document archive.
+    """
+
+    def __init__(self, manifest_path: Optional[str] = None):
+        self.logger = LoggerConfig.logger_config("Historical coverage")
+        manifest_path = manifest_path or HISTORICAL_CONFIG["manifest_path"]
+        if not os.path.isabs(manifest_path):
+            root_dir = os.path.dirname(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            manifest_path = os.path.join(root_dir, manifest_path)
+        self.manifest_path = manifest_path
+        self.source = GOLD_DATA_CONFIG["metatrader_data_gdrive_url"]
+        self.max_age = timedelta(hours=HISTORICAL_CONFIG["manifest_max_age_hours"])
+
+    @staticmethod
+    def build_manifest(df: pd.DataFrame, source: str, limit: Optional[datetime] = None):
+        """
+        Tạo manifest từ DataFrame đã import
+
+        Args:
+            df: Dữ liệu lịch sử (cột datetime)
+            source: URL/đường dẫn file nguồn
+            limit: Watermark realtime lúc import - các phút từ đây do realtime ghi
+        """
+        datetimes = pd.to_datetime(df["datetime"]).drop_duplicates()
+        if limit is not None:
+            datetimes = datetimes[datetimes < limit]
+        if datetimes.empty:
+            return None
+        days = datetimes.dt.strftime("%Y-%m-%d").value_counts().sort_index()
+        return {
+            "source": source,
+            "start": datetimes.min().isoformat(),
+            "end": datetimes.max().isoformat(),
+            "rows": int(len(datetimes)),
+            "days": {day: int(count) for day, count in days.items()},
+        }
+
+    @staticmethod
+    def merge_manifests(parts: List[dict]) -> Optional[dict]:
+        """Gộp manifest của các shard (khoảng ngày rời nhau) của cùng một file nguồn"""
+        parts = [part for part in parts if part]
+        if not parts:
+            return None
+        days = {}
+        for part in parts:
+            for day, count in part["days"].items():
+                days[day] = days.get(day, 0) + count
+        return {
+            "source": parts[0]["source"],
+            "start": min(part["start"] for part in parts),
+            "end": max(part["end"] for part in parts),
+            "rows": sum(part["rows"] for part in parts),
+            "days": dict(sorted(days.items())),
+        }
+
+    def remote_version(self) -> Optional[dict]:
+        """
+        Phiên bản hiện tại của file nguồn (ETag, Last-Modified, size) lấy bằng HEAD
+
+        Returns:
+            dict hoặc None nếu không lấy được (mất mạng, Drive trả trang HTML xác nhận)
+        """
+        if not self.source or not str(self.source).startswith(("http://", "https://")):
+            return None
+        try:
+            import requests
+
+            response = requests.head(self.source, allow_redirects=True, timeout=10)
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.warning(f"Cannot read historical source version: {e}")
+            return None
+        headers = response.headers
+        # Trang xác nhận virus scan của Drive không phải file nguồn
+        if headers.get("Content-Type", "").startswith("text/html"):
+            return None
+        version = {
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": headers.get("Content-Length"),
+        }
+        return {k: v for k, v in version.items() if v} or None
+
+    def load_manifest(self) -> Optional[dict]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Cannot read coverage manifest: {e}")
+            return None
+
+    def save_manifest(self, manifest: dict, remote: Optional[dict] = None):
+        """
+        Args:
+            manifest: Manifest của dữ liệu đã import
+            remote: remote_version() lấy trước khi tải file (None = không biết)
+        """
+        manifest = {**manifest, "saved_at": datetime.now().isoformat(), "remote": remote}
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self.logger.info(
+            f"Saved coverage manifest: {manifest['start']} -> {manifest['end']}, {manifest['rows']} rows"
+        )
+
+    def check(
+        self, collection, manifest: Optional[dict] = None, archive=None
+    ) -> Tuple[bool, str]:
+        """
+        So sánh manifest với dữ liệu trong Mongo
+
+        Args:
+            collection: Collection nến phút
+            manifest: Manifest cần kiểm tra (mặc định: đọc từ file)
+            archive: CandleArchiveReader của collection (None = không có archive)
+
+        Returns:
+            tuple: (đã đủ dữ liệu hay chưa, lý do)
+        """
+        manifest = manifest or self.load_manifest()
+        if not manifest:
+            return False, "no coverage manifest from a previous import"
+        if manifest.get("source") != self.source:
+            return False, "historical source changed since last import"
+        fresh, reason = self._check_version(manifest)
+        if not fresh:
+            return False, reason
+
+        start = datetime.fromisoformat(manifest["start"])
+        end = datetime.fromisoformat(manifest["end"])
+        first = collection.find_one({}, {"_id": 0, "datetime": 1}, sort=[("datetime", 1)])
+        last = collection.find_one({}, {"_id": 0, "datetime": 1}, sort=[("datetime", -1)])
+        first = first["datetime"] if first else None
+        last = last["datetime"] if last else None
+        archived_first = archive.first_datetime() if archive is not None else None
+        if archived_first is not None:
+            first = min(first or archived_first, archived_first)
+            last = last or archive.boundary()
+        if first is None or last is None:
+            return False, "collection is empty"
+        if first > start or last < end:
+            return (
+                False,
+                f"stored range {first} -> {last} does not cover {start} -> {end}",
+            )
+
+        pipeline = [
+            {"$match": {"datetime": {"$gte": start, "$lte": end}}},
+            {"$project": {"_id": 0, "datetime": 1}},
+            {
+                "$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$datetime"}},
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+        stored = {
+            doc["_id"]: doc["count"]
+            for doc in collection.aggregate(pipeline, allowDiskUse=True)
+        }
+        if archived_first is not None:
+            for day, count in archive.day_counts(start, end).items():
+                stored[day] = stored.get(day, 0) + count
+        missing_days = [
+            day for day, count in manifest["days"].items() if stored.get(day, 0) < count
+        ]
+        if missing_days:
+            return (
+                False,
+                f"{len(missing_days)} days have fewer candles than the source "
+                f"(first: {missing_days[0]})",
+            )
+        return True, f"all {len(manifest['days'])} source days already stored"
+
+    def _check_version(self, manifest: dict) -> Tuple[bool, str]:
+        """File nguồn có còn là file đã import lúc ghi manifest không"""
+        stored = manifest.get("remote")
+        current = self.remote_version() if stored else None
+        if stored and current:
+            changed = [
+                key for key in current if key in stored and stored[key] != current[key]
+            ]
+            if changed:
+                return False, f"historical source file changed ({', '.join(changed)})"
+            if any(key in stored for key in current):
+                return True, "historical source file unchanged"
+        saved_at = manifest.get("saved_at")
+        if saved_at is None:
+            return False, "coverage manifest has no timestamp"
+        age = datetime.now() - datetime.fromisoformat(saved_at)
+        if age > self.max_age:
+            return False, f"coverage manifest is {age} old and the source version is unknown"
+        return True, "coverage manifest is recent"
@@ -0,0 +1,46 @@
+# Ranh giới thời gian giữa ingest realtime và import lịch sử chạy song song
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional
+
+from config.logger_config import LoggerConfig
+
+
+class IngestWatermarkUtil:
+    """
+    Singleton trong process. Realtime sở hữu mọi phút >= watermark, import lịch sử
+    chỉ được ghi các phút < watermark, nên hai bên không bao giờ ghi cùng một phút.
+
+    - Realtime gọi claim(minute) trước mỗi lần ghi: watermark chỉ có thể lùi về quá khứ
+    - Import lịch sử ghi từng batch trong `with watermark.hold() as limit:`;
+      claim làm lùi watermark sẽ chờ batch đang ghi kết thúc
+    - watermark = None: chưa có realtime trong process, lịch sử được ghi mọi phút
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(IngestWatermarkUtil, cls).__new__(cls)
+            cls._instance.logger = LoggerConfig.logger_config("Ingest watermark")
+            cls._instance.value = None
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def claim(self, minute: datetime):
+        """Realtime chuẩn bị ghi từ `minute` trở đi"""
+        minute = minute.replace(second=0, microsecond=0)
+        value = self.value
+        if value is not None and minute >= value:
+            return
+        with self._lock:
+            if self.value is None or minute < self.value:
+                self.value = minute
+                self.logger.info(f"Realtime ingest owns minutes from {minute}")
+
+    @contextmanager
+    def hold(self) -> Iterator[Optional[datetime]]:
+        """Giữ watermark cố định trong lúc import lịch sử ghi một batch"""
+        with self._lock:
+            yield self.value
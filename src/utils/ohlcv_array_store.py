@@ -0,0 +1,202 @@
+# Kho OHLCV cục bộ: mỗi symbol là một mảng numpy cố định stride trên file memory-mapped
+import os
+import threading
+from datetime import datetime
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.variable_config import ARRAY_STORE_CONFIG, GOLD_DATA_CONFIG
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("volume", "f8"),
+        ("present", "u1"),
+    ]
+)
+
+
+class OhlcvArrayStore:
+    """
+    Lưu chuỗi nến phút của một symbol thành mảng cấu trúc numpy trên file memmap.
+    Vị trí của mỗi nến = số phút kể từ epoch (ARRAY_STORE_CONFIG["epoch"]), nên:
+
+    - contains(dt) là O(1), không cần query Mongo
+    - read_range(start, end) trả về slice của memmap (zero-copy)
+    - File tự mở rộng theo từng khối grow_minutes khi ghi vượt dung lượng
+
+    Mở rộng file thay self._data bằng memmap mới (dưới _lock): ghi và remove giữ
+    lock, các hàm đọc lấy tham chiếu mapping một lần dưới lock rồi chỉ dùng bản đó.
+
+    Dùng OhlcvArrayStore.get_store(symbol) để các loader/extractor trong cùng
+    process dùng chung một instance.
+    """
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, symbol: str, root_path: str = None):
+        self.logger = LoggerConfig.logger_config("OHLCV array store")
+        self.symbol = symbol
+        root_path = root_path or ARRAY_STORE_CONFIG["root_path"]
+        if not os.path.isabs(root_path):
+            root_dir = os.path.dirname(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            root_path = os.path.join(root_dir, root_path)
+        directory = os.path.join(root_path, GOLD_DATA_CONFIG["collection"])
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{symbol}.ohlcv")
+        self.epoch = np.datetime64(ARRAY_STORE_CONFIG["epoch"], "m")
+        self.grow_minutes = ARRAY_STORE_CONFIG["grow_minutes"]
+        self._lock = threading.Lock()
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+        self._open()
+
+    @classmethod
+    def get_store(cls, symbol: str = None) -> "OhlcvArrayStore":
+        symbol = symbol or GOLD_DATA_CONFIG["symbol"]
+        with cls._stores_lock:
+            store = cls._stores.get(symbol)
+            if store is None:
+                store = cls._stores[symbol] = cls(symbol)
+            return store
+
+    def _open(self):
+        capacity = os.path.getsize(self.path) // RECORD_DTYPE.itemsize
+        if capacity == 0:
+            self._data = np.zeros(0, dtype=RECORD_DTYPE)
+        else:
+            self._data = np.memmap(
+                self.path, dtype=RECORD_DTYPE, mode="r+", shape=(capacity,)
+            )
+
+    def _snapshot(self) -> np.ndarray:
+        """Mapping hiện tại; memmap cũ vẫn hợp lệ sau khi mở rộng vì file chỉ dài ra"""
+        with self._lock:
+            return self._data
+
+    def _ensure_capacity(self, max_offset: int):
+        if max_offset < len(self._data):
+            return
+        # Làm tròn lên theo khối để không phải resize file mỗi phút
+        blocks = max_offset // self.grow_minutes + 1
+        new_capacity = blocks * self.grow_minutes
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+        with open(self.path, "r+b") as f:
+            f.truncate(new_capacity * RECORD_DTYPE.itemsize)
+        self._open()
+        self.logger.debug(f"Array store {self.path} grown to {new_capacity} minutes")
+
+    def _offsets(self, datetimes) -> np.ndarray:
+        minutes = pd.to_datetime(pd.Series(datetimes)).to_numpy().astype("datetime64[m]")
+        return (minutes - self.epoch).astype("int64")
+
+    def _offset(self, dt) -> int:
+        return int((np.datetime64(dt, "m") - self.epoch) // np.timedelta64(1, "m"))
+
+    def offset_to_datetime(self, offset: int) -> datetime:
+        return pd.Timestamp(self.epoch + np.timedelta64(int(offset), "m")).to_pydatetime()
+
+    def write_frame(self, df: pd.DataFrame):
+        """Ghi các nến (cột datetime, open, high, low, close, volume) vào store"""
+        if df is None or df.empty:
+            return
+        offsets = self._offsets(df["datetime"])
+        valid = offsets >= 0
+        if not valid.all():
+            offsets = offsets[valid]
+            df = df[valid]
+        if len(offsets) == 0:
+            return
+        with self._lock:
+            self._ensure_capacity(int(offsets.max()))
+            for field in ("open", "high", "low", "close", "volume"):
+                self._data[field][offsets] = df[field].to_numpy(dtype="float64")
+            self._data["present"][offsets] = 1
+
+    def write_record(self, record: dict):
+        """Ghi một nến (dict giống document Mongo) bằng phép gán scalar, không tạo DataFrame"""
+        offset = self._offset(record["datetime"])
+        if offset < 0:
+            return
+        with self._lock:
+            self._ensure_capacity(offset)
+            self._data[offset] = (
+                record["open"],
+                record["high"],
+                record["low"],
+                record["close"],
+                record["volume"],
+                1,
+            )
+
+    def write_records(self, records: Iterable[dict]):
+        """Ghi danh sách dict nến (giống document Mongo) vào store"""
+        records = list(records)
+        if len(records) == 1:
+            self.write_record(records[0])
+        elif records:
+            self.write_frame(
+                pd.DataFrame(
+                    records, columns=["datetime", "open", "high", "low", "close", "volume"]
+                )
+            )
+
+    def remove(self, datetimes: Iterable[datetime]):
+        """Đánh dấu các phút không còn tồn tại (VD: bị xóa khỏi Mongo)"""
+        offsets = self._offsets(list(datetimes))
+        with self._lock:
+            offsets = offsets[(offsets >= 0) & (offsets < len(self._data))]
+            self._data["present"][offsets] = 0
+
+    def contains(self, dt: datetime) -> bool:
+        """Phút dt đã có trong store chưa (O(1))"""
+        offset = self._offset(dt)
+        data = self._snapshot()
+        return 0 <= offset < len(data) and bool(data["present"][offset])
+
+    def present_mask(self, datetimes) -> np.ndarray:
+        """Mảng bool: từng datetime đã có trong store chưa"""
+        offsets = self._offsets(datetimes)
+        data = self._snapshot()
+        mask = np.zeros(len(offsets), dtype=bool)
+        in_range = (offsets >= 0) & (offsets < len(data))
+        mask[in_range] = data["present"][offsets[in_range]].astype(bool)
+        return mask
+
+    def read_range(self, start: datetime, end: datetime) -> np.ndarray:
+        """
+        Slice zero-copy các phút trong [start, end] (bao gồm cả phút chưa có dữ liệu,
+        lọc bằng trường present). Phần ngoài dung lượng file bị cắt bỏ.
+        """
+        data = self._snapshot()
+        first = max(0, int(self._offsets([start])[0]))
+        last = min(len(data) - 1, int(self._offsets([end])[0]))
+        if last < first:
+            return data[0:0]
+        return data[first : last + 1]
+
+    def missing_minutes(self, start: datetime, end: datetime) -> List[datetime]:
+        """Các phút trong [start, end] chưa có trong store"""
+        first = int(self._offsets([start])[0])
+        last = int(self._offsets([end])[0])
+        offsets = np.arange(first, last + 1, dtype="int64")
+        data = self._snapshot()
+        in_range = (offsets >= 0) & (offsets < len(data))
+        present = np.zeros(len(offsets), dtype=bool)
+        present[in_range] = data["present"][offsets[in_range]].astype(bool)
+        return [self.offset_to_datetime(offset) for offset in offsets[~present]]
+
+    def flush(self):
+        with self._lock:
+            if isinstance(self._data, np.memmap):
+                self._data.flush()
@@ -0,0 +1,137 @@
+# Index trong bộ nhớ các phút đã có trong Mongo trong cửa sổ gần đây (bitset trượt)
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.variable_config import GOLD_DATA_CONFIG, RECENT_KEY_INDEX_CONFIG
+
+
+class RecentKeyIndexUtil:
+    """
+    Bitset một bit mỗi phút cho cửa sổ [window_start, window_end] gần nhất.
+
+    Sau khi warm (một query datetime trong cửa sổ lúc khởi động), index là nguồn
+    sự thật cho các phút trong cửa sổ: loader cập nhật sau mỗi lần ghi/xóa thành
+    công, nên filter_existing_data không cần hỏi Mongo cho dữ liệu gần đây.
+    Phút ngoài cửa sổ trả về "không biết" và caller tự hỏi Mongo.
+
+    Ghi từ process khác không được thấy; trường hợp xấu nhất là insert lại một
+    phút đã có và bị unique index từ chối (duplicate key), không mất dữ liệu.
+
+    Dùng RecentKeyIndexUtil.get_index() để extractor và loader dùng chung instance.
+    """
+
+    _indexes = {}
+    _indexes_lock = threading.Lock()
+
+    def __init__(self, window_minutes: Optional[int] = None):
+        self.logger = LoggerConfig.logger_config("Recent key index")
+        self.window_minutes = window_minutes or RECENT_KEY_INDEX_CONFIG["window_minutes"]
+        self._bits = np.zeros(self.window_minutes, dtype=bool)
+        # Phút cuối cùng của cửa sổ (numpy datetime64[m]); None = chưa warm
+        self._end = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_index(cls, collection_name: Optional[str] = None) -> "RecentKeyIndexUtil":
+        collection_name = collection_name or GOLD_DATA_CONFIG["collection"]
+        with cls._indexes_lock:
+            index = cls._indexes.get(collection_name)
+            if index is None:
+                index = cls._indexes[collection_name] = cls()
+            return index
+
+    @property
+    def is_warm(self) -> bool:
+        return self._end is not None
+
+    def window(self):
+        """(window_start, window_end) dạng datetime, hoặc None nếu chưa warm"""
+        if self._end is None:
+            return None
+        end = pd.Timestamp(self._end).to_pydatetime()
+        return end - timedelta(minutes=self.window_minutes - 1), end
+
+    @staticmethod
+    def _minutes(datetimes) -> np.ndarray:
+        return pd.to_datetime(pd.Series(datetimes)).to_numpy().astype("datetime64[m]")
+
+    def warm(self, collection, now: datetime):
+        """
+        Nạp các phút đã có trong cửa sổ kết thúc tại phút hiện tại (một query duy nhất)
+
+        Args:
+            collection: Collection nến phút
+            now: Thời điểm hiện tại (theo đồng hồ của extractor)
+        """
+        end = np.datetime64(now.replace(second=0, microsecond=0), "m")
+        start = end - np.timedelta64(self.window_minutes - 1, "m")
+        cursor = collection.find(
+            {"datetime": {"$gte": pd.Timestamp(start).to_pydatetime()}},
+            {"_id": 0, "datetime": 1},
+        )
+        datetimes = [doc["datetime"] for doc in cursor]
+        with self._lock:
+            self._bits[:] = False
+            self._end = end
+            self._set_locked(datetimes, True)
+        self.logger.info(
+            f"Recent key index warmed with {len(datetimes)} minutes since {pd.Timestamp(start)}"
+        )
+
+    def _advance_locked(self, new_end):
+        shift = int((new_end - self._end) // np.timedelta64(1, "m"))
+        if shift >= self.window_minutes:
+            self._bits[:] = False
+        else:
+            self._bits[:-shift] = self._bits[shift:]
+            self._bits[-shift:] = False
+        self._end = new_end
+
+    def _set_locked(self, datetimes, value: bool):
+        if self._end is None or len(datetimes) == 0:
+            return
+        minutes = self._minutes(datetimes)
+        if value and minutes.max() > self._end:
+            # Cửa sổ trượt theo phút mới nhất được ghi
+            self._advance_locked(minutes.max())
+        positions = (minutes - self._end).astype("int64") + self.window_minutes - 1
+        positions = positions[(positions >= 0) & (positions < self.window_minutes)]
+        self._bits[positions] = value
+
+    def add(self, datetimes: Iterable[datetime]):
+        """Đánh dấu các phút đã được ghi thành công vào Mongo"""
+        datetimes = list(datetimes)
+        with self._lock:
+            self._set_locked(datetimes, True)
+
+    def remove(self, datetimes: Iterable[datetime]):
+        """Đánh dấu các phút đã bị xóa khỏi Mongo"""
+        datetimes = list(datetimes)
+        with self._lock:
+            self._set_locked(datetimes, False)
+
+    def lookup(self, datetimes):
+        """
+        Tra cứu nhiều phút cùng lúc
+
+        Returns:
+            tuple: (in_window, present) - hai mảng bool; present chỉ có nghĩa
+            ở các vị trí in_window=True
+        """
+        minutes = self._minutes(datetimes)
+        in_window = np.zeros(len(minutes), dtype=bool)
+        present = np.zeros(len(minutes), dtype=bool)
+        with self._lock:
+            if self._end is None:
+                return in_window, present
+            positions = (minutes - self._end).astype("int64") + self.window_minutes - 1
+            in_window = (positions >= 0) & (positions < self.window_minutes)
+            present[in_window] = self._bits[positions[in_window]]
+            # Phút sau window_end chắc chắn chưa được ghi (index đã thấy mọi phút mới hơn)
+            in_window |= positions >= self.window_minutes
+        return in_window, present
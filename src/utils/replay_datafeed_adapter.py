@@ -0,0 +1,273 @@
+# Adapter replay dữ liệu phút đã lưu (Mongo/Parquet) thay cho TradingView để load test
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import GOLD_DATA_CONFIG, PARQUET_EXPORT_CONFIG, REPLAY_CONFIG
+from src.utils.tvdatafeed_adapter import TVDataFeedAdapter
+
+
+def use_replay_collections(source_collection: Optional[str] = None) -> str:
+    """
+    Chuyển mọi lần ghi của process sang REPLAY_TARGET_COLLECTION (collection nến,
+    rollup, quarantine, archive, spool / array store đều lấy tên từ GOLD_DATA_CONFIG)
+    và tắt Parquet export (thư mục export không tách theo collection).
+    Gọi trước khi tạo pipeline.
+
+    Args:
+        source_collection: Collection nguồn của replay (None = replay từ file)
+
+    Returns:
+        str: Tên collection đích
+
+    Raises:
+        ValueError: Collection đích trùng collection thật hoặc trùng nguồn replay
+    """
+    target = REPLAY_CONFIG["target_collection"]
+    live = GOLD_DATA_CONFIG["collection"]
+    if target == live:
+        raise ValueError(
+            f"REPLAY_TARGET_COLLECTION must differ from the live collection '{live}'"
+        )
+    if source_collection is not None and target == source_collection:
+        raise ValueError(
+            f"REPLAY_TARGET_COLLECTION '{target}' is also the replay source collection"
+        )
+    GOLD_DATA_CONFIG["collection"] = target
+    PARQUET_EXPORT_CONFIG["enabled"] = False
+    return target
+
+
+class ReplayDataFeedAdapter(TVDataFeedAdapter):
+    """
+    Thay thế TVDataFeedAdapter bằng dữ liệu đã lưu, phát lại theo đồng hồ mô phỏng.
+
+    Đồng hồ mô phỏng bắt đầu tại start_time và chạy nhanh gấp `speed` lần thời gian
+    thực. Mỗi lần get_hist chỉ trả về các nến có datetime <= thời điểm mô phỏng,
+    nến phút hiện tại được trả về ở trạng thái đang hình thành (giống TradingView).
+
+    Có thể giả lập sự cố:
+    - latency_seconds / latency_jitter_seconds: độ trễ mỗi lần gọi (thời gian thực)
+    - drop_rate: xác suất mỗi nến bị bỏ khỏi một response
+    - outages: danh sách (start, end) theo thời gian mô phỏng, gọi trong khoảng này lỗi
+    - outage_rate / outage_duration: xác suất mỗi lần gọi mở ra một outage ngẫu nhiên
+    """
+
+    def __init__(
+        self,
+        bars: pd.DataFrame,
+        start_time: Optional[datetime] = None,
+        speed: float = 1.0,
+        latency_seconds: float = 0.0,
+        latency_jitter_seconds: float = 0.0,
+        drop_rate: float = 0.0,
+        outage_rate: float = 0.0,
+        outage_duration: timedelta = timedelta(minutes=5),
+        outages: Optional[List[Tuple[datetime, datetime]]] = None,
+        symbol: str = "OANDA:XAUUSD",
+        seed: Optional[int] = None,
+        max_retries: int = 3,
+        retry_delay: float = 2.0,
+    ):
+        """
+        Args:
+            bars: DataFrame có các cột datetime, open, high, low, close, volume
+            start_time: Thời điểm mô phỏng bắt đầu (mặc định: nến đầu tiên + 1 ngày)
+            speed: Hệ số tốc độ so với thời gian thực (100 = nhanh gấp 100 lần)
+            latency_seconds: Độ trễ cố định mỗi lần gọi
+            latency_jitter_seconds: Độ trễ ngẫu nhiên cộng thêm (0..jitter)
+            drop_rate: Xác suất bỏ từng nến trong mỗi response (0..1)
+            outage_rate: Xác suất mỗi lần gọi mở một outage mới (0..1)
+            outage_duration: Độ dài outage ngẫu nhiên theo thời gian mô phỏng
+            outages: Các khoảng outage cố định theo thời gian mô phỏng
+            symbol: Giá trị cột symbol trả về (giống tvDatafeed)
+            seed: Seed cho random để kết quả lặp lại được
+            max_retries: Số lần retry tối đa khi gặp lỗi
+            retry_delay: Thời gian chờ retry, tự co lại theo speed
+        """
+        # Không gọi TVDataFeedAdapter.__init__ để tránh tạo kết nối TradingView
+        self.logger = LoggerConfig.logger_config("Replay data feed")
+        self.username = ""
+        self.password = ""
+        self.tv = None
+        # Không rate limit theo thời gian thực khi replay nhanh hơn thực tế
+        self.guard = None
+        self.max_retries = max_retries
+        self.speed = max(float(speed), 1e-6)
+        self.retry_delay = retry_delay / self.speed
+
+        if bars is None or bars.empty:
+            raise ValueError("Replay source has no bars")
+
+        bars = bars[["datetime", "open", "high", "low", "close", "volume"]]
+        bars = bars.sort_values("datetime").drop_duplicates(subset=["datetime"])
+        self._times = pd.to_datetime(bars["datetime"]).to_numpy(dtype="datetime64[ns]")
+        self._values = bars[["open", "high", "low", "close", "volume"]].to_numpy(
+            dtype="float64"
+        )
+        self.symbol = symbol
+
+        first_bar = pd.Timestamp(self._times[0]).to_pydatetime()
+        self.start_time = start_time or (first_bar + timedelta(days=1))
+        self._wall_start = time.monotonic()
+
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.drop_rate = drop_rate
+        self.outage_rate = outage_rate
+        self.outage_duration = outage_duration
+        self.outages = list(outages or [])
+        self._rng = random.Random(seed)
+        self._np_rng = np.random.default_rng(seed)
+
+        self.stats = {
+            "calls": 0,
+            "bars_served": 0,
+            "bars_dropped": 0,
+            "outage_errors": 0,
+            "latency_seconds_total": 0.0,
+        }
+        self.logger.info(
+            f"Replay source loaded {len(self._times)} bars "
+            f"({first_bar} -> {pd.Timestamp(self._times[-1])}), "
+            f"start={self.start_time}, speed={self.speed}x"
+        )
+
+    @classmethod
+    def from_mongo(
+        cls,
+        database: Optional[str] = None,
+        collection: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        **kwargs,
+    ):
+        """Tạo replay từ collection Mongo (mặc định theo REPLAY_CONFIG)"""
+        db = MongoConfig().get_client().get_database(
+            database or REPLAY_CONFIG["source_database"]
+        )
+        source = db.get_collection(collection or REPLAY_CONFIG["source_collection"])
+        query = {}
+        if start or end:
+            query["datetime"] = {}
+            if start:
+                query["datetime"]["$gte"] = start
+            if end:
+                query["datetime"]["$lte"] = end
+        projection = {
+            "_id": 0,
+            "datetime": 1,
+            "open": 1,
+            "high": 1,
+            "low": 1,
+            "close": 1,
+            "volume": 1,
+        }
+        cursor = source.find(query, projection).sort("datetime", 1).batch_size(10000)
+        return cls(pd.DataFrame(list(cursor)), **kwargs)
+
+    @classmethod
+    def from_parquet(
+        cls,
+        path: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        **kwargs,
+    ):
+        """Tạo replay từ file (hoặc thư mục) Parquet"""
+        df = pd.read_parquet(
+            path, columns=["datetime", "open", "high", "low", "close", "volume"]
+        )
+        if start:
+            df = df[df["datetime"] >= start]
+        if end:
+            df = df[df["datetime"] <= end]
+        return cls(df, **kwargs)
+
+    def now(self) -> datetime:
+        """Thời điểm mô phỏng hiện tại"""
+        elapsed = (time.monotonic() - self._wall_start) * self.speed
+        return self.start_time + timedelta(seconds=elapsed)
+
+    def _in_outage(self, sim_now: datetime) -> bool:
+        for start, end in self.outages:
+            if start <= sim_now <= end:
+                return True
+        if self.outage_rate and self._rng.random() < self.outage_rate:
+            self.outages.append((sim_now, sim_now + self.outage_duration))
+            self.logger.warning(
+                f"Replay outage injected until {sim_now + self.outage_duration}"
+            )
+            return True
+        return False
+
+    def _get_hist(self, symbol, exchange, interval, n_bars):
+        self.stats["calls"] += 1
+
+        latency = self.latency_seconds
+        if self.latency_jitter_seconds:
+            latency += self._rng.uniform(0, self.latency_jitter_seconds)
+        if latency > 0:
+            time.sleep(latency)
+            self.stats["latency_seconds_total"] += latency
+
+        sim_now = self.now()
+        if self._in_outage(sim_now):
+            self.stats["outage_errors"] += 1
+            raise ConnectionError(f"Replay outage at {sim_now}")
+
+        current_minute = sim_now.replace(second=0, microsecond=0)
+        end_idx = int(
+            np.searchsorted(self._times, np.datetime64(current_minute, "ns"), "right")
+        )
+        start_idx = max(0, end_idx - int(n_bars))
+        if end_idx == start_idx:
+            return None
+
+        times = self._times[start_idx:end_idx]
+        values = self._values[start_idx:end_idx].copy()
+
+        # Nến phút hiện tại: trả về trạng thái đang hình thành theo số giây đã trôi qua
+        if pd.Timestamp(times[-1]).to_pydatetime() == current_minute:
+            fraction = (sim_now - current_minute).total_seconds() / 60.0
+            o, h, l, c, v = values[-1]
+            partial_close = o + (c - o) * fraction
+            values[-1] = [
+                o,
+                max(o, partial_close),
+                min(o, partial_close),
+                partial_close,
+                v * fraction,
+            ]
+
+        if self.drop_rate:
+            keep = self._np_rng.random(len(times)) >= self.drop_rate
+            self.stats["bars_dropped"] += int((~keep).sum())
+            times = times[keep]
+            values = values[keep]
+
+        self.stats["bars_served"] += len(times)
+        df = pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(times, name="datetime"),
+            columns=["open", "high", "low", "close", "volume"],
+        )
+        df.insert(0, "symbol", self.symbol)
+        return df
+
+    def _reconnect(self):
+        # Không có kết nối thật để tạo lại
+        pass
+
+    def get_stats(self) -> dict:
+        """Thống kê replay: số lần gọi, nến đã trả, nến bị bỏ, outage, độ trễ"""
+        stats = dict(self.stats)
+        stats["sim_time"] = self.now()
+        stats["speed"] = self.speed
+        return stats
@@ -0,0 +1,87 @@
+# Khai báo index của mọi collection và tạo một lần khi khởi động (không DDL trên đường ghi)
+from typing import Dict, List
+
+from pymongo import IndexModel
+
+from config.logger_config import LoggerConfig
+from config.mongo_config import MongoConfig
+from config.variable_config import GOLD_DATA_CONFIG, ROLLUP_CONFIG
+from src.etl.load.retention_load import archive_collection_name
+from src.etl.load.rollup_load import rollup_collection_name
+from src.etl.transform.candle_validate import quarantine_collection_name
+
+
+def declared_schema() -> Dict[str, List[dict]]:
+    """
+    Index khai báo cho từng collection: keys + options của create_index.
+    Thêm collection/index mới ở đây thay vì gọi create_index trong loader.
+    """
+    candle_indexes = [
+        {"keys": [("datetime", 1)], "unique": True, "name": "datetime_1"},
+        # Dùng khi nhiều symbol chung một collection
+        {"keys": [("symbol", 1), ("datetime", 1)], "name": "symbol_1_datetime_1"},
+        # promote_settled_candles tìm nến provisional đã đủ thời gian xác nhận
+        {"keys": [("state", 1), ("datetime", 1)], "name": "state_1_datetime_1"},
+    ]
+    schema = {GOLD_DATA_CONFIG["collection"]: candle_indexes}
+    for timeframe in ROLLUP_CONFIG["timeframes"]:
+        schema[rollup_collection_name(timeframe)] = [
+            {"keys": [("datetime", 1)], "unique": True, "name": "datetime_1"}
+        ]
+    schema[archive_collection_name()] = [
+        {"keys": [("month", 1)], "unique": True, "name": "month_1"}
+    ]
+    schema[quarantine_collection_name()] = [
+        {"keys": [("datetime", 1)], "name": "datetime_1"}
+    ]
+    return schema
+
+
+class SchemaBootstrapUtil:
+    """
+    Chạy một lần mỗi process ở entrypoint (src/main.py, các pipeline chạy độc lập):
+    đọc index_information() của từng collection (một lệnh mỗi collection), chỉ tạo
+    các index còn thiếu bằng một create_indexes. Index đã có nhưng khác option
+    (VD: thiếu unique) chỉ được cảnh báo, không tự drop.
+    """
+
+    _done = False
+
+    @classmethod
+    def ensure(cls, force: bool = False) -> dict:
+        """
+        Returns:
+            dict: {collection: [tên index vừa tạo]}
+        """
+        if cls._done and not force:
+            return {}
+        logger = LoggerConfig.logger_config("Schema bootstrap")
+        gold_db = MongoConfig().get_client().get_database(GOLD_DATA_CONFIG["database"])
+        created = {}
+        schema = declared_schema()
+        for collection_name, indexes in schema.items():
+            collection = gold_db.get_collection(collection_name)
+            existing = {
+                tuple(tuple(key) for key in info["key"]): info
+                for info in collection.index_information().values()
+            }
+            missing = []
+            for spec in indexes:
+                options = {k: v for k, v in spec.items() if k != "keys"}
+                current = existing.get(tuple(spec["keys"]))
+                if current is None:
+                    missing.append(IndexModel(spec["keys"], **options))
+                elif bool(current.get("unique")) != bool(spec.get("unique")):
+                    logger.warning(
+                        f"Index {spec['name']} on {collection_name} exists with "
+                        f"unique={bool(current.get('unique'))}, expected {bool(spec.get('unique'))}"
+                    )
+            if missing:
+                created[collection_name] = collection.create_indexes(missing)
+                logger.info(f"Created indexes on {collection_name}: {created[collection_name]}")
+        cls._done = True
+        logger.info(
+            f"Schema verified for {len(schema)} collections, "
+            f"{sum(len(v) for v in created.values())} indexes created"
+        )
+        return created
@@ -0,0 +1,33 @@
+# Đo thời gian import / khởi tạo từng bước lúc service khởi động
+import time
+from contextlib import contextmanager
+
+
+class StartupTimerUtil:
+    """
+    Ghi lại thời gian của từng bước khởi động và in bảng tổng hợp
+
+    Ví dụ:
+        timer = StartupTimerUtil()
+        with timer.stage("import realtime pipeline"):
+            from src.pipepline.realtime_metatrader_pipepline import ...
+        timer.report()
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - begin))
+
+    def report(self, title: str = "Startup time breakdown"):
+        total = time.perf_counter() - self.started
+        print(f"{title} (total {total:.2f}s):")
+        for name, seconds in self.stages:
+            print(f"  {name:<40} {seconds:7.2f}s")
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+# Số phút của mỗi khung thời gian hỗ trợ
+TIMEFRAME_MINUTES = {
+    "1m": 1,
+    "5m": 5,
+    "15m": 15,
+    "1h": 60,
+    "4h": 240,
+    "1d": 1440,
+}
+
+# Mốc tính bucket, trùng với epoch của Mongo để nến ngày bắt đầu lúc 00:00
+EPOCH = datetime(1970, 1, 1)
+
+
+def timeframe_delta(timeframe: str) -> timedelta:
+    """Độ dài một nến của khung thời gian"""
+    if timeframe not in TIMEFRAME_MINUTES:
+        raise ValueError(
+            f"Unsupported timeframe '{timeframe}', expected one of {list(TIMEFRAME_MINUTES)}"
+        )
+    return timedelta(minutes=TIMEFRAME_MINUTES[timeframe])
+
+
+def bucket_start(dt: datetime, timeframe: str) -> datetime:
+    """Thời điểm bắt đầu của bucket chứa dt"""
+    minutes = TIMEFRAME_MINUTES[timeframe]
+    offset = int((dt - EPOCH).total_seconds() // 60)
+    return EPOCH + timedelta(minutes=offset - offset % minutes)
+
+
+def mongo_bucket_expr(timeframe: str, field: str = "$datetime") -> dict:
+    """
+    Biểu thức aggregation làm tròn field datetime về đầu bucket.
+    Dùng phép trừ/mod trên mili giây để chạy được cả trên Mongo cũ (không cần $dateTrunc)
+    """
+    bucket_ms = TIMEFRAME_MINUTES[timeframe] * 60 * 1000
+    return {
+        "$subtract": [
+            field,
+            {"$mod": [{"$subtract": [field, EPOCH]}, bucket_ms]},
+        ]
+    }
+
+
+def mongo_ohlcv_group(timeframe: str) -> dict:
+    """Stage $group gom các nến phút (đã sort theo datetime) thành nến khung lớn hơn"""
+    return {
+        "$group": {
+            "_id": mongo_bucket_expr(timeframe),
+            "open": {"$first": "$open"},
+            "high": {"$max": "$high"},
+            "low": {"$min": "$low"},
+            "close": {"$last": "$close"},
+            "volume": {"$sum": "$volume"},
+        }
+    }
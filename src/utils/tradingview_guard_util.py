@@ -0,0 +1,196 @@
+# Giới hạn tốc độ và circuit breaker dùng chung cho mọi lần gọi TradingView trong process
+import heapq
+import itertools
+import threading
+import time
+from typing import Optional
+
+from config.logger_config import LoggerConfig
+from config.variable_config import TV_GUARD_CONFIG
+
+# Số nhỏ hơn = ưu tiên cao hơn
+PRIORITIES = {
+    "finalize": 0,  # Trạng thái cuối của nến vừa đóng cửa
+    "realtime": 1,  # Các nến đã hoàn thành còn thiếu
+    "forming": 2,  # Cập nhật nến phút đang hình thành
+    "backfill": 3,  # Gap fill / lấy N bars / lịch sử chạy nền
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """TradingView đang bị ngắt (circuit open) hoặc hết thời gian chờ token"""
+
+
+class TradingViewGuard:
+    """
+    Singleton trong process, mọi request tới TradingView đi qua acquire()/record_*:
+
+    - Token bucket: tối đa `rate_per_minute` request/phút, burst `burst`.
+      Caller chờ token theo thứ tự ưu tiên (PRIORITIES), cùng mức thì FIFO.
+      `reserved_tokens` token cuối chỉ dành cho finalize/realtime.
+    - Circuit breaker: `failure_threshold` lỗi liên tiếp => open trong
+      `open_seconds`, sau đó half-open cho đúng một request thử; thành công => closed,
+      thất bại => open lại với thời gian gấp đôi (tối đa `max_open_seconds`).
+    """
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TradingViewGuard, cls).__new__(cls)
+            cls._instance._init_guard()
+        return cls._instance
+
+    def _init_guard(self):
+        self.logger = LoggerConfig.logger_config("TradingView guard")
+        self.rate = TV_GUARD_CONFIG["rate_per_minute"] / 60.0
+        self.burst = float(TV_GUARD_CONFIG["burst"])
+        self.reserved_tokens = float(TV_GUARD_CONFIG["reserved_tokens"])
+        self.max_wait_seconds = TV_GUARD_CONFIG["max_wait_seconds"]
+        self.realtime_max_wait_seconds = TV_GUARD_CONFIG["realtime_max_wait_seconds"]
+        self.failure_threshold = TV_GUARD_CONFIG["failure_threshold"]
+        self.base_open_seconds = TV_GUARD_CONFIG["open_seconds"]
+        self.max_open_seconds = TV_GUARD_CONFIG["max_open_seconds"]
+
+        self._cond = threading.Condition()
+        self._tokens = self.burst
+        self._last_refill = time.monotonic()
+        self._waiters = []  # heap (priority, seq)
+        self._seq = itertools.count()
+
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._open_seconds = self.base_open_seconds
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.stats = {
+            "calls": 0,
+            "failures": 0,
+            "rejected_open": 0,
+            "rejected_timeout": 0,
+            "wait_seconds_total": 0.0,
+            "trips": 0,
+        }
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _check_circuit_locked(self):
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self._open_seconds:
+                self.stats["rejected_open"] += 1
+                raise CircuitOpenError(
+                    f"TradingView circuit open, retry in "
+                    f"{self._open_seconds - (time.monotonic() - self._opened_at):.0f}s"
+                )
+            self.state = "half_open"
+            self.logger.info("TradingView circuit half-open, allowing one probe request")
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                self.stats["rejected_open"] += 1
+                raise CircuitOpenError("TradingView circuit half-open, probe in flight")
+            self._probe_in_flight = True
+
+    def acquire(self, priority: str = "backfill", timeout: Optional[float] = None):
+        """
+        Chờ tới lượt gọi TradingView
+
+        Args:
+            priority: Mức ưu tiên (khóa trong PRIORITIES)
+            timeout: Thời gian chờ token tối đa (mặc định: realtime_max_wait_seconds
+                cho finalize/realtime/forming để không chặn vòng lặp schedule,
+                max_wait_seconds cho backfill)
+
+        Raises:
+            CircuitOpenError: Circuit đang open hoặc chờ token quá timeout
+        """
+        rank = PRIORITIES.get(priority, PRIORITIES["backfill"])
+        # Caller ưu tiên thấp không được dùng phần token dự trữ
+        needed = 1.0 + (self.reserved_tokens if rank > PRIORITIES["realtime"] else 0.0)
+        if timeout is None:
+            timeout = (
+                self.realtime_max_wait_seconds
+                if rank <= PRIORITIES["forming"]
+                else self.max_wait_seconds
+            )
+        started = time.monotonic()
+        entry = (rank, next(self._seq))
+
+        with self._cond:
+            self._check_circuit_locked()
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill_locked()
+                    if self._waiters[0] == entry and self._tokens >= needed:
+                        self._tokens -= 1.0
+                        break
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self.stats["rejected_timeout"] += 1
+                        if self.state == "half_open":
+                            self._probe_in_flight = False
+                        raise CircuitOpenError(
+                            f"Timed out after {timeout:.0f}s waiting for TradingView rate limit"
+                        )
+                    shortfall = max(needed - self._tokens, 0.0) / self.rate
+                    self._cond.wait(min(remaining, max(shortfall, 0.05)))
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+            self.stats["calls"] += 1
+            self.stats["wait_seconds_total"] += time.monotonic() - started
+
+    def record_success(self):
+        with self._cond:
+            if self.state != "closed":
+                self.logger.info("TradingView circuit closed, service recovered")
+            self.state = "closed"
+            self._probe_in_flight = False
+            self._consecutive_failures = 0
+            self._open_seconds = self.base_open_seconds
+
+    def record_failure(self, error: Optional[Exception] = None):
+        with self._cond:
+            self.stats["failures"] += 1
+            self._consecutive_failures += 1
+            if self.state == "half_open":
+                # Probe thất bại: mở lại với thời gian dài hơn
+                self._open_seconds = min(self._open_seconds * 2, self.max_open_seconds)
+                self._trip_locked(error)
+            elif (
+                self.state == "closed"
+                and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._trip_locked(error)
+
+    def _trip_locked(self, error):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self.stats["trips"] += 1
+        self.logger.warning(
+            f"TradingView circuit open for {self._open_seconds:.0f}s after "
+            f"{self._consecutive_failures} consecutive failures: {error}"
+        )
+
+    def get_status(self) -> dict:
+        with self._cond:
+            self._refill_locked()
+            status = {
+                "state": self.state,
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiters),
+                "consecutive_failures": self._consecutive_failures,
+                "open_seconds": self._open_seconds,
+                **self.stats,
+            }
+            if self.state == "open":
+                status["retry_in_seconds"] = max(
+                    0.0, self._open_seconds - (time.monotonic() - self._opened_at)
+                )
+            return status
@@ -1,6 +1,8 @@
 # Adapter để lấy dữ liệu realtime từ TradingView qua tvdatafeed
-from typing import Optional
-from tvDatafeed import TvDatafeed, Interval
+from datetime import datetime
+from typing import List, Optional
+from src.utils.candle_record import OHLCV_FIELDS, Candle
+from src.utils.tradingview_guard_util import CircuitOpenError, TradingViewGuard
 import pandas as pd
 import logging
 import time
@@ -28,12 +30,79 @@ class TVDataFeedAdapter:
         # TvDatafeed expects string credentials; pass empty string when None to satisfy type checks
         self.username = username or ""
         self.password = password or ""
+        # Import tvDatafeed khi tạo kết nối thật (replay không cần thư viện này)
+        from tvDatafeed import TvDatafeed
+
         self.tv = TvDatafeed(self.username, self.password)
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        # Rate limit + circuit breaker dùng chung cho cả process
+        self.guard = TradingViewGuard()
+
+    def now(self) -> datetime:
+        """Thời gian hiện tại theo nguồn dữ liệu (adapter replay dùng đồng hồ mô phỏng)"""
+        return datetime.now()
+
+    def _get_hist(self, symbol, exchange, interval, n_bars):
+        """Gọi thẳng tới TradingView, trả về DataFrame thô của tvDatafeed"""
+        if interval is None:
+            from tvDatafeed import Interval
+
+            interval = Interval.in_1_minute
+        return self.tv.get_hist(
+            symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars
+        )
+
+    def _guarded_get_hist(self, symbol, exchange, interval, n_bars, priority):
+        """Gọi _get_hist qua rate limiter và circuit breaker (nếu có guard)"""
+        if self.guard is None:
+            return self._get_hist(symbol, exchange, interval, n_bars)
+        self.guard.acquire(priority)
+        try:
+            df = self._get_hist(symbol, exchange, interval, n_bars)
+        except Exception as e:
+            self.guard.record_failure(e)
+            raise
+        self.guard.record_success()
+        return df
+
+    def _reconnect(self):
+        """Tạo lại kết nối TradingView sau lỗi network"""
+        from tvDatafeed import TvDatafeed
+
+        self.tv = TvDatafeed(self.username, self.password)
+
+    def get_hist(
+        self,
+        symbol,
+        exchange,
+        interval=None,
+        n_bars=5000,
+        priority="backfill",
+    ):
+        """
+        Lấy DataFrame thô (index datetime, cột symbol/open/high/low/close/volume)
+        giống tvDatafeed.get_hist, không retry - caller tự xử lý lỗi
+
+        Args:
+            symbol: Symbol name (e.g., XAUUSD)
+            exchange: Exchange name (e.g., OANDA)
+            interval: Time interval (None = Interval.in_1_minute)
+            n_bars: Number of bars to fetch
+            priority: Mức ưu tiên với rate limiter (finalize, realtime, forming, backfill)
+
+        Raises:
+            CircuitOpenError: TradingView đang bị circuit breaker ngắt
+        """
+        return self._guarded_get_hist(symbol, exchange, interval, n_bars, priority)
 
     def get_realtime_data(
-        self, symbol, exchange, interval=Interval.in_1_minute, n_bars=5000
+        self,
+        symbol,
+        exchange,
+        interval=None,
+        n_bars=5000,
+        priority="realtime",
     ):
         """
         Lấy dữ liệu realtime từ TradingView với retry logic
@@ -41,47 +110,89 @@ class TVDataFeedAdapter:
         Args:
             symbol: Symbol name (e.g., XAUUSD)
             exchange: Exchange name (e.g., OANDA)
-            interval: Time interval
+            interval: Time interval (None = Interval.in_1_minute)
             n_bars: Number of bars to fetch
+            priority: Mức ưu tiên với rate limiter (finalize, realtime, forming, backfill)
 
         Returns:
             DataFrame hoặc None nếu thất bại sau tất cả retries
         """
+        return self._fetch_with_retry(
+            symbol, exchange, interval, n_bars, priority, self._to_date_time_frame
+        )
+
+    def get_latest_candles(
+        self,
+        symbol,
+        exchange,
+        interval=None,
+        n_bars=3,
+        priority="realtime",
+    ) -> Optional[List[Candle]]:
+        """
+        Lấy vài nến mới nhất dạng Candle cho đường realtime mỗi tick: không tách
+        date/time thành chuỗi rồi parse lại như get_realtime_data
+
+        Returns:
+            List[Candle] sort theo datetime (không trùng), None nếu thất bại
+        """
+        return self._fetch_with_retry(
+            symbol, exchange, interval, n_bars, priority, self._to_candles
+        )
+
+    @staticmethod
+    def _to_date_time_frame(df):
+        # Đổi tên cột về chuẩn
+        df = df.reset_index()
+        # Columns từ tvDatafeed: ['datetime', 'symbol', 'open', 'high', 'low', 'close', 'volume']
+        df.rename(
+            columns={
+                "datetime": "date_time",
+                "volume": "vol",  # Giữ volume từ TV thành vol
+            },
+            inplace=True,
+        )
+        # Tách date và time
+        df["date"] = df["date_time"].dt.strftime("%Y.%m.%d")
+        df["time"] = df["date_time"].dt.strftime("%H:%M:%S")
+        # Chỉ giữ các trường cần thiết (bỏ tickvol và spread)
+        return df[
+            [
+                "date",
+                "time",
+                "open",
+                "high",
+                "low",
+                "close",
+                "vol",
+            ]
+        ]
+
+    @staticmethod
+    def _to_candles(df) -> List[Candle]:
+        # Index datetime + các cột OHLCV -> list Python, không qua iterrows
+        datetimes = df.index.to_pydatetime().tolist()
+        values = df[list(OHLCV_FIELDS)].to_numpy(dtype="float64").tolist()
+        candles = {}
+        for dt, row in zip(datetimes, values):
+            # Giữ bản đầu tiên nếu trùng datetime (giống drop_duplicates)
+            if dt not in candles:
+                candles[dt] = Candle(dt, *row)
+        return sorted(candles.values(), key=lambda candle: candle.datetime)
+
+    def _fetch_with_retry(self, symbol, exchange, interval, n_bars, priority, convert):
+        """Gọi TradingView với retry, convert chuyển DataFrame thô sang kết quả trả về"""
         last_exception = None
 
         for attempt in range(self.max_retries):
             try:
-                df = self.tv.get_hist(
-                    symbol=symbol, exchange=exchange, interval=interval, n_bars=n_bars
+                df = self._guarded_get_hist(
+                    symbol, exchange, interval, n_bars, priority
                 )
                 if df is None or df.empty:
                     raise ValueError("No data returned from TradingView")
 
-                # Đổi tên cột về chuẩn
-                df = df.reset_index()
-                # Columns từ tvDatafeed: ['datetime', 'symbol', 'open', 'high', 'low', 'close', 'volume']
-                df.rename(
-                    columns={
-                        "datetime": "date_time",
-                        "volume": "vol",  # Giữ volume từ TV thành vol
-                    },
-                    inplace=True,
-                )
-                # Tách date và time
-                df["date"] = df["date_time"].dt.strftime("%Y.%m.%d")
-                df["time"] = df["date_time"].dt.strftime("%H:%M:%S")
-                # Chỉ giữ các trường cần thiết (bỏ tickvol và spread)
-                df = df[
-                    [
-                        "date",
-                        "time",
-                        "open",
-                        "high",
-                        "low",
-                        "close",
-                        "vol",
-                    ]
-                ]
+                result = convert(df)
 
                 # Thành công - log nếu đã retry
                 if attempt > 0:
@@ -90,7 +201,13 @@ class TVDataFeedAdapter:
                         f"after {attempt + 1} attempt(s)"
                     )
 
-                return df
+                return result
+
+            except CircuitOpenError as e:
+                # Không retry khi circuit open - chờ breaker cho phép gọi lại
+                last_exception = e
+                logger.warning(f"Skip fetching {symbol}@{exchange}: {e}")
+                break
 
             except (TimeoutError, ConnectionError, OSError) as e:
                 # Các lỗi network có thể retry
@@ -105,7 +222,7 @@ class TVDataFeedAdapter:
                     time.sleep(wait_time)
                     # Recreate connection sau mỗi network error
                     try:
-                        self.tv = TvDatafeed(self.username, self.password)
+                        self._reconnect()
                     except Exception:
                         pass
                 else:
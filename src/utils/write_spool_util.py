@@ -0,0 +1,312 @@
+# Spool ghi trước (append-only) cho các batch ghi Mongo, chỉ xóa sau khi Mongo xác nhận
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from config.logger_config import LoggerConfig
+from config.variable_config import GOLD_DATA_CONFIG, SPOOL_CONFIG
+from src.etl.transform.candle_validate import quarantine_collection_name
+
+_JSON_OPTIONS = json_util.JSONOptions(
+    json_mode=json_util.JSONMode.RELAXED, tz_aware=False
+)
+
+# Mã lỗi ghi tạm thời (mất primary, shutdown, timeout, write concern, conflict):
+# ghi lại sau sẽ thành công nên batch được giữ trong spool. Các mã khác (VD: 121
+# document validation) là lỗi vĩnh viễn, ghi lại bao nhiêu lần cũng bị từ chối.
+TRANSIENT_WRITE_ERROR_CODES = frozenset(
+    {6, 7, 50, 64, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+)
+
+
+def is_transient_write_error(write_error: dict) -> bool:
+    return write_error.get("code") in TRANSIENT_WRITE_ERROR_CODES
+
+
+def dead_letter(collection, failures: List[Tuple[dict, dict]], source: str) -> bool:
+    """
+    Ghi các nến bị Mongo từ chối vĩnh viễn vào <collection>_quarantine (lý do
+    write_rejected, kèm mã lỗi) để batch được ack thay vì chặn spool mãi
+
+    Args:
+        collection: Collection nến đang ghi
+        failures: Danh sách (nến, write error)
+        source: Nguồn ghi, lưu cùng nến bị quarantine
+
+    Returns:
+        bool: True nếu đã ghi được vào quarantine (có thể ack batch)
+    """
+    if not failures:
+        return True
+    now = datetime.now()
+    docs = [
+        {
+            "datetime": candle.get("datetime"),
+            "symbol": GOLD_DATA_CONFIG["symbol"],
+            "source": source,
+            "reasons": ["write_rejected"],
+            "candle": {
+                field: candle.get(field)
+                for field in ("open", "high", "low", "close", "volume")
+            },
+            "error": {
+                "code": write_error.get("code"),
+                "errmsg": write_error.get("errmsg"),
+            },
+            "quarantined_at": now,
+        }
+        for candle, write_error in failures
+    ]
+    try:
+        collection.database.get_collection(
+            quarantine_collection_name(collection.name)
+        ).insert_many(docs, ordered=False)
+    except PyMongoError:
+        return False
+    return True
+
+
+def _op_candle(op: dict) -> dict:
+    """Nến mà một operation trong spool ghi (insert: doc, update: $setOnInsert + $set)"""
+    if op["op"] == "insert":
+        return op["doc"]
+    update = op["update"]
+    return {**update.get("$setOnInsert", {}), **update.get("$set", {})}
+
+
+def _to_native(value):
+    if hasattr(value, "item"):  # numpy scalar
+        return value.item()
+    return value
+
+
+class WriteSpoolUtil:
+    """
+    Mỗi batch ghi được append vào file spool (JSON lines) TRƯỚC khi gửi Mongo, fsync
+    nếu bật SPOOL_FSYNC. Khi Mongo xác nhận, một dòng ack được append (không fsync:
+    mất dòng ack chỉ làm batch được replay lại, vốn idempotent). Các batch chưa có ack là pending
+    và được replay gộp thành một bulk_write khi Mongo kết nối lại. File được
+    truncate mỗi khi không còn batch pending nên không phình theo thời gian.
+
+    Định dạng một dòng:
+        {"type": "batch", "id": "...", "ops": [{"op": "insert", "doc": {...}}, ...]}
+        {"type": "ack", "id": "..."}
+    """
+
+    def __init__(self, name: str = "realtime", root_path: Optional[str] = None):
+        self.logger = LoggerConfig.logger_config("Write spool")
+        root_path = root_path or SPOOL_CONFIG["root_path"]
+        if not os.path.isabs(root_path):
+            root_dir = os.path.dirname(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            )
+            root_path = os.path.join(root_dir, root_path)
+        directory = os.path.join(root_path, GOLD_DATA_CONFIG["collection"])
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{name}.spool")
+        self.fsync = SPOOL_CONFIG["fsync"]
+        self._lock = threading.Lock()
+        # Id các batch chưa ack, đọc lại từ file khi khởi động
+        self._pending = {batch["id"] for batch in self._read_pending()}
+        if self._pending:
+            self.logger.warning(
+                f"Found {len(self._pending)} pending spool batches in {self.path}"
+            )
+
+    def _append_line(self, record: dict, fsync: bool = True):
+        line = json_util.dumps(record, json_options=_JSON_OPTIONS, default=_to_native)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            if fsync and self.fsync:
+                os.fsync(f.fileno())
+
+    def _read_pending(self) -> List[dict]:
+        if not os.path.exists(self.path):
+            return []
+        batches = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json_util.loads(line, json_options=_JSON_OPTIONS)
+                except ValueError:
+                    # Dòng cuối có thể bị ghi dở khi process chết giữa chừng
+                    self.logger.warning("Skipping corrupted spool line")
+                    continue
+                if record.get("type") == "batch":
+                    batches[record["id"]] = record
+                elif record.get("type") == "ack":
+                    batches.pop(record["id"], None)
+        return list(batches.values())
+
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def append_inserts(self, docs: List[dict]) -> str:
+        """Ghi batch insert vào spool, trả về batch id"""
+        return self._append_batch([{"op": "insert", "doc": doc} for doc in docs])
+
+    def append_update(self, filter: dict, update: dict, upsert: bool = True) -> str:
+        """Ghi một lệnh update_one vào spool, trả về batch id"""
+        return self._append_batch(
+            [{"op": "update", "filter": filter, "update": update, "upsert": upsert}]
+        )
+
+    def _append_batch(self, ops: List[dict]) -> str:
+        batch_id = uuid.uuid4().hex
+        with self._lock:
+            self._append_line({"type": "batch", "id": batch_id, "ops": ops})
+            self._pending.add(batch_id)
+        return batch_id
+
+    def ack(self, batch_id: str):
+        """Đánh dấu batch đã được Mongo xác nhận"""
+        with self._lock:
+            if batch_id not in self._pending:
+                return
+            self._append_line({"type": "ack", "id": batch_id}, fsync=False)
+            self._pending.discard(batch_id)
+            if not self._pending:
+                self._compact_locked()
+
+    def _compact_locked(self):
+        # Không còn batch pending: xóa nội dung file để spool không phình mãi
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+
+    def replay(self, collection) -> List[dict]:
+        """
+        Replay toàn bộ batch pending theo đúng thứ tự ghi trong một bulk_write.
+        Insert được replay thành upsert $setOnInsert nên chạy lại nhiều lần vẫn an toàn
+        (không lỗi duplicate, không ghi đè bản ghi mới hơn) và có thể dùng ordered=True
+        để update của cùng một nến không bị đảo thứ tự. Upsert có điều kiện state
+        bị duplicate key (nến đã final) được bỏ qua thay vì chặn cả spool. Operation
+        bị từ chối vĩnh viễn được chuyển vào quarantine rồi bỏ qua; chỉ lỗi kết nối,
+        timeout và write concern mới giữ batch lại.
+
+        Returns:
+            list: Các operation đã replay thành công và thực sự thay đổi document
+                (insert đã có trong Mongo là no-op, không trả về để không publish lại)
+        """
+        with self._lock:
+            batches = self._read_pending()
+        if not batches:
+            return []
+
+        requests = []
+        batch_ends = []
+        for batch in batches:
+            for op in batch["ops"]:
+                if op["op"] == "insert":
+                    doc = op["doc"]
+                    requests.append(
+                        UpdateOne(
+                            {"datetime": doc["datetime"]},
+                            {"$setOnInsert": doc},
+                            upsert=True,
+                        )
+                    )
+                else:
+                    requests.append(
+                        UpdateOne(op["filter"], op["update"], upsert=op["upsert"])
+                    )
+            batch_ends.append(len(requests))
+
+        ops = [op for batch in batches for op in batch["ops"]]
+        failed_index = len(requests)
+        rejected = set()
+        changed = set()
+
+        def record_changes(details: dict, start: int, end: int):
+            # upserted: index chính xác; nModified chỉ là tổng nên nếu > 0 thì coi mọi
+            # update (không phải insert replay) đã áp dụng trong đoạn là có thay đổi
+            upserted = {start + u["index"] for u in details.get("upserted", [])}
+            changed.update(upserted)
+            if details.get("nModified", 0):
+                changed.update(
+                    i
+                    for i in range(start, end)
+                    if ops[i]["op"] == "update" and i not in upserted
+                )
+
+        offset = 0
+        while offset < len(requests):
+            try:
+                result = collection.bulk_write(requests[offset:], ordered=True)
+                record_changes(result.bulk_api_result, offset, len(requests))
+                break
+            except BulkWriteError as bwe:
+                write_errors = (bwe.details or {}).get("writeErrors", [])
+                first = min(write_errors, key=lambda we: we.get("index", 0), default={})
+                index = offset + first.get("index", 0)
+                record_changes(bwe.details or {}, offset, index)
+                if first.get("code") == 11000:
+                    # Upsert có điều kiện state bị từ chối: nến đã ở trạng thái sau
+                    # (VD: đã final), bỏ qua operation đó và replay tiếp phần còn lại
+                    rejected.add(index)
+                    offset = index + 1
+                    continue
+                if (
+                    first
+                    and not is_transient_write_error(first)
+                    and dead_letter(
+                        collection, [(_op_candle(ops[index]), first)], "spool_replay"
+                    )
+                ):
+                    # Lỗi vĩnh viễn (VD: document validation): đã chuyển vào quarantine
+                    self.logger.error(
+                        f"Spool operation {index}/{len(requests)} rejected by MongoDB, "
+                        f"moved to quarantine: {first}"
+                    )
+                    rejected.add(index)
+                    offset = index + 1
+                    continue
+                # Lỗi tạm thời hoặc chỉ có write concern error: giữ lại để replay sau
+                failed_index = index
+                self.logger.error(
+                    f"Spool replay stopped at operation {failed_index}/{len(requests)}: "
+                    f"{first or bwe}"
+                )
+                break
+            except Exception as e:
+                if offset == 0:
+                    self.logger.warning(
+                        f"Spool replay failed, {len(batches)} batches stay pending: {str(e)}"
+                    )
+                    return []
+                failed_index = offset
+                self.logger.warning(
+                    f"Spool replay stopped at operation {offset}/{len(requests)}: {str(e)}"
+                )
+                break
+
+        # Chỉ ack các batch có toàn bộ operation nằm trước lỗi đầu tiên
+        replayed = []
+        start = 0
+        for batch, end in zip(batches, batch_ends):
+            if end > failed_index:
+                break
+            self.ack(batch["id"])
+            replayed.extend(
+                op
+                for i, op in enumerate(batch["ops"], start)
+                if i not in rejected and i in changed
+            )
+            start = end
+        self.logger.info(
+            f"Replayed spooled operations, {len(replayed)} changed a document, "
+            f"{self.pending_count()} batches still pending"
+        )
+        return replayed
@@ -0,0 +1,101 @@
+"""
+Test array store chỉ là gợi ý: phút store đánh dấu "đã có" nhưng Mongo không có
+(restore / xóa collection, đổi host) vẫn được coi là thiếu và được điền lại
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from config.variable_config import ARRAY_STORE_CONFIG, RECENT_KEY_INDEX_CONFIG
+from src.etl.extract.realtime_metatrader_extract import RealtimeMetatraderExtract
+from src.utils.ohlcv_array_store import OhlcvArrayStore
+
+# Thứ Ba, trong giờ giao dịch
+START = datetime(2024, 3, 5, 10, 0)
+
+
+class _ClockAdapter:
+    """Adapter tối thiểu: extractor chỉ cần đồng hồ trong các test này"""
+
+    guard = None
+
+    def now(self):
+        return START + timedelta(minutes=30)
+
+
+def _candles(minutes):
+    return [
+        {
+            "datetime": START + timedelta(minutes=m),
+            "open": 2000.0,
+            "high": 2001.0,
+            "low": 1999.0,
+            "close": 2000.5,
+            "volume": 10.0,
+        }
+        for m in minutes
+    ]
+
+
+def _extractor(monkeypatch):
+    monkeypatch.setitem(ARRAY_STORE_CONFIG, "enabled", True)
+    monkeypatch.setitem(RECENT_KEY_INDEX_CONFIG, "enabled", False)
+    return RealtimeMetatraderExtract(tv_adapter=_ClockAdapter())
+
+
+def test_filter_existing_data_confirms_store_with_mongo(mongo_client, monkeypatch):
+    extractor = _extractor(monkeypatch)
+    # Store nghĩ phút 0..2 đã có, Mongo chỉ còn phút 0 và 2
+    extractor.array_store.write_records(_candles(range(3)))
+    extractor.gold_collection.insert_many(_candles([0, 2]))
+
+    new = extractor.filter_existing_data(pd.DataFrame(_candles(range(4))))
+
+    assert list(new["datetime"]) == [START + timedelta(minutes=m) for m in (1, 3)]
+    assert not extractor.array_store.contains(START + timedelta(minutes=1))
+    assert extractor.array_store.contains(START + timedelta(minutes=2))
+
+
+def test_gap_scan_does_not_trust_full_store(mongo_client, monkeypatch):
+    extractor = _extractor(monkeypatch)
+    end = START + timedelta(minutes=9)
+    extractor.array_store.write_records(_candles(range(10)))
+    extractor.gold_collection.insert_many(_candles([0, 1, 2, 6, 7, 8, 9]))
+    fetched = []
+    monkeypatch.setattr(
+        extractor,
+        "fetch_historical_range",
+        lambda start, stop, priority: fetched.append((start, stop)) or pd.DataFrame(),
+    )
+
+    extractor.check_and_fix_gaps(start_date=START, end_date=end)
+
+    assert fetched == [(START + timedelta(minutes=3), START + timedelta(minutes=5))]
+    assert not extractor.array_store.contains(START + timedelta(minutes=4))
+
+
+def test_reads_and_remove_while_store_grows(mongo_client, monkeypatch):
+    monkeypatch.setitem(ARRAY_STORE_CONFIG, "grow_minutes", 16)
+    store = OhlcvArrayStore("XAUUSD_GROW")
+    errors = []
+
+    def reader():
+        try:
+            for m in range(400):
+                minute = START + timedelta(minutes=m)
+                store.contains(minute)
+                store.present_mask([minute])
+                store.read_range(START, minute)
+                store.remove([minute + timedelta(minutes=1000)])
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for m in range(400):
+        store.write_record(_candles([m])[0])
+    thread.join()
+
+    assert errors == []
+    assert store.missing_minutes(START, START + timedelta(minutes=399)) == []
@@ -0,0 +1,68 @@
+"""
+Test script backfill với TradingView: ngày ngoài 5000 bar gần nhất bị bỏ qua,
+không lấy được nến nào thì exit code 1, và CLI không gửi cảnh báo Discord
+"""
+import json
+from datetime import timedelta
+
+import pytest
+
+import src.etl.extract.realtime_metatrader_extract as realtime_extract
+from scripts.backfill import main
+from src.utils.discord_alert_util import DiscordAlertUtil
+from test_candle_state import START, _HistAdapter
+
+
+@pytest.fixture
+def adapter(mongo_client, monkeypatch):
+    adapter = _HistAdapter()
+
+    class _Extract(realtime_extract.RealtimeMetatraderExtract):
+        def __init__(self):
+            super().__init__(tv_adapter=adapter)
+
+    monkeypatch.setattr(realtime_extract, "RealtimeMetatraderExtract", _Extract)
+    monkeypatch.setattr(
+        "src.utils.schema_bootstrap_util.SchemaBootstrapUtil.ensure", lambda: None
+    )
+    # Discord bật sẵn: CLI phải tự tắt
+    alerts = DiscordAlertUtil()
+    alerts.enabled, alerts.webhook_url = True, "http://discord.invalid/webhook"
+    monkeypatch.setattr(DiscordAlertUtil, "_instance", alerts)
+    posted = []
+    monkeypatch.setattr("requests.post", lambda *args, **kwargs: posted.append(args))
+    adapter.posted = posted
+    return adapter
+
+
+def _run(capsys, start, end):
+    code = main(
+        ["--source", "tradingview", "--start", start.isoformat(), "--end", end.isoformat()]
+    )
+    return code, json.loads(capsys.readouterr().out)
+
+
+def test_unreachable_range_exits_with_error(adapter, capsys):
+    code, summary = _run(capsys, START - timedelta(days=10), START - timedelta(days=6))
+
+    assert code == 1
+    assert summary["rows"] == 0
+    assert summary["unreachable_minutes"] == 4 * 24 * 60
+    assert adapter.calls == [] and adapter.posted == []
+
+
+def test_recent_window_is_fetched_from_the_latest_bars(adapter, capsys):
+    code, summary = _run(capsys, START, START + timedelta(minutes=30))
+
+    assert code == 0
+    assert summary["inserted"] == 30 and summary["unreachable_minutes"] == 0
+    # Lấy đủ số bar từ đầu khoảng tới hiện tại, với ưu tiên backfill
+    assert adapter.calls == [(31, "backfill")]
+
+
+def test_empty_reachable_window_fails_without_alert(adapter, capsys):
+    code, summary = _run(capsys, START - timedelta(hours=3), START - timedelta(hours=1))
+
+    assert code == 1
+    assert summary["rows"] == 0 and summary["empty_fetches"] == 1
+    assert adapter.posted == []
@@ -0,0 +1,60 @@
+"""
+Test codec archive tháng: encode/decode giữ nguyên nến, cột mất độ chính xác
+khi scale thì lưu float
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.utils.candle_archive_codec import decode_month, decode_rows, encode_month
+
+START = datetime(2024, 1, 31, 23, 50)
+
+
+def _month(minutes, close=lambda m: 2000.0 + m * 0.125):
+    return pd.DataFrame(
+        [
+            {
+                "datetime": START + timedelta(minutes=m),
+                "open": 2000.0 + m * 0.25,
+                "high": 2010.5,
+                "low": 1990.001,
+                "close": close(m),
+                "volume": float(100 + m),
+            }
+            for m in minutes
+        ]
+    )
+
+
+def test_round_trip_with_gaps():
+    # Có khoảng trống giữa các phút và qua ngày mới
+    df = _month([0, 1, 2, 5, 9, 10, 30])
+    doc = encode_month(df)
+
+    assert doc["count"] == 7
+    assert doc["days"] == {"2024-01-31": 5, "2024-02-01": 2}
+    assert all(doc["columns"][f]["encoding"] == "delta" for f in ("open", "close", "volume"))
+    decoded = decode_month(doc)
+    pd.testing.assert_frame_equal(decoded, df, check_dtype=False)
+
+
+def test_lossy_scale_falls_back_to_float():
+    # close có 4 chữ số thập phân, price_scale=1000 chỉ giữ được 3
+    df = _month(range(5), close=lambda m: 2000.1234 + m)
+    doc = encode_month(df, price_scale=1000)
+
+    assert doc["columns"]["close"]["encoding"] == "raw"
+    assert doc["columns"]["open"]["encoding"] == "delta"
+    decoded = decode_month(doc)
+    np.testing.assert_array_equal(decoded["close"].to_numpy(), df["close"].to_numpy())
+    np.testing.assert_array_equal(decoded["low"].to_numpy(), df["low"].to_numpy())
+
+
+def test_decode_rows_filters_range():
+    doc = encode_month(_month(range(20)))
+    rows = decode_rows(doc, START + timedelta(minutes=5), START + timedelta(minutes=7))
+
+    assert [r["datetime"] for r in rows] == [START + timedelta(minutes=m) for m in (5, 6, 7)]
+    assert rows[0]["close"] == 2000.0 + 5 * 0.125
@@ -0,0 +1,91 @@
+"""
+Test đường realtime mỗi tick không dùng DataFrame: chuyển dữ liệu tvDatafeed sang
+Candle, kiểm tra một nến bằng phép so sánh scalar cho cùng kết quả với check
+trên DataFrame, chọn nến hiện tại / phút trước từ vài bar cuối
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.extract.realtime_metatrader_extract import (
+    TICK_BARS,
+    RealtimeMetatraderExtract,
+)
+from src.etl.transform.candle_validate import CandleValidateTransform
+from src.utils.candle_record import Candle
+from src.utils.tvdatafeed_adapter import TVDataFeedAdapter
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _candle(
+    minute, open=2000.0, high=2001.0, low=1999.0, close=2000.5, volume=10.0
+):
+    return Candle(START + timedelta(minutes=minute), open, high, low, close, volume)
+
+
+class _LatestAdapter:
+    guard = None
+
+    def __init__(self):
+        self.calls = []
+
+    def now(self):
+        return START + timedelta(minutes=2, seconds=15)
+
+    def get_latest_candles(
+        self, symbol, exchange, interval=None, n_bars=3, priority="realtime"
+    ):
+        self.calls.append((n_bars, priority))
+        return [_candle(0), _candle(1, close=2000.7), _candle(2, close=2000.9)]
+
+
+def test_tvdatafeed_frame_to_sorted_unique_candles():
+    index = pd.DatetimeIndex(
+        [START + timedelta(minutes=m) for m in (1, 0, 1)], name="datetime"
+    )
+    df = pd.DataFrame(
+        {
+            "symbol": "OANDA:XAUUSD",
+            "open": [2000, 2001, 2002],
+            "high": 2005.0,
+            "low": 1995.0,
+            "close": [2000.5, 2001.5, 2002.5],
+            "volume": [10, 11, 12],
+        },
+        index=index,
+    )
+
+    candles = TVDataFeedAdapter._to_candles(df)
+
+    assert candles == [
+        Candle(START, 2001.0, 2005.0, 1995.0, 2001.5, 11.0),
+        Candle(START + timedelta(minutes=1), 2000.0, 2005.0, 1995.0, 2000.5, 10.0),
+    ]
+    assert isinstance(candles[0].volume, float)
+
+
+def test_check_candle_matches_frame_check(mongo_client):
+    validator = CandleValidateTransform()
+    candles = [
+        _candle(0),
+        _candle(1, high=1998.0),
+        _candle(2, close=2003.0),
+        _candle(3, open=-1.0),
+        _candle(4, volume=-5.0),
+        _candle(5, close=float("nan")),
+    ]
+
+    frame_mask = validator.check(pd.DataFrame([c.to_doc() for c in candles]))
+
+    assert [validator.check_candle(c) for c in candles] == list(frame_mask)
+    assert frame_mask[0] == 0 and all(frame_mask[1:])
+
+
+def test_current_and_previous_candle_from_last_bars(mongo_client):
+    adapter = _LatestAdapter()
+    extractor = RealtimeMetatraderExtract(tv_adapter=adapter)
+
+    assert extractor.get_current_candle() == _candle(2, close=2000.9)
+    assert extractor.get_previous_final_candle() == _candle(1, close=2000.7)
+    assert adapter.calls == [(TICK_BARS, "forming"), (TICK_BARS, "finalize")]
@@ -0,0 +1,59 @@
+"""
+Test publisher: subscriber kết nối lại bằng resume token nhận đúng các event bị lỡ,
+token cũ / khác epoch nhận "reset", subscriber chậm bị ngắt thay vì chặn loader
+"""
+from datetime import datetime
+
+import pytest
+
+from config.variable_config import PUBLISHER_CONFIG
+from src.utils.candle_publisher import CandlePublisher
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    monkeypatch.setitem(PUBLISHER_CONFIG, "buffer_size", 3)
+    monkeypatch.setitem(PUBLISHER_CONFIG, "subscriber_queue_size", 2)
+    monkeypatch.setattr(CandlePublisher, "_instance", None)
+    return CandlePublisher()
+
+
+def _drain(subscriber):
+    messages = []
+    while not subscriber.empty():
+        messages.append(subscriber.get_nowait())
+    return messages
+
+
+def test_resume_token_replays_missed_events(publisher):
+    publisher.publish("insert", {"_id": 1, "datetime": START, "close": 2000.0})
+    token = publisher._buffer[-1]["resume_token"]
+    publisher.publish("update", {"datetime": START, "close": 2000.5})
+
+    messages = _drain(publisher._subscribe(token))
+
+    assert [(m["type"], m["seq"]) for m in messages] == [("update", 2)]
+    assert "_id" not in publisher._buffer[0]["candle"]
+
+
+@pytest.mark.parametrize("token", ["0:1", "{epoch}:0"])
+def test_stale_or_foreign_token_gets_reset(publisher, token):
+    for close in range(5):
+        publisher.publish("insert", {"datetime": START, "close": float(close)})
+
+    messages = _drain(publisher._subscribe(token.format(epoch=publisher.epoch)))
+
+    assert [m["type"] for m in messages] == ["reset"]
+    assert messages[0]["seq"] == 5
+
+
+def test_slow_subscriber_is_disconnected(publisher):
+    subscriber = publisher._subscribe()
+    for close in range(3):
+        publisher.publish("insert", {"datetime": START, "close": float(close)})
+
+    assert publisher.get_status()["subscribers"] == 0
+    # Tín hiệu ngắt (None) nằm cuối hàng đợi để handler đóng kết nối
+    assert _drain(subscriber)[-1] is None
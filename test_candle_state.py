@@ -0,0 +1,95 @@
+"""
+Test vòng đời nến: nến forming bị bỏ lại sau khi khởi động lại được lấy lại từ
+nguồn qua đường finalize rồi chuyển sang final, không nằm ở forming mãi
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.pipepline.realtime_metatrader_pipepline import RealtimeMetatraderPipepline
+from src.utils.candle_state_util import FINAL, FORMING
+
+# Thứ Ba, trong giờ giao dịch
+START = datetime(2024, 3, 5, 10, 0)
+
+
+class _HistAdapter:
+    """Adapter trả về các nến đóng cửa của 30 phút gần nhất (hoặc không có gì)"""
+
+    guard = None
+
+    def __init__(self, available=True):
+        self.available = available
+        self.calls = []
+
+    def now(self):
+        return START + timedelta(minutes=30, seconds=15)
+
+    def get_hist(self, symbol, exchange, interval=None, n_bars=5000, priority="backfill"):
+        self.calls.append((n_bars, priority))
+        if not self.available:
+            return None
+        index = pd.DatetimeIndex(
+            [START + timedelta(minutes=m) for m in range(30)], name="datetime"
+        )
+        return pd.DataFrame(
+            {
+                "symbol": "OANDA:XAUUSD",
+                "open": 2000.0,
+                "high": 2001.0,
+                "low": 1999.0,
+                "close": 2000.5,
+                "volume": 10.0,
+            },
+            index=index,
+        )
+
+
+def _stale_forming(pipepline, minutes):
+    pipepline.loader.gold_collection.insert_many(
+        [
+            {
+                "datetime": START + timedelta(minutes=m),
+                "open": 2000.0,
+                "high": 2000.2,
+                "low": 1999.9,
+                "close": 1999.95,
+                "volume": 3.0,
+                "state": FORMING,
+            }
+            for m in minutes
+        ]
+    )
+
+
+def test_stale_forming_candle_is_refetched_after_restart(mongo_client):
+    pipepline = RealtimeMetatraderPipepline(tv_adapter=_HistAdapter())
+    _stale_forming(pipepline, [2, 3])
+    # Phút hiện tại vẫn đang hình thành: không bị đụng tới
+    _stale_forming(pipepline, [30])
+
+    assert pipepline.loader.stale_forming_candles() == [
+        START + timedelta(minutes=m) for m in (2, 3)
+    ]
+    pipepline.refetch_stale_forming()
+    pipepline.loader.promote_settled_candles()
+
+    docs = {
+        d["datetime"]: d for d in pipepline.loader.gold_collection.find({}, {"_id": 0})
+    }
+    for m in (2, 3):
+        doc = docs[START + timedelta(minutes=m)]
+        assert doc["state"] == FINAL and doc["close"] == 2000.5 and doc["high"] == 2001.0
+    assert docs[START + timedelta(minutes=30)]["state"] == FORMING
+    assert pipepline.loader.stale_forming_candles() == []
+
+
+def test_stale_forming_candle_promoted_when_source_has_nothing(mongo_client):
+    pipepline = RealtimeMetatraderPipepline(tv_adapter=_HistAdapter(available=False))
+    _stale_forming(pipepline, [2])
+
+    pipepline.refetch_stale_forming()
+    assert pipepline.loader.promote_settled_candles() == 1
+
+    doc = pipepline.loader.gold_collection.find_one({}, {"_id": 0})
+    assert doc["state"] == FINAL and doc["close"] == 1999.95
@@ -0,0 +1,87 @@
+"""
+Test spike trên đường realtime: nến đơn lẻ được nhận tạm rồi kiểm tra lại khi
+nến kế tiếp tới; spike phát hiện muộn vào quarantine và bị xóa khỏi Mongo
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.etl.transform.candle_validate import (
+    CandleValidateTransform,
+    quarantine_collection_name,
+)
+from src.utils.candle_record import Candle
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _candle(minute, close):
+    return Candle(START + timedelta(minutes=minute), close, close + 0.5, close - 0.5, close, 10.0)
+
+
+def _closes(validator, loader, closes):
+    """Đưa từng nến finalize qua validate_candle + upsert như pipeline realtime"""
+    for minute, close in enumerate(closes):
+        candle = validator.validate_candle(_candle(minute, close), source="finalize")
+        if candle is not None:
+            loader.upsert_candles([candle], finalize=True)
+        loader.remove_candles(validator.pop_late_spikes())
+
+
+def test_single_candle_spike_is_retracted_when_next_bar_reverts(mongo_client):
+    validator = CandleValidateTransform()
+    loader = RealtimeMetatraderLoad()
+
+    _closes(validator, loader, [2000.0, 2000.2, 1999.9, 2000.1, 2100.0, 2000.3])
+
+    stored = sorted(d["datetime"] for d in loader.gold_collection.find())
+    spike = START + timedelta(minutes=4)
+    assert spike not in stored and len(stored) == 5
+    quarantined = list(loader.gold_db[quarantine_collection_name()].find())
+    assert [(q["datetime"], q["reasons"]) for q in quarantined] == [(spike, ["price_spike"])]
+    assert validator.get_stats()["reasons"]["price_spike"] == 1
+
+    # Nguồn trả lại đúng nến spike (gap fill): vẫn bị loại
+    assert validator.validate_candle(_candle(4, 2100.0), source="gap_fill") is None
+    refetched = validator.validate(
+        pd.DataFrame([_candle(4, 2100.0).to_doc()]), source="gap_fill"
+    )
+    assert refetched.empty
+
+
+def test_level_shift_is_kept(mongo_client):
+    validator = CandleValidateTransform()
+    loader = RealtimeMetatraderLoad()
+
+    # Giá nhảy rồi giữ mức mới (tin tức) không phải spike
+    _closes(validator, loader, [2000.0, 2000.2, 1999.9, 2000.1, 2100.0, 2100.3, 2099.8])
+
+    assert loader.gold_collection.count_documents({}) == 7
+    assert validator.pop_late_spikes() == []
+
+
+def test_batch_spike_in_next_batch(mongo_client):
+    validator = CandleValidateTransform()
+    frame = lambda candles: pd.DataFrame([c.to_doc() for c in candles])
+
+    closes = [2000.0, 2000.2, 1999.9, 2000.1, 2000.0, 2000.3, 2100.0]
+    first = validator.validate(frame([_candle(m, c) for m, c in enumerate(closes)]))
+    # Nến cuối batch chưa có nến kế tiếp: được nhận tạm
+    assert len(first) == 7
+    second = validator.validate(frame([_candle(7, 2000.1), _candle(8, 2000.0)]))
+
+    assert len(second) == 2
+    assert validator.pop_late_spikes() == [START + timedelta(minutes=6)]
+
+
+def test_duplicate_datetime_keeps_first_like_extract(mongo_client):
+    validator = CandleValidateTransform()
+    df = pd.DataFrame(
+        [_candle(m, close).to_doc() for m, close in [(0, 2000.0), (0, 2000.4), (1, 2000.1)]]
+    )
+
+    valid = validator.validate(df, source="gap_fill")
+
+    assert list(valid["close"]) == [2000.0, 2000.1]
+    assert list(valid["close"]) == list(df.drop_duplicates(subset=["datetime"])["close"])
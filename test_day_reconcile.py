@@ -0,0 +1,75 @@
+"""
+Test đối chiếu từng ngày: fingerprint sha1 phát hiện thay đổi mà tổng theo vị trí
+bỏ sót, và ngày có nến nguồn bị quarantine không bị coi là lệch mãi mãi
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.pipepline.day_reconcile_pipepline import DayReconcilePipepline
+from src.utils.day_fingerprint_util import frame_day_fingerprints, fingerprints_match
+
+DAY = datetime(2024, 3, 5)
+NOW = datetime(2024, 3, 6, 12, 0)
+
+
+def _frame(closes, start=DAY):
+    return pd.DataFrame(
+        {
+            "datetime": [start + timedelta(minutes=m) for m in range(len(closes))],
+            "open": 2000.0,
+            "high": 2001.0,
+            "low": 1999.0,
+            "close": closes,
+            "volume": 10.0,
+        }
+    )
+
+
+class _Extractor:
+    def __init__(self, df):
+        self.df = df
+
+    def current_time(self):
+        return NOW
+
+    def fetch_latest_n_bars(self, n_bars, priority="backfill"):
+        # Nến cũ nhất thuộc ngày trước: ngày DAY là ngày trọn vẹn
+        oldest = pd.Timestamp(DAY - timedelta(minutes=1))
+        return self.df, oldest
+
+
+def test_sha1_detects_changes_that_cancel_in_weighted_sum():
+    base = [2000.0, 2000.0, 2000.0]
+    # +2 tick ở phút 0 và -1 tick ở phút 1: tổng theo vị trí (1·Δ0 + 2·Δ1) bằng 0
+    changed = [2000.002, 1999.999, 2000.0]
+
+    stored = frame_day_fingerprints(_frame(base))["2024-03-05"]
+    source = frame_day_fingerprints(_frame(changed))["2024-03-05"]
+
+    assert stored["count"] == source["count"]
+    assert not fingerprints_match(stored, source)
+    assert fingerprints_match(stored, frame_day_fingerprints(_frame(base))["2024-03-05"])
+
+
+def test_day_with_rejected_source_candle_matches_after_rewrite(mongo_client):
+    closes = [2000.0 + m * 0.1 for m in range(10)]
+    source = _frame(closes)
+    # Nến nguồn lỗi (high < low): bị quarantine, bản trong Mongo được giữ lại
+    source.loc[4, ["high", "low"]] = [1990.0, 2010.0]
+    loader = RealtimeMetatraderLoad(clock=lambda: NOW)
+    pipepline = DayReconcilePipepline(
+        source="tradingview", extractor=_Extractor(source), loader=loader
+    )
+    stored = _frame(closes)
+    stored.loc[7, "close"] = 1500.0
+    loader.gold_collection.insert_many(stored.to_dict("records"))
+
+    first = pipepline.run()
+    assert first["mismatched"] == ["2024-03-05"] and first["updated"] == 1
+
+    second = pipepline.run()
+    assert second["matched"] == 1 and second["mismatched"] == []
+    kept = loader.gold_collection.find_one({"datetime": DAY + timedelta(minutes=4)})
+    assert kept["high"] == 2001.0
@@ -0,0 +1,49 @@
+"""
+Test theo dõi độ trễ nến đóng cửa -> finalize: mỗi nguồn ghi có cửa sổ riêng và
+loader ghi nhận độ trễ cùng metadata ingest của từng nến
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.utils.freshness_tracker_util import FreshnessTrackerUtil
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def test_percentiles_are_tracked_per_source():
+    tracker = FreshnessTrackerUtil(window_size=3)
+    # Nến 10:00 đóng cửa lúc 10:01
+    for seconds in (1, 2, 3, 40):
+        tracker.record(START, START + timedelta(minutes=1, seconds=seconds), "realtime")
+    tracker.record(START, START + timedelta(hours=2), "gap_fill")
+
+    stats = tracker.get_percentiles()
+
+    assert stats["realtime"]["count"] == 3
+    assert stats["realtime"]["p50"] == 3.0 and stats["realtime"]["max"] == 40.0
+    assert stats["gap_fill"]["max"] == 7140.0
+
+
+def test_realtime_load_records_latency_and_ingest_metadata(mongo_client):
+    now = START + timedelta(minutes=1, seconds=5)
+    loader = RealtimeMetatraderLoad(clock=lambda: now)
+    df = pd.DataFrame(
+        [
+            {
+                "datetime": START,
+                "open": 2000.0,
+                "high": 2001.0,
+                "low": 1999.0,
+                "close": 2000.5,
+                "volume": 10.0,
+            }
+        ]
+    )
+
+    loader.realtime_load(df, source="realtime")
+
+    doc = loader.gold_collection.find_one({}, {"_id": 0})
+    assert doc["first_seen_at"] == doc["finalized_at"] == now
+    assert loader.freshness.get_percentiles()["realtime"]["p90"] == 5.0
@@ -0,0 +1,131 @@
+"""
+Test chia file Metatrader theo ngày cho backfill song song và gộp manifest của các shard
+"""
+import io
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from config.variable_config import GOLD_DATA_CONFIG
+from src.etl.extract.historical_metatrader_extract import HistoricalMetatraderExtract
+from src.pipepline.historical_backfill_pipepline import _backfill_shard, split_by_day
+from src.utils.historical_coverage_util import HistoricalCoverageUtil
+
+HEADER = "<DATE>\t<TIME>\t<OPEN>\t<HIGH>\t<LOW>\t<CLOSE>\t<TICKVOL>\t<VOL>\t<SPREAD>\n"
+# Số nến mỗi ngày khác nhau để điểm cắt theo byte rơi vào giữa ngày
+DAY_ROWS = {
+    datetime(2024, 3, 4): 50,
+    datetime(2024, 3, 5): 7,
+    datetime(2024, 3, 6): 120,
+    datetime(2024, 3, 7): 1,
+    datetime(2024, 3, 8): 33,
+}
+
+
+def _write_file(tmp_path):
+    lines = [HEADER]
+    for day, rows in DAY_ROWS.items():
+        for m in range(rows):
+            t = day + timedelta(hours=1, minutes=m)
+            price = 2000.0 + m * 0.01
+            lines.append(
+                f"{t:%Y.%m.%d}\t{t:%H:%M:%S}\t{price:.2f}\t{price + 1:.2f}\t"
+                f"{price - 1:.2f}\t{price:.2f}\t{10 + m}\t0\t5\n"
+            )
+    path = tmp_path / "XAUUSD_M1.csv"
+    path.write_text("".join(lines))
+    return str(path)
+
+
+def _read_shards(path, ranges):
+    frames = []
+    with open(path, "rb") as f:
+        for offset, end_offset in ranges:
+            f.seek(offset)
+            data = f.read(end_offset - offset)
+            frames.append(
+                HistoricalMetatraderExtract.read_frame(io.BytesIO(data), header=False)
+            )
+    return frames
+
+
+def _days(frame):
+    return set(frame["datetime"].dt.normalize())
+
+
+def test_split_by_day_never_splits_a_day(tmp_path):
+    path = _write_file(tmp_path)
+    for shards in (1, 2, 3, 4, 8):
+        ranges = split_by_day(path, shards)
+        frames = _read_shards(path, ranges)
+
+        assert 1 <= len(ranges) <= shards
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        assert sum(len(f) for f in frames) == sum(DAY_ROWS.values())
+        seen = set()
+        for frame in frames:
+            assert not (_days(frame) & seen)
+            seen |= _days(frame)
+        assert seen == set(DAY_ROWS)
+
+
+def test_split_by_day_trims_start_and_end(tmp_path):
+    path = _write_file(tmp_path)
+
+    # start giữa ngày 05: lấy từ đầu ngày 05 (worker lọc theo phút); end không bao gồm
+    ranges = split_by_day(
+        path, 3, start=datetime(2024, 3, 5, 1, 3), end=datetime(2024, 3, 8)
+    )
+    frames = _read_shards(path, ranges)
+
+    assert set().union(*map(_days, frames)) == {
+        datetime(2024, 3, 5),
+        datetime(2024, 3, 6),
+        datetime(2024, 3, 7),
+    }
+    assert sum(len(f) for f in frames) == 7 + 120 + 1
+    assert split_by_day(path, 2, start=datetime(2024, 3, 9)) == []
+    assert split_by_day(path, 2, end=datetime(2024, 3, 4)) == []
+
+
+def test_merge_manifests_matches_whole_file(tmp_path):
+    path = _write_file(tmp_path)
+    frames = _read_shards(path, split_by_day(path, 3))
+    whole = pd.concat(frames)
+
+    parts = [HistoricalCoverageUtil.build_manifest(f, "source") for f in frames]
+    merged = HistoricalCoverageUtil.merge_manifests([None, *parts])
+
+    assert merged == HistoricalCoverageUtil.build_manifest(whole, "source")
+    assert merged["days"]["2024-03-06"] == 120
+    assert HistoricalCoverageUtil.merge_manifests([None]) is None
+
+
+def test_shards_load_every_row_once(tmp_path, mongo_client):
+    path = _write_file(tmp_path)
+    start = datetime(2024, 3, 5, 1, 3)
+    tasks = [
+        {
+            "shard": i,
+            "path": path,
+            "offset": offset,
+            "end_offset": end_offset,
+            "start": start,
+            "end": None,
+            "boundary": None,
+            "source": "source",
+            "chunk_size": 25,
+            "dry_run": False,
+        }
+        for i, (offset, end_offset) in enumerate(split_by_day(path, 3, start=start))
+    ]
+
+    results = [_backfill_shard(task) for task in tasks]
+
+    expected = sum(DAY_ROWS.values()) - 50 - 3
+    assert sum(r["inserted"] for r in results) == expected
+    stored = mongo_client[GOLD_DATA_CONFIG["database"]][GOLD_DATA_CONFIG["collection"]]
+    assert len(stored.distinct("datetime")) == stored.count_documents({}) == expected
+    manifest = HistoricalCoverageUtil.merge_manifests([r["manifest"] for r in results])
+    assert manifest["rows"] == expected
+    assert manifest["start"] == start.isoformat()
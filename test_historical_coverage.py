@@ -0,0 +1,55 @@
+"""
+Test coverage manifest: chỉ bỏ qua import khi Mongo đủ dữ liệu và file nguồn trên
+Drive chưa đổi (hoặc manifest còn mới khi không biết phiên bản file)
+"""
+import json
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.utils.historical_coverage_util import HistoricalCoverageUtil
+
+START = datetime(2024, 3, 4, 0, 0)
+VERSION = {"etag": '"v1"', "size": "1000"}
+
+
+def _stored(mongo_client, minutes=30):
+    collection = mongo_client["test"]["gold_minute_data"]
+    rows = [{"datetime": START + timedelta(minutes=m), "close": 2000.0} for m in range(minutes)]
+    collection.insert_many(rows)
+    return collection, pd.DataFrame(rows)
+
+
+def _coverage(monkeypatch, current):
+    coverage = HistoricalCoverageUtil()
+    monkeypatch.setattr(coverage, "remote_version", lambda: current)
+    return coverage
+
+
+def test_skip_only_while_remote_file_unchanged(mongo_client, monkeypatch):
+    collection, df = _stored(mongo_client)
+    coverage = _coverage(monkeypatch, VERSION)
+    coverage.save_manifest(coverage.build_manifest(df, coverage.source), remote=VERSION)
+
+    complete, _ = coverage.check(collection)
+    assert complete
+
+    # File trên Drive được thêm dòng: size / ETag đổi
+    monkeypatch.setattr(coverage, "remote_version", lambda: {"etag": '"v2"', "size": "1200"})
+    complete, reason = coverage.check(collection)
+    assert not complete and "changed" in reason
+
+
+def test_manifest_expires_when_version_unknown(mongo_client, monkeypatch):
+    collection, df = _stored(mongo_client)
+    coverage = _coverage(monkeypatch, None)
+    coverage.save_manifest(coverage.build_manifest(df, coverage.source), remote=VERSION)
+
+    complete, _ = coverage.check(collection)
+    assert complete
+
+    with open(coverage.manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["saved_at"] = (datetime.now() - timedelta(days=2)).isoformat()
+    complete, reason = coverage.check(collection, manifest=manifest)
+    assert not complete and "old" in reason
@@ -0,0 +1,66 @@
+"""
+Test ranh giới realtime / import lịch sử chạy song song: watermark chỉ lùi về quá
+khứ, chờ batch lịch sử đang ghi, và import lịch sử không ghi phút của realtime
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.load.historical_metatrader_load import HistoricalMetatraderLoad
+from src.utils.ingest_watermark_util import IngestWatermarkUtil
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _frame(minutes):
+    return pd.DataFrame(
+        {
+            "datetime": [START + timedelta(minutes=m) for m in minutes],
+            "open": 2000.0,
+            "high": 2001.0,
+            "low": 1999.0,
+            "close": 2000.5,
+            "volume": 10.0,
+        }
+    )
+
+
+def test_claim_only_moves_back(mongo_client):
+    watermark = IngestWatermarkUtil()
+    watermark.claim(START + timedelta(minutes=5, seconds=30))
+    watermark.claim(START + timedelta(minutes=8))
+    assert watermark.value == START + timedelta(minutes=5)
+
+    watermark.claim(START + timedelta(minutes=2))
+    assert watermark.value == START + timedelta(minutes=2)
+
+
+def test_claim_waits_for_batch_being_written(mongo_client):
+    watermark = IngestWatermarkUtil()
+    watermark.claim(START + timedelta(minutes=5))
+    claimed = threading.Event()
+
+    with watermark.hold() as limit:
+        thread = threading.Thread(
+            target=lambda: (watermark.claim(START), claimed.set())
+        )
+        thread.start()
+        time.sleep(0.05)
+        # Batch đang ghi vẫn thấy giới hạn cũ
+        assert not claimed.is_set() and limit == START + timedelta(minutes=5)
+    thread.join()
+    assert watermark.value == START
+
+
+def test_historical_load_skips_minutes_owned_by_realtime(mongo_client):
+    watermark = IngestWatermarkUtil()
+    watermark.claim(START + timedelta(minutes=3))
+    loader = HistoricalMetatraderLoad()
+
+    summary = loader.historical_load(_frame(range(6)), watermark=watermark)
+
+    assert summary["inserted"] == 3
+    stored = sorted(d["datetime"] for d in loader.final_collection.find())
+    assert stored == [START + timedelta(minutes=m) for m in range(3)]
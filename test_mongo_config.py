@@ -0,0 +1,56 @@
+"""
+Test cấu hình MongoClient theo workload: MONGO_WORKLOAD_CONFIG ghi đè MONGO_CONFIG,
+chỉ bật thuật toán nén đã cài, workload cùng tùy chọn dùng chung một client
+"""
+import config.mongo_config as mongo_config
+from config.mongo_config import MongoConfig, available_compressors
+from config.variable_config import MONGO_WORKLOAD_CONFIG
+
+
+class _FakeClient:
+    def __init__(self, **options):
+        self.options = options
+
+
+def _config(monkeypatch):
+    monkeypatch.setattr(MongoConfig, "_instance", None)
+    monkeypatch.setattr(mongo_config, "MongoClient", _FakeClient)
+    return MongoConfig()
+
+
+def test_available_compressors_keeps_installed_in_order():
+    assert available_compressors("lz4, zlib,unknown") == "zlib"
+    assert available_compressors("") == ""
+
+
+def test_workload_overrides_default_options(monkeypatch):
+    monkeypatch.setitem(
+        MONGO_WORKLOAD_CONFIG,
+        "bulk",
+        {**MONGO_WORKLOAD_CONFIG["bulk"], "compressors": "zstd,zlib"},
+    )
+    config = _config(monkeypatch)
+
+    default = config.get_options()
+    realtime = config.get_options("realtime")
+    bulk = config.get_options("bulk")
+
+    assert "socketTimeoutMS" not in default and "compressors" not in default
+    assert realtime["maxPoolSize"] == MONGO_WORKLOAD_CONFIG["realtime"]["max_pool_size"]
+    assert (
+        realtime["socketTimeoutMS"]
+        == MONGO_WORKLOAD_CONFIG["realtime"]["socket_timeout_ms"]
+    )
+    assert bulk["compressors"].endswith("zlib")
+    assert config.get_options("query")["readPreference"] == "primaryPreferred"
+
+
+def test_workloads_with_same_options_share_client(monkeypatch):
+    config = _config(monkeypatch)
+    monkeypatch.setitem(MONGO_WORKLOAD_CONFIG, "same", {})
+
+    client = config.get_client()
+
+    assert config.get_client("same") is client
+    assert config.get_client("realtime") is not client
+    assert config.get_client("realtime") is config.get_client("realtime")
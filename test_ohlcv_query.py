@@ -0,0 +1,93 @@
+"""
+Test OhlcvQuery: phân trang, resample trong Mongo, cache trang final_only và gộp
+hai tier (archive + collection chính)
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.query.ohlcv_query import OhlcvQuery
+from src.utils.candle_archive_codec import encode_month
+from src.utils.candle_state_util import FINAL, PROVISIONAL
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _candle(minute, state=FINAL, close=2000.5):
+    return {
+        "datetime": START + timedelta(minutes=minute),
+        "open": 2000.0,
+        "high": 2001.0,
+        "low": 1999.0,
+        "close": close,
+        "volume": 10.0,
+        "state": state,
+    }
+
+
+def test_final_only_page_not_cached_while_candles_unconfirmed(mongo_client):
+    query = OhlcvQuery()
+    collection = query._collection("XAUUSD")
+    collection.insert_many([_candle(0), _candle(1, state=PROVISIONAL), _candle(2)])
+    end = START + timedelta(minutes=2)
+
+    rows, _ = query.get_page("XAUUSD", START, end, final_only=True)
+    assert len(rows) == 2
+    assert query.get_cache_stats()["entries"] == 0
+
+    # promote_settled_candles chạy muộn: trang phải thấy nến vừa được xác nhận
+    collection.update_one({"state": PROVISIONAL}, {"$set": {"state": FINAL}})
+    rows, _ = query.get_page("XAUUSD", START, end, final_only=True)
+    assert len(rows) == 3
+    assert query.get_cache_stats()["entries"] == 1
+
+
+def test_minute_rows_merges_archive_and_live_tiers(mongo_client):
+    query = OhlcvQuery()
+    archive = query.archives["XAUUSD"].archive_collection
+    archived = pd.DataFrame([_candle(m, close=1000.0) for m in range(5)])
+    archive.insert_one(
+        {"_id": "2024-03", "month": datetime(2024, 3, 1), **encode_month(archived)}
+    )
+    # Nến đến muộn / được sửa sau khi archive: collection chính ưu tiên
+    query._collection("XAUUSD").insert_many([_candle(m) for m in range(3, 7)])
+    end = START + timedelta(minutes=6)
+
+    rows = query._minute_rows("XAUUSD", START, end)
+
+    assert [r["datetime"] for r in rows] == [START + timedelta(minutes=m) for m in range(7)]
+    assert [r["close"] for r in rows] == [1000.0] * 3 + [2000.5] * 4
+    limited = query._minute_rows("XAUUSD", START + timedelta(minutes=2), end, limit=3)
+    assert [r["close"] for r in limited] == [1000.0, 2000.5, 2000.5]
+
+
+def test_minute_pages_follow_cursor(mongo_client):
+    query = OhlcvQuery()
+    query._collection("XAUUSD").insert_many([_candle(m) for m in range(7)])
+
+    pages = list(
+        query.iter_pages("XAUUSD", START, START + timedelta(minutes=6), page_size=3)
+    )
+
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert pages[1][0]["datetime"] == START + timedelta(minutes=3)
+
+
+def test_resample_in_mongo_matches_minute_rows(mongo_client):
+    query = OhlcvQuery()
+    query.rollup_collections = {}
+    query._collection("XAUUSD").insert_many(
+        [{**_candle(m), "close": 2000.0 + m, "high": 2010.0 + m % 4} for m in range(12)]
+    )
+    end = START + timedelta(minutes=11)
+
+    rows, cursor = query.get_page("XAUUSD", START, end, timeframe="5m")
+
+    assert cursor is None
+    assert [r["datetime"] for r in rows] == [
+        START + timedelta(minutes=m) for m in (0, 5, 10)
+    ]
+    minute_rows = query._minute_rows("XAUUSD", START, end)
+    assert rows == OhlcvQuery._resample_rows(minute_rows, "5m")
+    assert rows[0]["close"] == 2004.0 and rows[0]["high"] == 2013.0
+    assert rows[0]["volume"] == 50.0
@@ -0,0 +1,69 @@
+"""
+Test export Parquet: chỉ export nến final, dừng trước ngày còn nến chưa xác nhận
+và đọc được các tháng retention đã chuyển vào archive
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src.etl.load.parquet_export_load import ParquetExportLoad
+from src.etl.load.retention_load import CandleRetentionLoad
+from src.utils.candle_state_util import FINAL, PROVISIONAL
+
+pytest.importorskip("pyarrow")
+
+DAY = datetime(2024, 1, 30)
+
+
+def _candles(start, minutes, state=FINAL):
+    return [
+        {
+            "datetime": start + timedelta(minutes=m),
+            "open": 2000.0,
+            "high": 2001.0,
+            "low": 1999.0,
+            "close": 2000.0 + m,
+            "volume": 10.0,
+            "state": state,
+        }
+        for m in minutes
+    ]
+
+
+def _read_day(exporter, day):
+    return pd.read_parquet(exporter._partition_path(day))
+
+
+def test_export_stops_before_unconfirmed_day(mongo_client, tmp_path):
+    exporter = ParquetExportLoad(root_path=str(tmp_path / "parquet"))
+    exporter.gold_collection.insert_many(
+        _candles(DAY, range(3))
+        + _candles(DAY + timedelta(days=1), range(2))
+        + _candles(DAY + timedelta(days=1), [2], state=PROVISIONAL)
+        + _candles(DAY + timedelta(days=2), range(2))
+    )
+
+    assert exporter.export_new_days(today=DAY + timedelta(days=5)) == 1
+    assert list(_read_day(exporter, DAY)["close"]) == [2000.0, 2001.0, 2002.0]
+    assert exporter._load_state()[exporter.symbol] == DAY.strftime("%Y-%m-%d")
+
+    # Nến được xác nhận: lần chạy sau export tiếp từ ngày đó
+    exporter.gold_collection.update_many({}, {"$set": {"state": FINAL}})
+    assert exporter.export_new_days(today=DAY + timedelta(days=5)) == 2
+    assert len(_read_day(exporter, DAY + timedelta(days=1))) == 3
+
+
+def test_export_reads_archived_months(mongo_client, tmp_path):
+    retention = CandleRetentionLoad(hot_days=30)
+    retention.gold_collection.insert_many(
+        _candles(DAY, range(3)) + _candles(datetime(2024, 2, 1), range(2))
+    )
+    retention.archive_month(DAY)
+    # Nến đến muộn của tháng đã archive vẫn nằm trong collection chính
+    retention.gold_collection.insert_many(_candles(DAY, [5]))
+
+    exporter = ParquetExportLoad(root_path=str(tmp_path / "parquet"))
+    assert exporter.export_new_days(today=datetime(2024, 2, 5)) == 2
+    assert list(_read_day(exporter, DAY)["close"]) == [2000.0, 2001.0, 2002.0, 2005.0]
+    assert len(_read_day(exporter, datetime(2024, 2, 1))) == 2
@@ -0,0 +1,66 @@
+"""
+Test recent key index: cửa sổ bitset trượt theo phút mới nhất được ghi và
+filter_existing_data trả lời các phút gần đây mà không hỏi Mongo
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from config.variable_config import ARRAY_STORE_CONFIG, RECENT_KEY_INDEX_CONFIG
+from src.etl.extract.realtime_metatrader_extract import RealtimeMetatraderExtract
+from src.utils.recent_key_index_util import RecentKeyIndexUtil
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _minutes(*minutes):
+    return [START + timedelta(minutes=m) for m in minutes]
+
+
+class _ClockAdapter:
+    guard = None
+
+    def now(self):
+        return START + timedelta(minutes=9, seconds=30)
+
+
+def test_window_slides_with_latest_write(mongo_client):
+    index = RecentKeyIndexUtil(window_minutes=10)
+    collection = mongo_client["test"]["candles"]
+    collection.insert_many([{"datetime": dt} for dt in _minutes(0, 3, 9)])
+    index.warm(collection, START + timedelta(minutes=9, seconds=30))
+
+    in_window, present = index.lookup(_minutes(0, 1, 3, 9, 12))
+    assert list(in_window) == [True] * 5
+    assert list(present) == [True, False, True, True, False]
+
+    index.add(_minutes(12))
+    index.remove(_minutes(9))
+    in_window, present = index.lookup(_minutes(0, 3, 9, 12))
+    # Cửa sổ giờ là [10:03, 10:12]: phút 10:00 trôi ra ngoài
+    assert list(in_window) == [False, True, True, True]
+    assert list(present[1:]) == [True, False, True]
+
+
+def test_filter_existing_data_answers_recent_minutes_locally(mongo_client, monkeypatch):
+    monkeypatch.setitem(RECENT_KEY_INDEX_CONFIG, "enabled", True)
+    monkeypatch.setitem(ARRAY_STORE_CONFIG, "enabled", False)
+    extractor = RealtimeMetatraderExtract(tv_adapter=_ClockAdapter())
+    extractor.gold_collection.insert_many(
+        [{"datetime": dt, "close": 2000.0} for dt in _minutes(0, 1, 2)]
+    )
+    extractor.recent_keys.warm(extractor.gold_collection, extractor.current_time())
+    queries = []
+    find = extractor.gold_collection.find
+    monkeypatch.setattr(
+        extractor.gold_collection,
+        "find",
+        lambda *args, **kwargs: queries.append(args) or find(*args, **kwargs),
+    )
+
+    new_df = extractor.filter_existing_data(
+        pd.DataFrame({"datetime": _minutes(1, 2, 3, 4), "close": 2000.0})
+    )
+
+    assert list(new_df["datetime"]) == _minutes(3, 4)
+    assert queries == []
@@ -0,0 +1,61 @@
+"""
+Test reconcile_window: merge cửa sổ nến vừa lấy với cursor Mongo sinh ra đúng tập
+insert / update / delete, chỉ trong khoảng của cửa sổ
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+
+START = datetime(2024, 3, 5, 10, 0)
+NOW = START + timedelta(minutes=30)
+
+
+def _candle(minute, close=2000.5):
+    return {
+        "datetime": START + timedelta(minutes=minute),
+        "open": 2000.0,
+        "high": 2010.0,
+        "low": 1990.0,
+        "close": close,
+        "volume": 10.0,
+    }
+
+
+def _stored(loader):
+    return {
+        d["datetime"]: d["close"] for d in loader.gold_collection.find({}, {"_id": 0})
+    }
+
+
+def test_window_diff_inserts_updates_and_deletes(mongo_client):
+    loader = RealtimeMetatraderLoad(clock=lambda: NOW)
+    # Phút 0 và 9 nằm ngoài cửa sổ [1, 8]: không bị đụng tới
+    loader.gold_collection.insert_many(
+        [_candle(m) for m in (0, 1, 2, 5, 9)] + [_candle(3, close=1999.0)]
+    )
+    window = pd.DataFrame([_candle(m) for m in (1, 2, 3, 4, 8)])
+
+    counts = loader.reconcile_window(window)
+
+    assert counts == {"inserted": 2, "updated": 1, "deleted": 1, "unchanged": 2}
+    assert _stored(loader) == {
+        START + timedelta(minutes=m): 2000.5 for m in (0, 1, 2, 3, 4, 8, 9)
+    }
+    assert loader.reconcile_window(window)["unchanged"] == 5
+
+
+def test_window_keeps_rejected_minutes_and_skips_current_minute(mongo_client):
+    loader = RealtimeMetatraderLoad(clock=lambda: NOW)
+    loader.gold_collection.insert_many(
+        [_candle(1), _candle(2, close=1999.0), _candle(3)]
+    )
+    window = pd.DataFrame([_candle(1), _candle(3), _candle(30)])
+
+    counts = loader.reconcile_window(window, keep={START + timedelta(minutes=2)})
+
+    assert counts["deleted"] == 0 and counts["inserted"] == 0
+    # Nến nguồn bị loại khi validate: giữ bản trong Mongo; phút hiện tại do job upsert xử lý
+    assert _stored(loader)[START + timedelta(minutes=2)] == 1999.0
+    assert START + timedelta(minutes=30) not in _stored(loader)
@@ -0,0 +1,36 @@
+"""
+Test replay: lần chạy replay chỉ đọc collection nguồn, mọi lần ghi vào collection riêng
+"""
+import pytest
+
+from config.variable_config import GOLD_DATA_CONFIG, PARQUET_EXPORT_CONFIG, REPLAY_CONFIG
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.etl.transform.candle_validate import CandleValidateTransform
+from src.utils.replay_datafeed_adapter import use_replay_collections
+
+
+def test_replay_writes_go_to_separate_collection(mongo_client, monkeypatch):
+    monkeypatch.setitem(GOLD_DATA_CONFIG, "collection", "gold_minute_data")
+    monkeypatch.setitem(REPLAY_CONFIG, "target_collection", "gold_minute_data_replay")
+    monkeypatch.setitem(PARQUET_EXPORT_CONFIG, "enabled", True)
+
+    target = use_replay_collections("gold_minute_data")
+
+    assert target == "gold_minute_data_replay"
+    assert not PARQUET_EXPORT_CONFIG["enabled"]
+    assert RealtimeMetatraderLoad().gold_collection.name == "gold_minute_data_replay"
+    validator = CandleValidateTransform()
+    assert validator.quarantine_collection.name == "gold_minute_data_replay_quarantine"
+
+
+@pytest.mark.parametrize(
+    "target, source",
+    [("gold_minute_data", None), ("gold_minute_data_copy", "gold_minute_data_copy")],
+)
+def test_replay_refuses_to_write_live_or_source(monkeypatch, target, source):
+    monkeypatch.setitem(GOLD_DATA_CONFIG, "collection", "gold_minute_data")
+    monkeypatch.setitem(REPLAY_CONFIG, "target_collection", target)
+
+    with pytest.raises(ValueError):
+        use_replay_collections(source)
+    assert GOLD_DATA_CONFIG["collection"] == "gold_minute_data"
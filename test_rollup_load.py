@@ -0,0 +1,75 @@
+"""
+Test rollup: bucket được tính lại khi nến phút thay đổi và bị xóa khi không còn
+nến phút nào (spike bị rút lại, reconcile xóa nến)
+"""
+from datetime import datetime, timedelta
+
+from src.etl.load.rollup_load import CandleRollupLoad
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _minutes(minutes):
+    return [
+        {
+            "datetime": START + timedelta(minutes=m),
+            "open": 2000.0 + m,
+            "high": 2001.0 + m,
+            "low": 1999.0 + m,
+            "close": 2000.5 + m,
+            "volume": 1.0,
+        }
+        for m in minutes
+    ]
+
+
+def _bars(rollups, timeframe):
+    return {
+        d["datetime"]: d
+        for d in rollups.collections[timeframe].find({}, {"_id": 0, "updated_at": 0})
+    }
+
+
+def test_update_for_minutes_rebuilds_changed_buckets(mongo_client):
+    rollups = CandleRollupLoad()
+    source = rollups.sources["5m"]
+    source.insert_many(_minutes(range(10)))
+    rollups.update_for_minutes([START, START + timedelta(minutes=5)])
+
+    bars = _bars(rollups, "5m")
+    assert bars[START]["open"] == 2000.0 and bars[START]["close"] == 2004.5
+    assert bars[START]["volume"] == 5.0
+    assert _bars(rollups, "1h")[START]["high"] == 2010.0
+
+
+def test_bucket_deleted_when_all_minutes_removed(mongo_client):
+    rollups = CandleRollupLoad()
+    source = rollups.sources["5m"]
+    source.insert_many(_minutes(range(10)))
+    rollups.build_all(START, START + timedelta(minutes=9))
+    assert len(_bars(rollups, "5m")) == 2
+
+    # Cả bucket 10:05 bị xóa khỏi collection phút
+    removed = [START + timedelta(minutes=m) for m in range(5, 10)]
+    source.delete_many({"datetime": {"$in": removed}})
+    rollups.update_for_minutes(removed)
+
+    assert list(_bars(rollups, "5m")) == [START]
+    # Khung lớn hơn được tính lại từ khung 5m chỉ còn bucket 10:00
+    assert _bars(rollups, "1h")[START]["close"] == 2004.5
+
+    source.delete_many({})
+    rollups.update_for_minutes([START])
+    assert all(_bars(rollups, tf) == {} for tf in rollups.timeframes)
+
+
+def test_build_all_drops_stale_buckets(mongo_client):
+    rollups = CandleRollupLoad()
+    source = rollups.sources["5m"]
+    source.insert_many(_minutes(range(10)))
+    rollups.build_all(START, START + timedelta(minutes=9))
+    source.delete_many({"datetime": {"$gte": START + timedelta(minutes=5)}})
+
+    rollups.build_all(START, START + timedelta(minutes=9))
+
+    assert list(_bars(rollups, "5m")) == [START]
@@ -0,0 +1,36 @@
+"""
+Test bootstrap index: tạo đúng các index khai báo còn thiếu, chạy lại không tạo
+thêm gì, index lệch option chỉ bị cảnh báo chứ không bị drop
+"""
+from config.variable_config import GOLD_DATA_CONFIG
+from src.utils.schema_bootstrap_util import SchemaBootstrapUtil, declared_schema
+
+
+def _gold_db(mongo_client):
+    return mongo_client[GOLD_DATA_CONFIG["database"]]
+
+
+def test_ensure_creates_missing_indexes_once(mongo_client, monkeypatch):
+    monkeypatch.setattr(SchemaBootstrapUtil, "_done", False)
+    schema = declared_schema()
+
+    created = SchemaBootstrapUtil.ensure()
+
+    assert created == {
+        name: [spec["name"] for spec in specs] for name, specs in schema.items()
+    }
+    collection = _gold_db(mongo_client)[GOLD_DATA_CONFIG["collection"]]
+    assert collection.index_information()["datetime_1"]["unique"]
+    assert SchemaBootstrapUtil.ensure() == {}
+    assert SchemaBootstrapUtil.ensure(force=True) == {}
+
+
+def test_mismatched_index_is_kept(mongo_client, monkeypatch):
+    monkeypatch.setattr(SchemaBootstrapUtil, "_done", False)
+    collection = _gold_db(mongo_client)[GOLD_DATA_CONFIG["collection"]]
+    collection.create_index([("datetime", 1)], name="datetime_1")
+
+    created = SchemaBootstrapUtil.ensure()
+
+    assert "datetime_1" not in created[GOLD_DATA_CONFIG["collection"]]
+    assert not collection.index_information()["datetime_1"].get("unique")
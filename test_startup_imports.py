@@ -0,0 +1,56 @@
+"""
+Test khởi động: đường realtime không import gdown / tvDatafeed / requests, logger
+và file handler được dùng chung, bảng thời gian khởi động ghi lại từng bước
+"""
+import os
+import subprocess
+import sys
+
+from config.logger_config import LoggerConfig
+from src.utils.startup_timer_util import StartupTimerUtil
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_realtime_pipeline_import_skips_heavy_modules():
+    code = (
+        "import sys\n"
+        "import src.pipepline.realtime_metatrader_pipepline\n"
+        "heavy = ('gdown', 'tvDatafeed', 'requests')\n"
+        "print(','.join(m for m in heavy if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_loggers_share_one_file_handler():
+    first = LoggerConfig.logger_config("Startup test A")
+    second = LoggerConfig.logger_config("Startup test B")
+
+    assert LoggerConfig.logger_config("Startup test A") is first
+    assert len(first.handlers) == 2
+    assert first.handlers[0] is second.handlers[0]
+
+
+def test_startup_timer_reports_each_stage(capsys):
+    timer = StartupTimerUtil()
+    with timer.stage("import realtime pipeline"):
+        pass
+    with timer.stage("init realtime pipeline"):
+        pass
+
+    timer.report()
+
+    assert [name for name, _ in timer.stages] == [
+        "import realtime pipeline",
+        "init realtime pipeline",
+    ]
+    out = capsys.readouterr().out
+    assert out.startswith("Startup time breakdown") and "init realtime pipeline" in out
@@ -0,0 +1,52 @@
+"""
+Test rate limiter TradingView: caller realtime chỉ chờ token một khoảng ngắn để
+không chặn vòng lặp schedule, và mỗi đường lấy dữ liệu truyền đúng mức ưu tiên
+"""
+import time
+from datetime import timedelta
+
+import pytest
+
+from src.etl.extract.realtime_metatrader_extract import RealtimeMetatraderExtract
+from src.utils.tradingview_guard_util import CircuitOpenError, TradingViewGuard
+from test_candle_state import START, _HistAdapter
+
+
+@pytest.fixture
+def guard(monkeypatch):
+    monkeypatch.setattr(TradingViewGuard, "_instance", None)
+    guard = TradingViewGuard()
+    guard.rate = 1 / 3600.0
+    guard._tokens = 0.0
+    guard.realtime_max_wait_seconds = 0.1
+    guard.max_wait_seconds = 0.5
+    return guard
+
+
+@pytest.mark.parametrize("priority", ["finalize", "realtime", "forming"])
+def test_realtime_callers_give_up_quickly(guard, priority):
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        guard.acquire(priority)
+    assert time.monotonic() - started < guard.max_wait_seconds
+    assert guard.get_status()["rejected_timeout"] == 1
+
+
+def test_backfill_waits_up_to_max_wait(guard):
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        guard.acquire("backfill")
+    assert time.monotonic() - started >= guard.max_wait_seconds
+
+
+def test_fetch_paths_pass_their_priority(mongo_client):
+    adapter = _HistAdapter()
+    extractor = RealtimeMetatraderExtract(tv_adapter=adapter)
+
+    extractor.fetch_historical_range(START, START + timedelta(minutes=5), priority="finalize")
+    extractor.fetch_latest_n_bars(100)
+    extractor.check_and_fix_gaps(
+        start_date=START, end_date=START + timedelta(minutes=5), priority="realtime"
+    )
+
+    assert [priority for _, priority in adapter.calls] == ["finalize", "backfill", "realtime"]
@@ -0,0 +1,63 @@
+"""
+Test upsert nến phút hiện tại mỗi 5 giây: nến không đổi thì không gửi, nến có
+thay đổi chỉ $set các trường đổi, finalize luôn ghi lại đầy đủ
+"""
+from datetime import datetime, timedelta
+
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.utils.candle_record import Candle
+from src.utils.candle_state_util import PROVISIONAL
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _candle(close=2000.5, volume=10.0):
+    return Candle(START, 2000.0, 2001.0, 1999.0, close, volume)
+
+
+def _spy_updates(loader, monkeypatch):
+    updates = []
+    for collection in (loader.provisional_collection, loader.final_collection):
+
+        def update_one(filter, update, _update_one=collection.update_one, **kwargs):
+            updates.append(update)
+            return _update_one(filter, update, **kwargs)
+
+        monkeypatch.setattr(collection, "update_one", update_one)
+    return updates
+
+
+def test_unchanged_candle_is_not_sent(mongo_client, monkeypatch):
+    loader = RealtimeMetatraderLoad()
+    updates = _spy_updates(loader, monkeypatch)
+
+    loader.upsert_candles([_candle()])
+    loader.upsert_candles([_candle()])
+
+    assert len(updates) == 1
+    assert loader.upsert_stats == {"sent": 1, "skipped": 1, "fields_sent": 5}
+
+
+def test_only_changed_fields_are_set(mongo_client, monkeypatch):
+    loader = RealtimeMetatraderLoad()
+    updates = _spy_updates(loader, monkeypatch)
+
+    loader.upsert_candles([_candle()])
+    loader.upsert_candles([_candle(close=2000.8, volume=12.0)])
+
+    changed = updates[-1]["$set"]
+    assert set(changed) - {"updated_at", "state"} == {"close", "volume"}
+    stored = loader.gold_collection.find_one({"datetime": START})
+    assert (stored["open"], stored["close"], stored["volume"]) == (2000.0, 2000.8, 12.0)
+
+
+def test_finalize_sends_full_candle(mongo_client, monkeypatch):
+    loader = RealtimeMetatraderLoad()
+    updates = _spy_updates(loader, monkeypatch)
+
+    loader.upsert_candles([_candle()])
+    loader.upsert_candles([_candle()], finalize=True)
+
+    assert len(updates) == 2
+    assert set(_candle().fields()) <= set(updates[-1]["$set"])
+    assert loader.gold_collection.find_one({"datetime": START})["state"] == PROVISIONAL
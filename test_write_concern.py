@@ -0,0 +1,55 @@
+"""
+Test write concern theo mức: nến forming ghi w=1 không journal và không qua spool,
+nến đã đóng cửa ghi majority + journal và đi qua spool
+"""
+from datetime import datetime, timedelta
+
+from config.mongo_config import MongoConfig
+from config.variable_config import WRITE_CONCERN_CONFIG
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.utils.candle_record import Candle
+
+START = datetime(2024, 3, 5, 10, 0)
+
+
+def _candle(minute):
+    return Candle(
+        START + timedelta(minutes=minute), 2000.0, 2001.0, 1999.0, 2000.5, 10.0
+    )
+
+
+def test_profiles_map_to_write_concern(monkeypatch):
+    provisional = MongoConfig.write_concern("provisional").document
+    final = MongoConfig.write_concern("final").document
+
+    assert provisional == {"w": 1, "j": False}
+    assert final == {
+        "w": "majority",
+        "j": True,
+        "wtimeout": WRITE_CONCERN_CONFIG["final"]["wtimeout_ms"],
+    }
+
+    monkeypatch.setitem(
+        WRITE_CONCERN_CONFIG,
+        "provisional",
+        {**WRITE_CONCERN_CONFIG["provisional"], "w": "0"},
+    )
+    assert MongoConfig.write_concern("provisional").document == {"w": 0}
+
+
+def test_only_finalized_upserts_go_through_spool(mongo_client, monkeypatch):
+    loader = RealtimeMetatraderLoad()
+    spooled = []
+    append_update = loader.spool.append_update
+    monkeypatch.setattr(
+        loader.spool,
+        "append_update",
+        lambda *args, **kwargs: spooled.append(args) or append_update(*args, **kwargs),
+    )
+
+    loader.upsert_candles([_candle(0)])
+    assert spooled == []
+
+    loader.upsert_candles([_candle(0)], finalize=True)
+    assert len(spooled) == 1
+    assert loader.gold_collection.count_documents({"datetime": START}) == 1
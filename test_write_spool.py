@@ -0,0 +1,122 @@
+"""
+Test spool ghi: lệnh ghi bị MongoDB từ chối vĩnh viễn (VD: code 121 document
+validation) vào quarantine, không chặn ingest; lỗi tạm thời vẫn giữ trong spool
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.etl.load.realtime_metatrader_load import RealtimeMetatraderLoad
+from src.etl.transform.candle_validate import quarantine_collection_name
+from src.utils.candle_record import Candle
+
+START = datetime(2024, 3, 4, 10, 0)
+
+
+def _candle(minute, volume=10.0):
+    return {
+        "datetime": START + timedelta(minutes=minute),
+        "open": 2000.0,
+        "high": 2001.0,
+        "low": 1999.0,
+        "close": 2000.5,
+        "volume": volume,
+    }
+
+
+def _quarantined(loader):
+    return list(
+        loader.gold_db.get_collection(quarantine_collection_name()).find({}, {"_id": 0})
+    )
+
+
+def test_rejected_insert_does_not_stall_ingest(mongo_client, reject_writes):
+    reject_writes(lambda doc: doc.get("volume") == -1)
+    loader = RealtimeMetatraderLoad()
+
+    loader.realtime_load(pd.DataFrame([_candle(0), _candle(1, volume=-1), _candle(2)]))
+
+    assert loader.gold_collection.count_documents({}) == 2
+    assert not loader.spool.has_pending()
+    quarantined = _quarantined(loader)
+    assert [q["datetime"] for q in quarantined] == [START + timedelta(minutes=1)]
+    assert quarantined[0]["reasons"] == ["write_rejected"]
+    assert quarantined[0]["error"]["code"] == 121
+
+    # Các lần ghi sau đi thẳng vào Mongo, không bị xếp hàng trong spool
+    loader.realtime_load(pd.DataFrame([_candle(3), _candle(4)]))
+    loader.upsert_candles([Candle.from_doc(_candle(5))])
+    loader.upsert_candles([Candle.from_doc(_candle(6, volume=-1))], finalize=True)
+    assert loader.gold_collection.count_documents({}) == 5
+    assert not loader.spool.has_pending()
+    assert len(_quarantined(loader)) == 2
+
+
+def test_replay_moves_past_rejected_operation(mongo_client, reject_writes):
+    reject_writes(lambda doc: doc.get("volume") == -1)
+    loader = RealtimeMetatraderLoad()
+    loader.spool.append_inserts([_candle(0), _candle(1, volume=-1)])
+    loader.spool.append_inserts([_candle(2)])
+
+    replayed = loader.replay_spool()
+
+    assert replayed == 2
+    assert not loader.spool.has_pending()
+    assert sorted(d["datetime"] for d in loader.gold_collection.find()) == [
+        START,
+        START + timedelta(minutes=2),
+    ]
+    assert len(_quarantined(loader)) == 1
+
+
+def test_transient_error_keeps_backlog(mongo_client, reject_writes):
+    primary_down = [True]
+    # 91 ShutdownInProgress: ghi lại sau sẽ thành công
+    reject_writes(lambda doc: primary_down[0], code=91)
+    loader = RealtimeMetatraderLoad()
+
+    loader.realtime_load(pd.DataFrame([_candle(0), _candle(1)]))
+    assert loader.spool.has_pending()
+    assert _quarantined(loader) == []
+
+    primary_down[0] = False
+    assert loader.replay_spool() == 2
+    assert not loader.spool.has_pending()
+    assert loader.gold_collection.count_documents({}) == 2
+
+
+def test_realtime_load_reports_counts_without_side_effects(mongo_client):
+    loader = RealtimeMetatraderLoad(side_effects=False)
+    assert loader.spool is None and loader.array_store is None
+
+    loader.gold_collection.create_index("datetime", unique=True)
+    loader.gold_collection.insert_one(_candle(1))
+    counts = loader.realtime_load(pd.DataFrame([_candle(0), _candle(1), _candle(2)]))
+
+    assert counts == {"inserted": 2, "duplicates": 1, "errors": 0, "queued": 0}
+
+
+def test_replay_returns_only_operations_that_changed_a_document(mongo_client):
+    loader = RealtimeMetatraderLoad()
+    # Batch đã tới Mongo nhưng process chết trước khi ghi ack
+    loader.gold_collection.insert_one(_candle(0))
+    loader.spool.append_inserts([_candle(0), _candle(1)])
+    finalized = []
+    loader._after_finalized = lambda candles, *args, **kwargs: finalized.extend(candles)
+
+    assert loader.replay_spool() == 1
+    assert [c["datetime"] for c in finalized] == [START + timedelta(minutes=1)]
+    assert not loader.spool.has_pending()
+    assert loader.gold_collection.count_documents({}) == 2
+
+
+def test_ack_line_is_not_fsynced(mongo_client, monkeypatch):
+    loader = RealtimeMetatraderLoad()
+    loader.spool.fsync = True
+    synced = []
+    monkeypatch.setattr("os.fsync", lambda fd: synced.append(fd))
+
+    batch_id = loader.spool.append_inserts([_candle(0)])
+    loader.spool.ack(batch_id)
+
+    assert len(synced) == 1